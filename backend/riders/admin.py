@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Rider, RideEvent, Post, Zone, MembershipApplication, BenefitCategory, Benefit, BenefitUsage, EventPhoto, Notice
+from django.db import transaction
+from .models import Rider, RideEvent, Post, Comment, Zone, MembershipApplication, BenefitCategory, Benefit, BenefitUsage, BenefitUsageCounter, EventPhoto, EventWaitlistEntry, PhotoUpload, MediaBlob, Notice
 
 @admin.register(Zone)
 class ZoneAdmin(admin.ModelAdmin):
@@ -38,15 +39,15 @@ class MembershipApplicationAdmin(admin.ModelAdmin):
 
 @admin.register(Rider)
 class RiderAdmin(admin.ModelAdmin):
-    list_display = ['user', 'bike_model', 'custom_user_type', 'location', 'membership_status', 'is_featured', 'created_at']
-    list_filter = ['membership_status', 'zone', 'is_featured', 'created_at']
-    search_fields = ['user__username', 'user__email', 'bike_model', 'custom_user_type']
+    list_display = ['user', 'bike_model', 'custom_user_type', 'location', 'membership_status', 'membership_level', 'is_featured', 'created_at']
+    list_filter = ['membership_status', 'membership_level', 'zone', 'is_featured', 'created_at']
+    search_fields = ['user__username', 'phone', 'user__email', 'bike_model', 'custom_user_type']
     list_editable = ['membership_status', 'is_featured']
     readonly_fields = ['created_at', 'updated_at']
     
     fieldsets = (
         ('User Information', {
-            'fields': ('user', 'membership_status', 'zone', 'is_featured')
+            'fields': ('user', 'phone', 'membership_status', 'membership_level', 'zone', 'is_featured')
         }),
         ('Profile Details', {
             'fields': ('bio', 'location', 'bike_model', 'custom_user_type', 'profile_image')
@@ -68,17 +69,18 @@ class RideEventAdmin(admin.ModelAdmin):
     list_display = ['title', 'organizer', 'date', 'location', 'participant_count', 'photo_count']
     list_filter = ['date', 'location', 'status']
     search_fields = ['title', 'organizer__user__username', 'organizer_name']
+    readonly_fields = ['participant_count']
     inlines = [EventPhotoInline]
     
     fieldsets = (
         ('Event Information', {
-            'fields': ('title', 'description', 'location', 'organizer', 'organizer_name')
+            'fields': ('title', 'description', 'location', 'latitude', 'longitude', 'organizer', 'organizer_name')
         }),
         ('Date & Time', {
             'fields': ('date', 'time', 'end_date', 'duration')
         }),
         ('Event Details', {
-            'fields': ('price', 'requirements', 'max_participants', 'status', 'is_featured')
+            'fields': ('price', 'requirements', 'max_participants', 'participant_count', 'status', 'is_featured')
         }),
         ('Legacy Photos (URLs)', {
             'fields': ('photos',),
@@ -87,23 +89,52 @@ class RideEventAdmin(admin.ModelAdmin):
         }),
     )
     
-    def participant_count(self, obj):
-        return obj.participants.count()
-    participant_count.short_description = 'Participants'
-    
     def photo_count(self, obj):
         return obj.uploaded_photos.count()
     photo_count.short_description = 'Uploaded Photos'
 
+@admin.register(EventWaitlistEntry)
+class EventWaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['event', 'rider', 'position', 'created_at']
+    list_filter = ['event__status', 'created_at']
+    search_fields = ['event__title', 'rider__user__username']
+    readonly_fields = ['created_at']
+    ordering = ['event', 'position']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('event', 'rider__user')
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'created_at', 'likes_count']
     list_filter = ['created_at']
     search_fields = ['title', 'author__user__username']
+    readonly_fields = ['likes_count']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('author__user')
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'author', 'depth', 'reply_count', 'is_deleted', 'created_at']
+    list_filter = ['is_deleted', 'created_at']
+    search_fields = ['content', 'author__user__username']
+    readonly_fields = ['post', 'event', 'author', 'parent', 'path', 'depth', 'reply_count']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('author__user', 'post', 'event')
     
-    def likes_count(self, obj):
-        return obj.likes.count()
-    likes_count.short_description = 'Likes'
+    def has_add_permission(self, request):
+        # Paths and reply counts are assigned by Comment.add()
+        return False
+    
+    def delete_model(self, request, obj):
+        obj.remove()
+    
+    def delete_queryset(self, request, queryset):
+        # Deepest first, so replies are removed before the comments they answer
+        for comment in queryset.order_by('-depth'):
+            comment.remove()
 
 @admin.register(BenefitCategory)
 class BenefitCategoryAdmin(admin.ModelAdmin):
@@ -136,7 +167,7 @@ class BenefitAdmin(admin.ModelAdmin):
             'fields': ('title', 'description', 'category', 'image')
         }),
         ('Partner Information', {
-            'fields': ('partner_name', 'partner_logo', 'contact_info', 'location', 'website_url')
+            'fields': ('partner_name', 'partner_logo', 'contact_info', 'location', 'latitude', 'longitude', 'website_url')
         }),
         ('Discount Details', {
             'fields': ('discount_percentage', 'discount_amount', 'membership_level')
@@ -162,6 +193,28 @@ class BenefitUsageAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('rider__user', 'benefit')
+    
+    def save_model(self, request, obj, form, change):
+        # Keep BenefitUsageCounter in step; staff may record uses past the limit
+        moved = change and ('rider' in form.changed_data or 'benefit' in form.changed_data)
+        with transaction.atomic():
+            if moved:
+                BenefitUsageCounter.decrement(form.initial['rider'], form.initial['benefit'])
+            super().save_model(request, obj, form, change)
+            if not change or moved:
+                BenefitUsageCounter.increment(obj.rider_id, obj.benefit_id)
+
+@admin.register(BenefitUsageCounter)
+class BenefitUsageCounterAdmin(admin.ModelAdmin):
+    list_display = ['rider', 'benefit', 'count', 'updated_at']
+    search_fields = ['rider__user__username', 'benefit__title']
+    readonly_fields = ['rider', 'benefit', 'count', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('rider__user', 'benefit')
+    
+    def has_add_permission(self, request):
+        return False
 
 @admin.register(EventPhoto)
 class EventPhotoAdmin(admin.ModelAdmin):
@@ -179,6 +232,25 @@ class EventPhotoAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(PhotoUpload)
+class PhotoUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'event', 'rider', 'received', 'size', 'status', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'event__title', 'rider__user__username']
+    readonly_fields = ['id', 'received', 'photo', 'created_at', 'updated_at']
+    ordering = ['-created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('event', 'rider__user')
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'created_at', 'updated_at']
+    list_filter = ['created_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'size', 'ref_count', 'created_at', 'updated_at']
+    ordering = ['-ref_count']
+
 @admin.register(Notice)
 class NoticeAdmin(admin.ModelAdmin):
     list_display = ['title', 'priority', 'is_active', 'is_valid', 'created_by', 'created_at', 'end_date']
@@ -3,9 +3,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from .models import Rider, Zone, MembershipApplication
+from . import phones
 from .serializers import RiderSerializer
 
 @api_view(['POST'])
@@ -23,37 +23,26 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Normalize phone number - try both formats
-    phone_formats = []
-    if phone.startswith('+880'):
-        # Convert +8801XXXXXXXXX to 01XXXXXXXXX
-        local_format = '0' + phone[4:]
-        phone_formats = [phone, local_format]
-    elif phone.startswith('01'):
-        # Convert 01XXXXXXXXX to +8801XXXXXXXXX
-        international_format = '+880' + phone[1:]
-        phone_formats = [phone, international_format]
-    else:
-        phone_formats = [phone]
-    
-    # Find user by phone (try both formats)
-    user = None
-    for phone_format in phone_formats:
-        try:
-            user = User.objects.get(username=phone_format)
-            break
-        except User.DoesNotExist:
-            continue
-    
-    if not user:
-        return Response(
-            {'detail': 'Invalid credentials'}, 
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+    # Indexed lookups only: the canonical (E.164) number on Rider.phone, then, if that
+    # isn't the account typed, the exact username. Accounts without a rider profile
+    # (staff) sign in with their username, and so can a rider whose number was already
+    # taken by an older account when phones were backfilled (see migration 0030).
+    by_phone = None
+    try:
+        by_phone = User.objects.filter(rider__phone=phones.to_e164(phone), is_active=True).first()
+    except ValueError:
+        pass
+    candidates = [by_phone] if by_phone is not None else []
+    if by_phone is None or by_phone.username != phone:
+        by_username = User.objects.filter(username=phone, is_active=True).first()
+        if by_username is not None:
+            candidates.insert(0, by_username)
     
-    # Authenticate user
-    user = authenticate(username=user.username, password=password)
-    if not user:
+    user = next((candidate for candidate in candidates if candidate.check_password(password)), None)
+    if not candidates:
+        # Hash anyway so unknown numbers take as long as wrong passwords
+        User().set_password(password)
+    if user is None:
         return Response(
             {'detail': 'Invalid credentials'}, 
             status=status.HTTP_401_UNAUTHORIZED
@@ -63,15 +52,6 @@ def login_view(request):
     refresh = RefreshToken.for_user(user)
     access_token = refresh.access_token
     
-    # Get user profile data
-    try:
-        rider = Rider.objects.get(user=user)
-        membership_status = rider.membership_status
-        zone = rider.zone
-    except Rider.DoesNotExist:
-        membership_status = 'pending'
-        zone = None
-    
     return Response({
         'access': str(access_token),
         'refresh': str(refresh),
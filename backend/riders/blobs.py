@@ -0,0 +1,135 @@
+"""
+Reference counting for content-addressed media blobs.
+
+Every file field value that names a blob holds one reference on its
+MediaBlob row. Signals in riders.signals acquire and release references as
+rows are saved and deleted; ``recount`` rebuilds the counts from the tables,
+and ``prune`` removes blobs that have stayed unreferenced for a grace period.
+"""
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import images
+from .models import MediaBlob
+from .storage import is_blob_name
+
+
+def file_fields(model):
+    """File fields stored in the default (content-addressed) storage"""
+    return [
+        field.name for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and field.storage is default_storage
+    ]
+
+
+def tracked_models():
+    """Models of this app with at least one file field"""
+    return [model for model in apps.get_app_config('riders').get_models() if file_fields(model)]
+
+
+def referenced_names(instance):
+    names = []
+    for field_name in file_fields(type(instance)):
+        file = getattr(instance, field_name)
+        if file:
+            names.append(file.name)
+    return names
+
+
+def _blob_size(name):
+    try:
+        return default_storage.size(name)
+    except OSError:
+        return 0
+
+
+def acquire(names):
+    now = timezone.now()
+    for name, count in Counter(name for name in names if is_blob_name(name)).items():
+        if MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + count, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, size=_blob_size(name), ref_count=count)
+        except IntegrityError:
+            # Created concurrently by another save of the same content
+            MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + count, updated_at=now)
+
+
+def release(names):
+    now = timezone.now()
+    for name, count in Counter(name for name in names if is_blob_name(name)).items():
+        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') - count, updated_at=now)
+
+
+def remember_files(instance):
+    """Record the file names currently stored for ``instance`` before it is saved"""
+    fields = file_fields(type(instance))
+    stored = None
+    if not instance._state.adding and instance.pk is not None:
+        stored = type(instance)._default_manager.filter(pk=instance.pk).values_list(*fields).first()
+    instance._stored_files = [name for name in (stored or ()) if name]
+
+
+def sync_references(instance):
+    """Move references from the previously stored files to the current ones"""
+    old = Counter(getattr(instance, '_stored_files', []))
+    new = Counter(referenced_names(instance))
+    acquire(list((new - old).elements()))
+    release(list((old - new).elements()))
+    instance._stored_files = list(new.elements())
+
+
+def count_references():
+    """Counter of blob name -> references, streamed over every tracked table"""
+    references = Counter()
+    for model in tracked_models():
+        for row in model._default_manager.values_list(*file_fields(model)).iterator(chunk_size=2000):
+            references.update(name for name in row if is_blob_name(name))
+    return references
+
+
+def recount():
+    """Rebuild every MediaBlob reference count from the tables. Returns the number of rows fixed."""
+    references = count_references()
+    fixed = 0
+    with transaction.atomic():
+        for blob in MediaBlob.objects.select_for_update().only('pk', 'name', 'ref_count').iterator(chunk_size=2000):
+            expected = references.pop(blob.name, 0)
+            if blob.ref_count != expected:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=expected, updated_at=timezone.now())
+                fixed += 1
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, size=_blob_size(name), ref_count=count) for name, count in references.items()],
+            ignore_conflicts=True,
+        )
+    return fixed + len(references)
+
+
+def prune(grace, dry_run=False):
+    """
+    Delete blobs unreferenced for longer than ``grace`` (a timedelta).
+    Returns (blobs, bytes) removed, or that would be removed with ``dry_run``.
+    """
+    cutoff = timezone.now() - grace
+    candidates = MediaBlob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff)
+    # Renditions are stored as blobs too, but tracked in their owners' renditions field
+    in_use = images.referenced_rendition_names() if candidates.exists() else set()
+    removed, removed_bytes = 0, 0
+    for blob in candidates.iterator(chunk_size=500):
+        if dry_run:
+            removed, removed_bytes = removed + 1, removed_bytes + blob.size
+            continue
+        # Re-check under the delete, in case the blob was referenced again meanwhile
+        deleted, _ = MediaBlob.objects.filter(pk=blob.pk, ref_count__lte=0, updated_at__lt=cutoff).delete()
+        if not deleted:
+            continue
+        if blob.name not in in_use:
+            default_storage.delete(blob.name)
+        removed, removed_bytes = removed + 1, removed_bytes + blob.size
+    return removed, removed_bytes
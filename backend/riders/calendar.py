@@ -0,0 +1,78 @@
+"""iCalendar (RFC 5545) feed generation for ride events"""
+import datetime
+
+from rest_framework.renderers import BaseRenderer
+
+PRODID = '-//Riders Club//Ride Events//EN'
+
+# Only the columns the feed writes, so large feeds stay cheap to iterate
+FEED_FIELDS = ('id', 'title', 'description', 'location', 'status', 'starts_at', 'ends_at', 'updated_at')
+
+
+class ICalendarRenderer(BaseRenderer):
+    """Lets calendar clients that send ``Accept: text/calendar`` pass content negotiation"""
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+def escape_text(value):
+    return (
+        (value or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """Fold content lines longer than 75 octets, as required by RFC 5545"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        chunk = encoded[:limit]
+        # Never split a multi-byte character
+        while chunk and len(chunk) < len(encoded) and (encoded[len(chunk)] & 0xC0) == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode('utf-8'))
+        encoded = encoded[len(chunk):]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(event, host):
+    yield 'BEGIN:VEVENT'
+    yield f'UID:ride-event-{event["id"]}@{host}'
+    yield f'DTSTAMP:{format_datetime(event["updated_at"])}'
+    yield f'DTSTART:{format_datetime(event["starts_at"])}'
+    yield f'DTEND:{format_datetime(event["ends_at"])}'
+    yield f'SUMMARY:{escape_text(event["title"])}'
+    yield f'LOCATION:{escape_text(event["location"])}'
+    yield f'DESCRIPTION:{escape_text(event["description"])}'
+    yield 'STATUS:CANCELLED' if event['status'] == 'cancelled' else 'STATUS:CONFIRMED'
+    yield 'END:VEVENT'
+
+
+def generate_feed(events, name, host):
+    """
+    Yield the feed one folded line at a time. ``events`` is a queryset of
+    RideEvent values dicts, iterated with a server-side cursor.
+    """
+    for line in ('BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+                 f'X-WR-CALNAME:{escape_text(name)}'):
+        yield fold_line(line)
+    for event in events.values(*FEED_FIELDS).iterator(chunk_size=500):
+        for line in event_lines(event, host):
+            yield fold_line(line)
+    yield fold_line('END:VCALENDAR')
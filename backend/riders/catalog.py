@@ -0,0 +1,188 @@
+"""
+Per-process snapshot of the active benefit catalog.
+
+The catalog is small, rarely changes and is read on every benefits page, so
+each process keeps the active benefits (with their categories and zones
+loaded) in memory together with a precomputed entitlement matrix: a bitmask
+of benefits per (membership level, zone) and one per date window, where the
+windows are cut at every benefit's valid_from / valid_until. The benefits a
+rider may see on a day are one lookup in each, ANDed; category, featured and
+distance filters then run over that set without a query.
+
+Saving a benefit, category or zone bumps a version token in the cache (see
+riders.signals); a process rebuilds its snapshot when the token it built
+from is no longer current, or after BENEFIT_CATALOG_MAX_AGE seconds so
+processes converge even with a per-process cache backend.
+"""
+import bisect
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from . import geo
+from .models import Benefit, BenefitCategory, Rider, Zone
+
+VERSION_KEY = 'riders:benefit-catalog:version'
+
+# Signed-out visitors are entitled to what a new (basic) rider is, never more
+ANONYMOUS_LEVEL = 'basic'
+
+
+class Entry:
+    """A catalog benefit with what filtering needs precomputed"""
+    __slots__ = ('benefit', 'zone_mask', 'valid_from', 'valid_until', 'is_featured', 'category_id', 'latitude', 'longitude')
+
+    def __init__(self, benefit, zone_mask):
+        self.benefit = benefit
+        # 0 means available in every zone
+        self.zone_mask = zone_mask
+        self.valid_from = benefit.valid_from
+        self.valid_until = benefit.valid_until
+        self.is_featured = benefit.is_featured
+        self.category_id = benefit.category_id
+        self.latitude = float(benefit.latitude) if benefit.latitude is not None else None
+        self.longitude = float(benefit.longitude) if benefit.longitude is not None else None
+
+
+class Catalog:
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        zone_ids = list(Zone.objects.order_by('pk').values_list('pk', flat=True))
+        # zone id -> bit
+        self.zone_bits = {zone_id: 1 << i for i, zone_id in enumerate(zone_ids)}
+        benefits = (
+            Benefit.objects.filter(is_active=True)
+            .select_related('category')
+            .prefetch_related('available_zones')
+            .order_by('order', '-created_at', 'pk')
+        )
+        self.entries = []
+        for benefit in benefits:
+            mask = 0
+            for zone in benefit.available_zones.all():
+                mask |= self.zone_bits.get(zone.pk, 0)
+            self.entries.append(Entry(benefit, mask))
+        self.categories = list(
+            BenefitCategory.objects.filter(is_active=True)
+            .annotate(benefits_count=Count('benefits', filter=Q(benefits__is_active=True)))
+        )
+        self.build_entitlements(zone_ids)
+
+    def build_entitlements(self, zone_ids):
+        """
+        Bitmasks (bit i = self.entries[i]) of the benefits each membership level
+        and zone is entitled to, and of the benefits valid in each date window.
+        The zone None (no zone set) doesn't restrict.
+        """
+        levels = [level for level, _ in Rider.MEMBERSHIP_LEVEL_CHOICES]
+        self.entitlements = {(level, zone_id): 0 for level in levels for zone_id in zone_ids + [None]}
+        # For zones created after this snapshot was built: only benefits offered everywhere
+        self.everywhere = {level: 0 for level in levels}
+        self.featured_mask = 0
+        self.category_masks = {}
+
+        for i, entry in enumerate(self.entries):
+            bit = 1 << i
+            entitled = Benefit.ENTITLED_LEVELS.get(entry.benefit.membership_level, levels)
+            for level in entitled:
+                if not entry.zone_mask:
+                    self.everywhere[level] |= bit
+                for zone_id in zone_ids + [None]:
+                    if zone_id is None or not entry.zone_mask or entry.zone_mask & self.zone_bits[zone_id]:
+                        self.entitlements[(level, zone_id)] |= bit
+            if entry.is_featured:
+                self.featured_mask |= bit
+            self.category_masks[entry.category_id] = self.category_masks.get(entry.category_id, 0) | bit
+
+        # Window w covers [boundaries[w - 1], boundaries[w]); the first and last are open-ended
+        boundaries = set()
+        for entry in self.entries:
+            if entry.valid_from:
+                boundaries.add(entry.valid_from)
+            if entry.valid_until:
+                boundaries.add(entry.valid_until + timedelta(days=1))
+        self.boundaries = sorted(boundaries)
+        self.window_masks = [0] * (len(self.boundaries) + 1)
+        for i, entry in enumerate(self.entries):
+            first = bisect.bisect_left(self.boundaries, entry.valid_from) + 1 if entry.valid_from else 0
+            last = bisect.bisect_left(self.boundaries, entry.valid_until + timedelta(days=1)) if entry.valid_until else len(self.boundaries)
+            for window in range(first, last + 1):
+                self.window_masks[window] |= 1 << i
+
+    def entitled_mask(self, day, level=None, zone_id=None):
+        """
+        Bitmask of the benefits a rider of ``level`` in ``zone_id`` may see on
+        ``day``. ``level`` None (signed out) is treated as ANONYMOUS_LEVEL.
+        """
+        level = level or ANONYMOUS_LEVEL
+        mask = self.entitlements.get((level, zone_id))
+        if mask is None:
+            mask = self.everywhere.get(level, 0)
+        return mask & self.window_masks[bisect.bisect_right(self.boundaries, day)]
+
+    def benefit_ids(self, day, level=None, zone_id=None):
+        mask = self.entitled_mask(day, level, zone_id)
+        return [entry.benefit.pk for i, entry in enumerate(self.entries) if mask >> i & 1]
+
+    def benefits(self, day, level=None, zone_id=None, category_id=None, featured=False, near=None):
+        """
+        Active benefits a rider of membership ``level`` in ``zone_id`` is
+        entitled to on ``day``, in list order. ``near`` is a
+        (latitude, longitude, radius_km) tuple.
+        """
+        mask = self.entitled_mask(day, level, zone_id)
+        if category_id is not None:
+            mask &= self.category_masks.get(category_id, 0)
+        if featured:
+            mask &= self.featured_mask
+        result = []
+        for i, entry in enumerate(self.entries):
+            if not mask >> i & 1:
+                continue
+            if near is not None:
+                latitude, longitude, radius_km = near
+                if entry.latitude is None or entry.longitude is None:
+                    continue
+                if geo.haversine_km(latitude, longitude, entry.latitude, entry.longitude) > radius_km:
+                    continue
+            result.append(entry.benefit)
+        return result
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # First use, or evicted: any fresh token invalidates every snapshot
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Invalidate every process's snapshot once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None))
+
+
+def get_catalog():
+    """This process's snapshot, rebuilt if the catalog changed since it was built"""
+    global _catalog
+    version = current_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version and time.monotonic() - catalog.built_at < settings.BENEFIT_CATALOG_MAX_AGE:
+        return catalog
+    with _lock:
+        catalog = _catalog
+        if catalog is None or catalog.version != version or time.monotonic() - catalog.built_at >= settings.BENEFIT_CATALOG_MAX_AGE:
+            catalog = _catalog = Catalog(version)
+        return catalog
@@ -0,0 +1,139 @@
+"""
+Per-rider home feed.
+
+When a post is written it is fanned out into FeedEntry rows for its audience:
+riders in the author's zone, riders who joined events the author organizes,
+and the author. Each entry is ranked by the post time plus a boost for why
+the rider sees it, so reading a feed is one range scan over the
+(rider, ranked_at, post) index. Posts whose audience is larger than
+FEED_FANOUT_LIMIT are flagged ``feed_pull`` and merged in at read time.
+"""
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, CharField, DateTimeField, DurationField, ExpressionWrapper, F, Q, Value, When
+from django.utils.dateparse import parse_datetime
+
+from .models import FeedEntry, Post, RideEvent, Rider
+
+# How far ahead of its post time an entry is ranked, by why the rider sees it
+BOOSTS = {
+    'own': timedelta(0),
+    'organizer': timedelta(hours=12),
+    'zone': timedelta(hours=6),
+}
+
+BATCH_SIZE = 1000
+
+
+def audience(author):
+    """rider id -> reason for every rider who should see the author's posts (strongest reason wins)"""
+    reasons = {}
+    if author.zone_id:
+        for rider_id in Rider.objects.filter(zone_id=author.zone_id).values_list('pk', flat=True).iterator(chunk_size=2000):
+            reasons[rider_id] = 'zone'
+    participants = RideEvent.participants.through.objects.filter(
+        rideevent__organizer_id=author.pk
+    ).values_list('rider_id', flat=True).distinct()
+    for rider_id in participants.iterator(chunk_size=2000):
+        reasons[rider_id] = 'organizer'
+    reasons[author.pk] = 'own'
+    return reasons
+
+
+def fan_out(post):
+    """Write a new post into its audience's timelines. Returns the number of entries written."""
+    reasons = audience(post.author)
+    if len(reasons) > settings.FEED_FANOUT_LIMIT:
+        Post.objects.filter(pk=post.pk).update(feed_pull=True)
+        return 0
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(rider_id=rider_id, post_id=post.pk, ranked_at=post.created_at + BOOSTS[reason], reason=reason)
+            for rider_id, reason in reasons.items()
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return len(reasons)
+
+
+def ranked_posts(rider, posts):
+    """Restrict ``posts`` to the rider's feed sources, annotated with ranked_at and feed_reason"""
+    organizers = RideEvent.objects.filter(participants__id=rider.pk).values('organizer_id')
+    whens = [
+        ('own', Q(author_id=rider.pk)),
+        ('organizer', Q(author_id__in=organizers)),
+    ]
+    if rider.zone_id:
+        whens.append(('zone', Q(author__zone_id=rider.zone_id)))
+    sources = Q()
+    for _, condition in whens:
+        sources |= condition
+    return posts.filter(sources).annotate(
+        feed_reason=Case(*[When(condition, then=Value(reason)) for reason, condition in whens], output_field=CharField()),
+        ranked_at=ExpressionWrapper(
+            F('created_at') + Case(
+                *[When(condition, then=Value(BOOSTS[reason])) for reason, condition in whens],
+                output_field=DurationField(),
+            ),
+            output_field=DateTimeField(),
+        ),
+    )
+
+
+def page(rider, after=None, limit=20):
+    """
+    Up to ``limit`` (ranked_at, post_id, reason) tuples of the rider's feed,
+    best first, strictly after the ``after`` (ranked_at, post_id) position,
+    and whether more follow.
+    """
+    timeline = FeedEntry.objects.filter(rider=rider)
+    # High-fanout posts are rare; the partial post_feed_pull_idx keeps this lookup small
+    pulled = ranked_posts(rider, Post.objects.filter(feed_pull=True))
+    if after is not None:
+        ranked_at, post_id = after
+        timeline = timeline.filter(Q(ranked_at__lt=ranked_at) | Q(ranked_at=ranked_at, post_id__lt=post_id))
+        pulled = pulled.filter(Q(ranked_at__lt=ranked_at) | Q(ranked_at=ranked_at, pk__lt=post_id))
+
+    items = list(timeline.order_by('-ranked_at', '-post_id').values_list('ranked_at', 'post_id', 'reason')[:limit + 1])
+    items += pulled.order_by('-ranked_at', '-pk').values_list('ranked_at', 'pk', 'feed_reason')[:limit + 1]
+    items.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+    merged, seen = [], set()
+    for item in items:
+        if item[1] not in seen:
+            seen.add(item[1])
+            merged.append(item)
+    return merged[:limit], len(merged) > limit
+
+
+def rebuild_timeline(rider, since):
+    """Re-materialize a rider's feed from the posts written since ``since``"""
+    posts = ranked_posts(rider, Post.objects.filter(feed_pull=False, created_at__gte=since))
+    FeedEntry.objects.filter(rider=rider).delete()
+    entries = [
+        FeedEntry(rider_id=rider.pk, post_id=post_id, ranked_at=ranked_at, reason=reason)
+        for post_id, ranked_at, reason in posts.values_list('pk', 'ranked_at', 'feed_reason').iterator(chunk_size=2000)
+    ]
+    FeedEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def encode_cursor(item):
+    payload = json.dumps({'v': [item[0].isoformat(), item[1]]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(value):
+    """(ranked_at, post_id) from a cursor, or raise ValueError"""
+    try:
+        ranked_at, post_id = json.loads(base64.urlsafe_b64decode(value.encode()).decode())['v']
+        ranked_at = parse_datetime(ranked_at)
+    except (TypeError, KeyError, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if ranked_at is None or not isinstance(post_id, int):
+        raise ValueError('Invalid cursor')
+    return ranked_at, post_id
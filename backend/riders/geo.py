@@ -0,0 +1,157 @@
+"""
+Geohash grid index for "near me" lookups without PostGIS.
+
+Objects store a geohash of their coordinates in an indexed column. A radius
+query is answered by range-scanning the 3x3 block of grid cells around the
+centre (each at least as large as the radius), narrowing to the bounding box,
+and only then computing exact distances for the few remaining candidates.
+"""
+import math
+
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+STORED_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+
+# Approximate (width, height) of a cell in km at each precision, at the equator
+CELL_SIZE_KM = {
+    1: (5009.4, 4992.6),
+    2: (1252.3, 624.1),
+    3: (156.5, 156.0),
+    4: (39.1, 19.5),
+    5: (4.9, 4.9),
+    6: (1.2, 0.61),
+    7: (0.153, 0.152),
+    8: (0.038, 0.019),
+}
+
+
+def encode(latitude, longitude, precision=STORED_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+    while len(geohash) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+
+def decode_bounds(geohash):
+    """Return (min_lat, max_lat, min_lng, max_lng) of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            target[1 - bit] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """The centre cell and its neighbours, at a precision whose cells span the radius"""
+    precision = 1
+    for candidate in sorted(CELL_SIZE_KM):
+        width, height = CELL_SIZE_KM[candidate]
+        # Cells narrow with latitude, so scale the width before comparing
+        if min(width * math.cos(math.radians(latitude)), height) >= radius_km:
+            precision = candidate
+    centre = encode(latitude, longitude, precision)
+    min_lat, max_lat, min_lng, max_lng = decode_bounds(centre)
+    cell_height, cell_width = max_lat - min_lat, max_lng - min_lng
+    centre_lat, centre_lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    cells = set()
+    for d_lat in (-1, 0, 1):
+        for d_lng in (-1, 0, 1):
+            lat = centre_lat + d_lat * cell_height
+            if not -90 <= lat <= 90:
+                continue
+            lng = (centre_lng + d_lng * cell_width + 180) % 360 - 180
+            cells.add(encode(lat, lng, precision))
+    return sorted(cells)
+
+
+def prefix_upper_bound(prefix):
+    """Smallest geohash greater than every hash starting with ``prefix`` (None if unbounded)"""
+    chars = list(prefix)
+    while chars:
+        position = BASE32.index(chars[-1])
+        if position + 1 < len(BASE32):
+            chars[-1] = BASE32[position + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def bounding_box(latitude, longitude, radius_km):
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    d_lng = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(latitude)), 1e-6)))
+    return latitude - d_lat, latitude + d_lat, longitude - d_lng, longitude + d_lng
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def parse_near(near, radius, default_radius_km=10, max_radius_km=500):
+    """
+    Parse ``near=lat,lng`` and ``radius`` (km) query parameters.
+    Returns (latitude, longitude, radius_km) or raises ValueError.
+    """
+    latitude, longitude = (float(part) for part in near.split(','))
+    radius_km = float(radius) if radius else default_radius_km
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('Coordinates out of range')
+    if not 0 < radius_km <= max_radius_km:
+        raise ValueError(f'radius must be between 0 and {max_radius_km} km')
+    return latitude, longitude, radius_km
+
+
+def filter_near(queryset, latitude, longitude, radius_km):
+    """
+    Restrict ``queryset`` (of a model with latitude, longitude and geohash
+    fields) to rows within ``radius_km`` of the point.
+    """
+    # Indexed range scan per covering cell: geohash LIKE 'cell%' as a btree range
+    cells = Q()
+    for cell in covering_cells(latitude, longitude, radius_km):
+        upper = prefix_upper_bound(cell)
+        cells |= Q(geohash__gte=cell, geohash__lt=upper) if upper else Q(geohash__gte=cell)
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    candidates = queryset.filter(
+        cells,
+        latitude__gte=min_lat, latitude__lte=max_lat,
+    ).values_list('pk', 'latitude', 'longitude')
+    if min_lng >= -180 and max_lng <= 180:
+        candidates = candidates.filter(longitude__gte=min_lng, longitude__lte=max_lng)
+
+    # Exact distances only for the candidates that survived the grid and box
+    nearby = [
+        pk for pk, lat, lng in candidates
+        if haversine_km(latitude, longitude, float(lat), float(lng)) <= radius_km
+    ]
+    return queryset.filter(pk__in=nearby)
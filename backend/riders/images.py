@@ -0,0 +1,266 @@
+"""
+Image rendition pipeline.
+
+After an image is uploaded, thumbnail/medium/large renditions are encoded as
+WebP plus a JPEG fallback in a process pool, written through the default
+storage under ``renditions/`` with a content hash in the name (so they can be
+cached forever), and recorded in the owning model's ``renditions`` JSON field:
+
+    {"photo": {"source": "event_photos/a.jpg", "width": 4032, "height": 3024,
+               "sizes": {"thumbnail": {"width": 320, "height": 240,
+                                       "webp": "renditions/...", "jpeg": "renditions/..."}}}}
+"""
+import hashlib
+import io
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each rendition
+RENDITION_SIZES = {
+    'thumbnail': 320,
+    'medium': 800,
+    'large': 1600,
+}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Quality used when optimize_media re-encodes an original
+OPTIMIZE_QUALITY = 85
+
+# Image.info keys carrying metadata that optimize_media strips (EXIF holds GPS positions)
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+# model label -> image fields that get renditions: only images public pages show.
+# Renditions are public files, so ID documents never get any.
+IMAGE_FIELDS = {
+    'riders.EventPhoto': ['photo'],
+    'riders.Rider': ['profile_image'],
+    'riders.Post': ['image'],
+    'riders.Benefit': ['image', 'partner_logo'],
+    'riders.MembershipApplication': ['profile_photo'],
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_PIPELINE_WORKERS)
+    return _executor
+
+
+def render(source_bytes):
+    """
+    Encode every rendition of an image. Runs in a worker process, so it only
+    deals in bytes: returns (width, height, {name: {width, height, webp, jpeg}})
+    with the encoded files as bytes.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(source_bytes)) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        renditions = {}
+        for name, edge in RENDITION_SIZES.items():
+            # Never upscale; a small original still gets its thumbnail
+            if edge >= max(width, height) and renditions:
+                continue
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+
+            webp = io.BytesIO()
+            resized.save(webp, 'WEBP', quality=WEBP_QUALITY, method=4)
+
+            if has_alpha:
+                flattened = Image.new('RGB', resized.size, (255, 255, 255))
+                flattened.paste(resized, mask=resized.getchannel('A'))
+            else:
+                flattened = resized
+            jpeg = io.BytesIO()
+            flattened.save(jpeg, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+            renditions[name] = {
+                'width': resized.width,
+                'height': resized.height,
+                'webp': webp.getvalue(),
+                'jpeg': jpeg.getvalue(),
+            }
+    return width, height, renditions
+
+
+def optimize_original(source_bytes, quality=OPTIMIZE_QUALITY):
+    """
+    Re-encode an original upload without its metadata, JPEGs as progressive.
+    Orientation is applied to the pixels before the EXIF tag is dropped and
+    colour profiles are kept. Runs in a worker process; returns
+    (encoded bytes, had_metadata), or (None, False) for formats left alone.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(source_bytes)) as original:
+        image_format = original.format
+        if image_format not in ('JPEG', 'PNG', 'WEBP') or getattr(original, 'is_animated', False):
+            return None, False
+        had_metadata = bool(original.getexif()) or any(key in original.info for key in METADATA_KEYS)
+        icc_profile = original.info.get('icc_profile')
+        image = ImageOps.exif_transpose(original)
+        # Only pass what should survive; nothing is copied over from image.info
+        image.info = {}
+
+        output = io.BytesIO()
+        if image_format == 'JPEG':
+            if image.mode not in ('RGB', 'L', 'CMYK'):
+                image = image.convert('RGB')
+            image.save(output, 'JPEG', quality=quality, optimize=True, progressive=True, icc_profile=icc_profile)
+        elif image_format == 'PNG':
+            image.save(output, 'PNG', optimize=True, icc_profile=icc_profile)
+        else:
+            image.save(output, 'WEBP', quality=quality, method=6, icc_profile=icc_profile)
+    return output.getvalue(), had_metadata
+
+
+def rendition_name(source, size, data, extension):
+    stem = posixpath.splitext(source)[0]
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f'renditions/{stem}-{size}-{digest}.{extension}'
+
+
+def save_renditions(source, result):
+    """Write encoded renditions to storage and return the JSON to record"""
+    width, height, renditions = result
+    sizes = {}
+    for size, encoded in renditions.items():
+        entry = {'width': encoded['width'], 'height': encoded['height']}
+        for fmt, extension in (('webp', 'webp'), ('jpeg', 'jpg')):
+            name = rendition_name(source, size, encoded[fmt], extension)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(encoded[fmt]))
+            entry[fmt] = name
+        sizes[size] = entry
+    return {'source': source, 'width': width, 'height': height, 'sizes': sizes}
+
+
+def record_renditions(model, pk, field_name, data):
+    """Merge one field's renditions into the row, unless the image changed meanwhile"""
+    with transaction.atomic():
+        row = model.objects.select_for_update().filter(pk=pk).values(field_name, 'renditions').first()
+        if row is None or row[field_name] != data['source']:
+            return
+        renditions = row['renditions'] or {}
+        renditions[field_name] = data
+        model.objects.filter(pk=pk).update(renditions=renditions)
+
+
+def process_image(model, pk, field_name, source, result=None):
+    """Encode (unless already done by a worker), store and record renditions"""
+    try:
+        if result is None:
+            with default_storage.open(source, 'rb') as f:
+                result = render(f.read())
+        record_renditions(model, pk, field_name, save_renditions(source, result))
+    except Exception:
+        logger.exception('Could not generate renditions for %s', source)
+
+
+def _on_rendered(model, pk, field_name, source):
+    def callback(future):
+        # Runs on the executor's result thread, which needs its own DB connection
+        close_old_connections()
+        try:
+            if future.exception() is not None:
+                logger.error('Could not generate renditions for %s', source, exc_info=future.exception())
+                return
+            process_image(model, pk, field_name, source, future.result())
+        finally:
+            connection.close()
+    return callback
+
+
+def submit(model, pk, field_name, source):
+    if not settings.IMAGE_PIPELINE_WORKERS:
+        process_image(model, pk, field_name, source)
+        return
+    try:
+        with default_storage.open(source, 'rb') as f:
+            source_bytes = f.read()
+    except OSError:
+        logger.exception('Could not read %s for renditions', source)
+        return
+    future = get_executor().submit(render, source_bytes)
+    future.add_done_callback(_on_rendered(model, pk, field_name, source))
+
+
+def pending_fields(instance):
+    """Image fields of ``instance`` whose renditions are missing or stale"""
+    renditions = instance.renditions or {}
+    pending = []
+    for field_name in IMAGE_FIELDS.get(instance._meta.label, []):
+        file = getattr(instance, field_name)
+        if file and renditions.get(field_name, {}).get('source') != file.name:
+            pending.append(field_name)
+    return pending
+
+
+def schedule_renditions(instance):
+    """Queue rendition work for new or replaced images once the save commits"""
+    model, pk = type(instance), instance.pk
+    for field_name in pending_fields(instance):
+        source = getattr(instance, field_name).name
+        transaction.on_commit(lambda f=field_name, s=source: submit(model, pk, f, s))
+
+
+def stored_names(renditions):
+    """Storage names of every file recorded in a ``renditions`` JSON value"""
+    for data in (renditions or {}).values():
+        for entry in data.get('sizes', {}).values():
+            yield entry['webp']
+            yield entry['jpeg']
+
+
+def referenced_rendition_names():
+    """Every rendition file still recorded on some row, streamed table by table"""
+    names = set()
+    for label in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        for renditions in model._default_manager.values_list('renditions', flat=True).iterator(chunk_size=2000):
+            names.update(stored_names(renditions))
+    return names
+
+
+def rendition_urls(instance, field_name, request=None):
+    """
+    ``srcset``-style map of an image's renditions for API responses, or None
+    while they are still being generated.
+    """
+    data = (instance.renditions or {}).get(field_name)
+    file = getattr(instance, field_name)
+    if not data or not file or data.get('source') != file.name:
+        return None
+
+    def url(name):
+        value = default_storage.url(name)
+        return request.build_absolute_uri(value) if request else value
+
+    return {
+        size: {
+            'width': entry['width'],
+            'height': entry['height'],
+            'webp': url(entry['webp']),
+            'jpeg': url(entry['jpeg']),
+        }
+        for size, entry in data['sizes'].items()
+    }
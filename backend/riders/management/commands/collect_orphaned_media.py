@@ -0,0 +1,117 @@
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from django.utils import timezone
+from riders import images, uploads
+from riders.models import MediaBlob, PhotoUpload
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete (or quarantine) files under MEDIA_ROOT that no FileField/ImageField or image '
+        'rendition references, once they are older than the grace period'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List what would be removed without touching anything')
+        parser.add_argument('--grace-hours', type=float, default=24, help='Only collect files last modified longer ago than this (default 24)')
+        parser.add_argument('--quarantine', metavar='DIR', help='Move orphaned files into DIR (keeping their relative paths) instead of deleting them')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        grace = timedelta(hours=options['grace_hours'])
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        quarantine = os.path.abspath(options['quarantine']) if options['quarantine'] else None
+        if quarantine and (quarantine + os.sep).startswith(media_root + os.sep):
+            raise CommandError('The quarantine directory must be outside MEDIA_ROOT')
+
+        abandoned = self.collect_abandoned_uploads(timezone.now() - grace, dry_run)
+        if not dry_run:
+            # Before the walk, so photos whose move was interrupted aren't missing their files
+            stored = uploads.store_leftover_parts(time.time() - grace.total_seconds())
+            if stored:
+                self.stdout.write(f'Finished storing {stored} completed upload(s)')
+
+        referenced = self.referenced_names()
+        self.stdout.write(f'{len(referenced)} referenced file(s)')
+
+        cutoff = time.time() - grace.total_seconds()
+        orphans, orphan_bytes, kept_recent = 0, 0, 0
+        for path, name in self.walk(media_root):
+            if name in referenced:
+                continue
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                kept_recent += 1
+                continue
+            orphans += 1
+            orphan_bytes += stat.st_size
+            if dry_run:
+                self.stdout.write(f'  {name} ({stat.st_size} bytes)')
+                continue
+            if quarantine:
+                target = os.path.join(quarantine, *name.split('/'))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+            MediaBlob.objects.filter(name=name, ref_count__lte=0).delete()
+
+        if not dry_run:
+            self.remove_empty_directories(media_root)
+
+        verb = 'Would remove' if dry_run else ('Quarantined' if quarantine else 'Removed')
+        self.stdout.write(
+            f'{verb} {orphans} orphaned file(s) ({orphan_bytes} bytes) and {abandoned} abandoned upload(s); '
+            f'{kept_recent} unreferenced file(s) are still within the grace period'
+        )
+        self.stdout.write(self.style.SUCCESS('Done'))
+
+    def referenced_names(self):
+        """Every stored name any file field or rendition points at, streamed without model instances"""
+        referenced = set()
+        for model in apps.get_models():
+            # Fields in other storages (PrivateStorage) don't live under MEDIA_ROOT
+            fields = [
+                field.name for field in model._meta.concrete_fields
+                if isinstance(field, models.FileField) and field.storage is default_storage
+            ]
+            for field_name in fields:
+                names = model._default_manager.exclude(**{field_name: ''}).values_list(field_name, flat=True)
+                referenced.update(name for name in names.iterator(chunk_size=2000) if name)
+        referenced.update(images.referenced_rendition_names())
+        return referenced
+
+    def walk(self, media_root):
+        """(path, storage name) of every file under MEDIA_ROOT, skipping hidden entries"""
+        for directory, subdirectories, filenames in os.walk(media_root):
+            # Hidden directories hold in-flight writes (blobs/.incoming)
+            subdirectories[:] = [d for d in subdirectories if not d.startswith('.')]
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(directory, filename)
+                yield path, os.path.relpath(path, media_root).replace(os.sep, '/')
+
+    def remove_empty_directories(self, media_root):
+        for directory, subdirectories, filenames in os.walk(media_root, topdown=False):
+            if directory != media_root and not os.listdir(directory):
+                os.rmdir(directory)
+
+    def collect_abandoned_uploads(self, cutoff, dry_run):
+        """Chunked photo uploads that stopped receiving chunks before ``cutoff``"""
+        stale = PhotoUpload.objects.filter(status='uploading', updated_at__lt=cutoff)
+        if dry_run:
+            return stale.count()
+        count = 0
+        for upload in stale.iterator(chunk_size=500):
+            uploads.cancel_upload(upload)
+            count += 1
+        return count
@@ -0,0 +1,96 @@
+import hashlib
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from riders import blobs, images
+from riders.storage import ContentAddressedStorage, blob_name, is_blob_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Move media saved before content-addressed storage into shared blobs, '
+        'rebuild blob reference counts and optionally prune unreferenced blobs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deduplicated without changing anything')
+        parser.add_argument('--keep-originals', action='store_true', help='Leave the original files in place after moving them into blobs')
+        parser.add_argument('--prune', action='store_true', help='Delete blobs that have been unreferenced for longer than --grace-hours')
+        parser.add_argument('--grace-hours', type=float, default=24, help='How long a blob must stay unreferenced before --prune deletes it (default 24)')
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError('The default storage is not riders.storage.ContentAddressedStorage')
+        dry_run = options['dry_run']
+
+        # legacy name -> blob name (None when the file is missing), shared across tables
+        converted = {}
+        total_before, blob_sizes = 0, {}
+        for model in blobs.tracked_models():
+            fields = blobs.file_fields(model)
+            has_renditions = model._meta.label in images.IMAGE_FIELDS
+            columns = ['pk', *fields] + (['renditions'] if has_renditions else [])
+            rows_updated = 0
+            for row in model._default_manager.values_list(*columns).iterator(chunk_size=500):
+                pk, names = row[0], row[1:1 + len(fields)]
+                renditions = row[-1] if has_renditions else None
+                updates = {}
+                for field_name, name in zip(fields, names):
+                    if not name or is_blob_name(name):
+                        continue
+                    if name not in converted:
+                        converted[name] = self.convert(name, dry_run)
+                        if converted[name]:
+                            size = default_storage.size(name)
+                            total_before += size
+                            blob_sizes[converted[name]] = size
+                    if converted[name]:
+                        updates[field_name] = converted[name]
+                        # Keep existing renditions valid for the renamed source
+                        if renditions and renditions.get(field_name, {}).get('source') == name:
+                            renditions[field_name]['source'] = converted[name]
+                            updates['renditions'] = renditions
+                if updates:
+                    rows_updated += 1
+                    if not dry_run:
+                        model._default_manager.filter(pk=pk).update(**updates)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {rows_updated} row(s) to point at blobs')
+
+        missing = sum(1 for blob in converted.values() if blob is None)
+        total_after = sum(blob_sizes.values())
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(
+            f'{verb} {len(converted) - missing} file(s) ({total_before} bytes) into '
+            f'{len(blob_sizes)} unique blob(s) ({total_after} bytes), saving {total_before - total_after} bytes'
+        )
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} referenced file(s) are missing from storage'))
+
+        if not dry_run:
+            if not options['keep_originals']:
+                for name, blob in converted.items():
+                    if blob:
+                        default_storage.delete(name)
+            fixed = blobs.recount()
+            self.stdout.write(f'Corrected {fixed} blob reference count(s)')
+
+        if options['prune']:
+            removed, removed_bytes = blobs.prune(timedelta(hours=options['grace_hours']), dry_run=dry_run)
+            self.stdout.write(f'{"Would prune" if dry_run else "Pruned"} {removed} unreferenced blob(s) ({removed_bytes} bytes)')
+
+        self.stdout.write(self.style.SUCCESS('Dry run complete' if dry_run else 'Media deduplicated'))
+
+    def convert(self, name, dry_run):
+        """Blob name of a legacy file, writing the blob unless ``dry_run``"""
+        if not default_storage.exists(name):
+            return None
+        if not dry_run:
+            with default_storage.open(name, 'rb') as f:
+                return default_storage.save(name, f)
+        digest = hashlib.sha256()
+        with default_storage.open(name, 'rb') as f:
+            for chunk in f.chunks():
+                digest.update(chunk)
+        return blob_name(digest.hexdigest(), posixpath.splitext(name)[1])
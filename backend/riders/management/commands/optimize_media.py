@@ -0,0 +1,129 @@
+import os
+from collections import defaultdict
+from multiprocessing import Pool
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from riders import blobs, images
+from riders.models import OptimizedMedia
+
+
+def optimize_file(task):
+    """Pool worker: (label, name, path, quality) -> (label, name, size, encoded, had_metadata, error)"""
+    label, name, path, quality = task
+    try:
+        with open(path, 'rb') as f:
+            source_bytes = f.read()
+        encoded, had_metadata = images.optimize_original(source_bytes, quality)
+        return label, name, len(source_bytes), encoded, had_metadata, None
+    except Exception as exc:
+        return label, name, 0, None, False, str(exc)
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-encode every uploaded image (progressive JPEG, optimized PNG/WebP) without EXIF/XMP '
+        'metadata such as GPS positions. Processed files are recorded so interrupted runs resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Encode in memory and report the bytes that would be saved per model')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+        parser.add_argument('--quality', type=int, default=images.OPTIMIZE_QUALITY, help=f'JPEG/WebP quality (default {images.OPTIMIZE_QUALITY})')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        done = set(OptimizedMedia.objects.values_list('source', flat=True))
+        done.update(OptimizedMedia.objects.values_list('result', flat=True))
+
+        # Every distinct image name, attributed to the first model referencing it
+        tasks, seen, missing = [], set(), 0
+        for model in blobs.tracked_models():
+            for field_name in self.image_fields(model):
+                names = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                for name in names.values_list(field_name, flat=True).distinct().iterator(chunk_size=2000):
+                    if name in seen or name in done:
+                        continue
+                    seen.add(name)
+                    try:
+                        path = default_storage.path(name)
+                    except NotImplementedError:
+                        path = None
+                    if path is None or not os.path.isfile(path):
+                        missing += 1
+                        continue
+                    tasks.append((model._meta.verbose_name_plural, name, path, options['quality']))
+
+        self.stdout.write(
+            f'{len(tasks)} image(s) to process, {OptimizedMedia.objects.count()} already done, {missing} missing'
+        )
+
+        # verbose name -> [files, bytes before, bytes after, files changed]
+        report = defaultdict(lambda: [0, 0, 0, 0])
+        errors = 0
+        with Pool(max(options['workers'], 1)) as pool:
+            for label, name, size, encoded, had_metadata, error in pool.imap_unordered(optimize_file, tasks, chunksize=4):
+                if error:
+                    errors += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                # Keep the original unless the new file is smaller or the original carried metadata
+                replace = encoded is not None and (had_metadata or len(encoded) < size)
+                after = len(encoded) if replace else size
+                stats = report[label]
+                stats[0] += 1
+                stats[1] += size
+                stats[2] += after
+                stats[3] += int(replace)
+                if not dry_run:
+                    self.apply(name, encoded if replace else None, size, after, had_metadata)
+
+        for label, (files, before, after, changed) in sorted(report.items()):
+            self.stdout.write(
+                f'{label}: {files} file(s), {changed} re-encoded, {before} -> {after} bytes '
+                f'({before - after} saved)'
+            )
+        total_saved = sum(before - after for _, before, after, _ in report.values())
+        if errors:
+            self.stdout.write(self.style.WARNING(f'{errors} file(s) could not be processed'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would save" if dry_run else "Saved"} {total_saved} bytes in total'
+        ))
+
+    @staticmethod
+    def image_fields(model):
+        return [
+            field.name for field in model._meta.concrete_fields
+            if isinstance(field, models.ImageField) and field.storage is default_storage
+        ]
+
+    def apply(self, name, encoded, bytes_before, bytes_after, had_metadata):
+        """Point every row at the re-encoded file and record ``name`` as processed"""
+        result = default_storage.save(name, ContentFile(encoded)) if encoded is not None else name
+        with transaction.atomic():
+            if result != name:
+                for model in blobs.tracked_models():
+                    has_renditions = model._meta.label in images.IMAGE_FIELDS
+                    for field_name in self.image_fields(model):
+                        rows = model._default_manager.filter(**{field_name: name})
+                        if has_renditions:
+                            # Renditions were rendered without metadata; keep them for the new source
+                            for pk, renditions in rows.values_list('pk', 'renditions'):
+                                if renditions.get(field_name, {}).get('source') == name:
+                                    renditions[field_name]['source'] = result
+                                    model._default_manager.filter(pk=pk).update(renditions=renditions)
+                        updated = rows.update(**{field_name: result})
+                        # QuerySet.update skips the signals that maintain blob references
+                        blobs.acquire([result] * updated)
+                        blobs.release([name] * updated)
+            OptimizedMedia.objects.update_or_create(
+                source=name,
+                defaults={
+                    'result': result,
+                    'bytes_before': bytes_before,
+                    'bytes_after': bytes_after,
+                    'had_metadata': had_metadata,
+                },
+            )
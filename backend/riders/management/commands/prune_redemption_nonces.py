@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from riders.models import RedemptionNonce
+
+
+class Command(BaseCommand):
+    help = 'Delete the used-nonce records of redemption tokens that have expired'
+
+    def handle(self, *args, **options):
+        deleted, _ = RedemptionNonce.objects.filter(expires_at__lt=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired nonce(s)'))
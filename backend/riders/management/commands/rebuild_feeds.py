@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from riders import feed
+from riders.models import Rider
+
+
+class Command(BaseCommand):
+    help = 'Re-materialize every rider\'s home feed from recent posts (e.g. after zone changes or on first deploy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='How many days of posts to load into each feed (default 30)')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        riders, entries = 0, 0
+        for rider in Rider.objects.only('pk', 'zone_id').iterator(chunk_size=500):
+            entries += feed.rebuild_timeline(rider, since)
+            riders += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {riders} feed(s) with {entries} entr{"y" if entries == 1 else "ies"}')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from riders import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for events, posts, benefits and notices'
+
+    def handle(self, *args, **options):
+        total = search.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {total} document(s)')
+        )
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from riders import redemption_tokens
+from riders.models import Benefit
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the keys a partner needs to verify its benefits' redemption tokens offline "
+        "with riders/redemption_tokens.py"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('partner', help='Partner name, as on the benefits')
+
+    def handle(self, *args, **options):
+        benefits = Benefit.objects.filter(partner_name=options['partner']).order_by('pk')
+        if not benefits.exists():
+            raise CommandError(f'No benefits for partner "{options["partner"]}"')
+        for benefit in benefits:
+            key = redemption_tokens.benefit_key(settings.REDEMPTION_TOKEN_SECRET, benefit.pk)
+            self.stdout.write(f'{benefit.pk}\t{redemption_tokens.encode_key(key)}\t{benefit.title}')
+        self.stdout.write(self.style.SUCCESS(f'{benefits.count()} key(s)'))
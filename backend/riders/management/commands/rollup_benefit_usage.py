@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from riders import rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold benefit usage recorded since the last run into the daily usage rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop the rollups and rebuild them from all usage')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rollups.reset()
+            self.stdout.write('Dropped existing rollups')
+        folded, touched = rollups.roll_up()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {folded} use(s) into {touched} daily row(s); up to date until {rollups.high_water_mark()}'
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from riders.models import RideEvent
+
+
+class Command(BaseCommand):
+    help = 'Move ride events from upcoming to ongoing to completed based on their schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and re-check every INTERVAL seconds (default: run once, e.g. from cron)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started, completed = self.advance_statuses()
+            if started or completed:
+                self.stdout.write(
+                    self.style.SUCCESS(f'{started} event(s) started, {completed} event(s) completed')
+                )
+            if not interval:
+                break
+            time.sleep(interval)
+
+    def advance_statuses(self):
+        """
+        Bulk-transition events with two UPDATE statements over the indexed
+        starts_at/ends_at columns. Cancelled events are never touched.
+        """
+        now = timezone.now()
+
+        completed = RideEvent.objects.filter(
+            ends_at__lte=now, status__in=['upcoming', 'ongoing']
+        ).update(status='completed', updated_at=now)
+
+        started = RideEvent.objects.filter(
+            starts_at__lte=now, status='upcoming'
+        ).update(status='ongoing', updated_at=now)
+
+        return started, completed
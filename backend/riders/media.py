@@ -0,0 +1,136 @@
+"""
+Serving files from MEDIA_ROOT.
+
+Strong ETags come from the content hash in blob names (and from the file's
+size and mtime otherwise), conditional requests and single byte ranges are
+answered here, and with ``MEDIA_SENDFILE`` set the bytes themselves are left
+to the front proxy through ``X-Accel-Redirect`` (nginx) or ``X-Sendfile``
+(Apache, lighttpd).
+
+Only the directories of public uploads are served; anything else under
+MEDIA_ROOT (such as ID documents saved before they moved to PrivateStorage)
+is a 404 here.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.utils._os import safe_join
+from django.utils.http import parse_http_date_safe
+
+from .storage import is_blob_name
+
+# Content-addressed files never change, so caches may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=3600'
+
+BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOB_DIGEST_RE = re.compile(r'([0-9a-f]{64})(\.[^/]*)?$')
+
+# Directories of the files public pages show: blobs and renditions of public image
+# fields, and the upload_to directories they were saved under before deduplication
+PUBLIC_PREFIXES = (
+    'blobs/',
+    'renditions/',
+    'event_photos/',
+    'profile_images/',
+    'post_images/',
+    'benefits/',
+    'partner_logos/',
+    'applications/profile_photos/',
+)
+
+PRIVATE_CACHE_CONTROL = 'private, no-store'
+
+
+def resolve(path):
+    """Absolute path of a media file, or None if it doesn't exist or isn't servable"""
+    path = posixpath.normpath(path).lstrip('/')
+    if any(part.startswith('.') for part in path.split('/')):
+        # Hidden files, including blobs/.incoming spools
+        return None
+    if not path.startswith(PUBLIC_PREFIXES):
+        return None
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except ValueError:
+        return None
+    return full_path if os.path.isfile(full_path) else None
+
+
+def is_immutable(path):
+    return is_blob_name(posixpath.normpath(path).lstrip('/'))
+
+
+def make_etag(path, stat):
+    match = BLOB_DIGEST_RE.search(path) if is_immutable(path) else None
+    if match:
+        return f'"{match.group(1)}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def content_type(full_path):
+    mime_type, _ = mimetypes.guess_type(full_path)
+    return mime_type or 'application/octet-stream'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive of a single ``Range: bytes=`` spec, None to serve the
+    whole file (no header, or one we don't handle such as multiple ranges), or
+    False when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            # Nothing to send: an empty file has no last bytes
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def if_range_matches(header, etag, last_modified):
+    """Whether an ``If-Range`` validator still matches, so the Range header applies"""
+    header = header.strip()
+    if header.startswith('"'):
+        return header == etag
+    return parse_http_date_safe(header) == last_modified
+
+
+def read_range(full_path, start, length):
+    """Yield ``length`` bytes of a file from ``start``, one block at a time"""
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def sendfile_headers(path, full_path):
+    """Headers handing the transfer to the front proxy, or None when serving from Python"""
+    mode = settings.MEDIA_SENDFILE
+    if mode == 'x-accel-redirect':
+        location = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(posixpath.normpath(path).lstrip('/'))
+        return {'X-Accel-Redirect': location}
+    if mode == 'x-sendfile':
+        return {'X-Sendfile': full_path}
+    return None
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_participant_count(apps, schema_editor):
+    RideEvent = apps.get_model('riders', 'RideEvent')
+    for event in RideEvent.objects.annotate(joined=Count('participants')).iterator():
+        RideEvent.objects.filter(pk=event.pk).update(participant_count=event.joined)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0012_add_is_featured'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rideevent',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of participants'),
+        ),
+        migrations.RunPython(backfill_participant_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0013_rideevent_participant_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rideevent',
+            index=models.Index(fields=['status', 'date'], name='rideevent_status_date_idx'),
+        ),
+    ]
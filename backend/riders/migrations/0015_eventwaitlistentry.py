@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0014_rideevent_status_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventWaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(help_text='Queue order within the event (lower is served first)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='riders.rideevent')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlisted_events', to='riders.rider')),
+            ],
+            options={
+                'verbose_name': 'Waitlist Entry',
+                'verbose_name_plural': 'Waitlist Entries',
+                'ordering': ['event', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'rider'), name='unique_waitlist_rider'), models.UniqueConstraint(fields=('event', 'position'), name='unique_waitlist_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:40
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_schedule(apps, schema_editor):
+    RideEvent = apps.get_model('riders', 'RideEvent')
+    for event in RideEvent.objects.only('date', 'time', 'end_date').iterator():
+        starts_at = timezone.make_aware(datetime.datetime.combine(event.date, event.time))
+        ends_at = event.end_date or timezone.make_aware(
+            datetime.datetime.combine(event.date + datetime.timedelta(days=1), datetime.time.min)
+        )
+        RideEvent.objects.filter(pk=event.pk).update(starts_at=starts_at, ends_at=ends_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0015_eventwaitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rideevent',
+            name='ends_at',
+            field=models.DateTimeField(db_index=True, editable=False, help_text='end_date, or the end of the event day', null=True),
+        ),
+        migrations.AddField(
+            model_name='rideevent',
+            name='starts_at',
+            field=models.DateTimeField(db_index=True, editable=False, help_text='date + time, kept in sync on save', null=True),
+        ),
+        migrations.RunPython(backfill_schedule, migrations.RunPython.noop),
+    ]
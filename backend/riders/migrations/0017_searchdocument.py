@@ -0,0 +1,75 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+# Must match riders.search.PG_DOCUMENT_VECTOR so queries can use the index
+PG_DOCUMENT_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')"
+)
+
+SQLITE_FTS_SQL = [
+    """CREATE VIRTUAL TABLE riders_searchdocument_fts USING fts5(
+        title, body, content='riders_searchdocument', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER riders_searchdocument_fts_ai AFTER INSERT ON riders_searchdocument BEGIN
+        INSERT INTO riders_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER riders_searchdocument_fts_ad AFTER DELETE ON riders_searchdocument BEGIN
+        INSERT INTO riders_searchdocument_fts(riders_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER riders_searchdocument_fts_au AFTER UPDATE ON riders_searchdocument BEGIN
+        INSERT INTO riders_searchdocument_fts(riders_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO riders_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+
+def create_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX riders_searchdocument_vector_idx ON riders_searchdocument USING GIN (({PG_DOCUMENT_VECTOR}))'
+        )
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FTS_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS riders_searchdocument_vector_idx')
+    elif vendor == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS riders_searchdocument_fts_{trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS riders_searchdocument_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0016_rideevent_starts_at_ends_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('event', 'Ride Event'), ('post', 'Post'), ('benefit', 'Benefit'), ('notice', 'Notice')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
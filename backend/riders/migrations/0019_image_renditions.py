@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0018_event_benefit_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='benefit',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Generated image renditions (see riders.images)'),
+        ),
+        migrations.AddField(
+            model_name='eventphoto',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Generated image renditions (see riders.images)'),
+        ),
+        migrations.AddField(
+            model_name='membershipapplication',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Generated image renditions (see riders.images)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Generated image renditions (see riders.images)'),
+        ),
+        migrations.AddField(
+            model_name='rider',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Generated image renditions (see riders.images)'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:48
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0019_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('caption', models.CharField(blank=True, max_length=200)),
+                ('size', models.PositiveBigIntegerField(help_text='Total size of the file in bytes')),
+                ('sha256', models.CharField(blank=True, help_text='Optional hex SHA-256 of the whole file', max_length=64)),
+                ('received', models.PositiveBigIntegerField(default=0, help_text='Bytes received so far (the resume offset)')),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete')], default='uploading', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to='riders.rideevent')),
+                ('photo', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='riders.eventphoto')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to='riders.rider')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['event', 'rider', 'status'], name='photoupload_event_rider_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0020_photoupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name (blobs/aa/bb/<sha256>.ext)', max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Last time the reference count changed')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='mediablob_unreferenced_idx')],
+            },
+        ),
+    ]
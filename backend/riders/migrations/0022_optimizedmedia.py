@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0021_mediablob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptimizedMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Storage name before optimization', max_length=255, unique=True)),
+                ('result', models.CharField(db_index=True, help_text='Storage name now referenced (same as source if kept)', max_length=255)),
+                ('bytes_before', models.PositiveBigIntegerField()),
+                ('bytes_after', models.PositiveBigIntegerField()),
+                ('had_metadata', models.BooleanField(default=False)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Optimized Media',
+                'verbose_name_plural': 'Optimized Media',
+            },
+        ),
+    ]
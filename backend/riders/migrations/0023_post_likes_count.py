@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_likes_count(apps, schema_editor):
+    Post = apps.get_model('riders', 'Post')
+    for post in Post.objects.annotate(liked=Count('likes')).iterator():
+        Post.objects.filter(pk=post.pk).update(likes_count=post.liked)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0022_optimizedmedia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of likes'),
+        ),
+        migrations.RunPython(backfill_likes_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0023_post_likes_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranked_at', models.DateTimeField(help_text="Post time plus the boost for the reason, the feed's sort key")),
+                ('reason', models.CharField(choices=[('own', 'Own post'), ('organizer', 'Organizer of a joined event'), ('zone', 'Same zone')], max_length=20)),
+            ],
+            options={
+                'verbose_name': 'Feed Entry',
+                'verbose_name_plural': 'Feed Entries',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='feed_pull',
+            field=models.BooleanField(default=False, editable=False, help_text='Merged into feeds at read time instead of fanned out (audience too large)'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('feed_pull', True)), fields=['author', 'created_at'], name='post_feed_pull_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='riders.post'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='rider',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='riders.rider'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['rider', '-ranked_at', '-post'], name='feedentry_timeline_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('rider', 'post'), name='unique_feed_entry'),
+        ),
+    ]
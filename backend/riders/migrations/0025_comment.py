@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0024_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(max_length=2000)),
+                ('path', models.CharField(editable=False, max_length=255)),
+                ('depth', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('reply_count', models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of replies at any depth')),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='riders.rider')),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='riders.rideevent')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='riders.comment')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='riders.post')),
+            ],
+            options={
+                'ordering': ['path'],
+                'indexes': [models.Index(fields=['post', 'path'], name='comment_post_path_idx'), models.Index(fields=['event', 'path'], name='comment_event_path_idx'), models.Index(condition=models.Q(('parent__isnull', True)), fields=['post', 'path'], name='comment_post_roots_idx'), models.Index(condition=models.Q(('parent__isnull', True)), fields=['event', 'path'], name='comment_event_roots_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('event__isnull', True), ('post__isnull', False)), models.Q(('event__isnull', False), ('post__isnull', True)), _connector='OR'), name='comment_single_target')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_usage_counters(apps, schema_editor):
+    BenefitUsage = apps.get_model('riders', 'BenefitUsage')
+    BenefitUsageCounter = apps.get_model('riders', 'BenefitUsageCounter')
+    counts = BenefitUsage.objects.order_by().values('rider_id', 'benefit_id').annotate(used=Count('pk'))
+    BenefitUsageCounter.objects.bulk_create(
+        (BenefitUsageCounter(rider_id=row['rider_id'], benefit_id=row['benefit_id'], count=row['used']) for row in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0025_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BenefitUsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('benefit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_counters', to='riders.benefit')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='benefit_usage_counters', to='riders.rider')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('rider', 'benefit'), name='unique_benefit_usage_counter')],
+            },
+        ),
+        migrations.RunPython(backfill_usage_counters, migrations.RunPython.noop),
+    ]
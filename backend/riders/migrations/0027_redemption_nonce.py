@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0026_benefit_usage_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedemptionNonce',
+            fields=[
+                ('nonce', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0027_redemption_nonce'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BenefitUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('partner_name', models.CharField(blank=True, max_length=200)),
+                ('uses', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'benefit'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('high_water_mark', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='benefitusage',
+            index=models.Index(fields=['used_at'], name='benefitusage_used_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='benefitusagedaily',
+            name='benefit',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='riders.benefit'),
+        ),
+        migrations.AddField(
+            model_name='benefitusagedaily',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='riders.benefitcategory'),
+        ),
+        migrations.AddField(
+            model_name='benefitusagedaily',
+            name='zone',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_benefit_usage', to='riders.zone'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitusagedaily',
+            index=models.Index(fields=['benefit', 'day'], name='benefitdaily_benefit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitusagedaily',
+            index=models.Index(fields=['partner_name', 'day'], name='benefitdaily_partner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitusagedaily',
+            index=models.Index(fields=['category', 'day'], name='benefitdaily_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitusagedaily',
+            index=models.Index(fields=['zone', 'day'], name='benefitdaily_zone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitusagedaily',
+            index=models.Index(fields=['day'], name='benefitdaily_day_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0028_benefit_usage_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rider',
+            name='membership_level',
+            field=models.CharField(choices=[('basic', 'Basic'), ('premium', 'Premium'), ('vip', 'VIP')], default='basic', help_text='Tier deciding which benefits the rider is entitled to', max_length=20),
+        ),
+    ]
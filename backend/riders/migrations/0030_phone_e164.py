@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:08
+
+import riders.phones
+from django.db import migrations, models
+from riders.phones import to_e164
+
+
+def backfill_phones(apps, schema_editor):
+    MembershipApplication = apps.get_model('riders', 'MembershipApplication')
+    Rider = apps.get_model('riders', 'Rider')
+    for pk, phone in MembershipApplication.objects.values_list('pk', 'phone').iterator():
+        try:
+            canonical = to_e164(phone)
+        except ValueError:
+            continue
+        if canonical != phone:
+            MembershipApplication.objects.filter(pk=pk).update(phone=canonical)
+    # Usernames are the phone numbers riders registered with; the oldest account keeps a duplicate
+    taken = set()
+    for pk, username in Rider.objects.order_by('pk').values_list('pk', 'user__username').iterator():
+        try:
+            canonical = to_e164(username)
+        except ValueError:
+            continue
+        if canonical not in taken:
+            taken.add(canonical)
+            Rider.objects.filter(pk=pk).update(phone=canonical)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0029_rider_membership_level'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rider',
+            name='phone',
+            field=models.CharField(blank=True, help_text='Login phone number, stored in E.164 (+8801XXXXXXXXX)', max_length=16, null=True, unique=True, validators=[riders.phones.validate_phone]),
+        ),
+        migrations.AlterField(
+            model_name='membershipapplication',
+            name='phone',
+            field=models.CharField(help_text='Stored in E.164 (+8801XXXXXXXXX)', max_length=20, validators=[riders.phones.validate_phone]),
+        ),
+        migrations.RunPython(backfill_phones, migrations.RunPython.noop),
+    ]
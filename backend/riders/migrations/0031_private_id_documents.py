@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:24
+
+import posixpath
+
+import riders.storage
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.db.models import F
+from riders.storage import is_blob_name, private_storage
+
+DOCUMENT_FIELDS = {
+    'id_document_photo': 'applications/id_documents/',
+    'holding_id_photo': 'applications/holding_id/',
+}
+
+
+def move_id_documents(apps, schema_editor):
+    """Move ID documents out of MEDIA_ROOT (and out of shared blobs) into PrivateStorage"""
+    MembershipApplication = apps.get_model('riders', 'MembershipApplication')
+    MediaBlob = apps.get_model('riders', 'MediaBlob')
+    storage = private_storage()
+    for field_name, directory in DOCUMENT_FIELDS.items():
+        rows = MembershipApplication.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        for pk, name in rows.values_list('pk', field_name).iterator():
+            if not default_storage.exists(name):
+                continue
+            with default_storage.open(name, 'rb') as f:
+                private_name = storage.save(directory + posixpath.basename(name), f)
+            MembershipApplication.objects.filter(pk=pk).update(**{field_name: private_name})
+            if is_blob_name(name):
+                # Only drop the public copy once nothing else references the content
+                MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1)
+                if MediaBlob.objects.filter(name=name, ref_count__gt=0).exists():
+                    continue
+                MediaBlob.objects.filter(name=name).delete()
+            default_storage.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0030_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='membershipapplication',
+            name='holding_id_photo',
+            field=models.ImageField(blank=True, null=True, storage=riders.storage.private_storage, upload_to='applications/holding_id/'),
+        ),
+        migrations.AlterField(
+            model_name='membershipapplication',
+            name='id_document_photo',
+            field=models.ImageField(blank=True, null=True, storage=riders.storage.private_storage, upload_to='applications/id_documents/'),
+        ),
+        migrations.RunPython(move_id_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.core.files.storage import default_storage
+from django.db import migrations
+from riders.images import referenced_rendition_names, stored_names
+
+DOCUMENT_FIELDS = ('id_document_photo', 'holding_id_photo')
+
+
+def drop_id_document_renditions(apps, schema_editor):
+    """Delete the public renditions generated for ID documents and forget them"""
+    MembershipApplication = apps.get_model('riders', 'MembershipApplication')
+    MediaBlob = apps.get_model('riders', 'MediaBlob')
+    dropped = set()
+    for pk, renditions in MembershipApplication.objects.exclude(renditions={}).values_list('pk', 'renditions').iterator():
+        if not any(field_name in (renditions or {}) for field_name in DOCUMENT_FIELDS):
+            continue
+        for field_name in DOCUMENT_FIELDS:
+            dropped.update(stored_names({field_name: renditions.pop(field_name, None) or {}}))
+        MembershipApplication.objects.filter(pk=pk).update(renditions=renditions)
+    if not dropped:
+        return
+
+    # Renditions are content-addressed: keep any file another image still uses
+    in_use = referenced_rendition_names()
+    in_use.update(MediaBlob.objects.filter(name__in=dropped, ref_count__gt=0).values_list('name', flat=True))
+    for name in dropped - in_use:
+        default_storage.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('riders', '0031_private_id_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_id_document_renditions, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,17 @@
-from django.db import models
+import uuid
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
+from . import geo, phones
+from .storage import private_storage
+
+def compute_geohash(latitude, longitude):
+    """Geohash grid cell used to index coordinates for radius lookups"""
+    if latitude is None or longitude is None:
+        return ''
+    return geo.encode(float(latitude), float(longitude))
 
 class Zone(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -51,7 +63,7 @@ class MembershipApplication(models.Model):
     profile_photo = models.ImageField(upload_to='applications/profile_photos/', null=True, blank=True)
     full_name = models.CharField(max_length=200)
     email = models.EmailField(blank=True, null=True)
-    phone = models.CharField(max_length=20)
+    phone = models.CharField(max_length=20, validators=[phones.validate_phone], help_text="Stored in E.164 (+8801XXXXXXXXX)")
     alternative_phone = models.CharField(max_length=20, blank=True, null=True)
     date_of_birth = models.DateField()
     blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES)
@@ -63,8 +75,9 @@ class MembershipApplication(models.Model):
     # Identity Verification
     id_document_type = models.CharField(max_length=20, choices=ID_DOCUMENT_CHOICES)
     id_document_number = models.CharField(max_length=50)
-    id_document_photo = models.ImageField(upload_to='applications/id_documents/', null=True, blank=True)
-    holding_id_photo = models.ImageField(upload_to='applications/holding_id/', null=True, blank=True)
+    id_document_photo = models.ImageField(upload_to='applications/id_documents/', storage=private_storage, null=True, blank=True)
+    holding_id_photo = models.ImageField(upload_to='applications/holding_id/', storage=private_storage, null=True, blank=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Generated image renditions (see riders.images)")
     
     # Emergency Contact
     emergency_contact = models.CharField(max_length=200)
@@ -86,6 +99,14 @@ class MembershipApplication(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def save(self, *args, **kwargs):
+        try:
+            self.phone = phones.to_e164(self.phone)
+        except ValueError:
+            # Applications saved before numbers were validated keep what was typed
+            pass
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.full_name} - {self.status}"
     
@@ -98,19 +119,34 @@ class Rider(models.Model):
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
     ]
+    MEMBERSHIP_LEVEL_CHOICES = [
+        ('basic', 'Basic'),
+        ('premium', 'Premium'),
+        ('vip', 'VIP'),
+    ]
 
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    phone = models.CharField(max_length=16, unique=True, null=True, blank=True, validators=[phones.validate_phone], help_text="Login phone number, stored in E.164 (+8801XXXXXXXXX)")
     bio = models.TextField(max_length=500, blank=True)
     location = models.CharField(max_length=100, blank=True)
     bike_model = models.CharField(max_length=100, blank=True)
     custom_user_type = models.CharField(max_length=100, blank=True, help_text="Custom user type/title (e.g., 'Adventure Rider', 'Speed Enthusiast', etc.)")
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Generated image renditions (see riders.images)")
     membership_status = models.CharField(max_length=20, choices=MEMBERSHIP_STATUS_CHOICES, default='pending')
+    membership_level = models.CharField(max_length=20, choices=MEMBERSHIP_LEVEL_CHOICES, default='basic', help_text="Tier deciding which benefits the rider is entitled to")
     zone = models.ForeignKey(Zone, on_delete=models.SET_NULL, null=True, blank=True)
     is_featured = models.BooleanField(default=False, help_text="Mark this rider as a featured team controller")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        if self.phone:
+            self.phone = phones.to_e164(self.phone)
+        else:
+            self.phone = None
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.user.username} - {self.bike_model}"
 
@@ -125,9 +161,14 @@ class RideEvent(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     location = models.CharField(max_length=200)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     date = models.DateField()
     time = models.TimeField()
     end_date = models.DateTimeField(blank=True, null=True, help_text="For multi-day events")
+    starts_at = models.DateTimeField(editable=False, null=True, db_index=True, help_text="date + time, kept in sync on save")
+    ends_at = models.DateTimeField(editable=False, null=True, db_index=True, help_text="end_date, or the end of the event day")
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text="Event price in BDT")
     duration = models.CharField(max_length=100, blank=True, help_text="Event duration (e.g., '3 hours', '3 days, 2 nights')")
     requirements = models.TextField(blank=True, help_text="Requirements for the event")
@@ -136,6 +177,7 @@ class RideEvent(models.Model):
     organizer_name = models.CharField(max_length=200, blank=True, help_text="Organization/team name (e.g., 'Dhaka Zone Team')")
     participants = models.ManyToManyField(Rider, related_name='joined_events', blank=True)
     max_participants = models.IntegerField(default=20)
+    participant_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of participants")
     photos = models.JSONField(default=list, blank=True, help_text="List of photo URLs for completed events")
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -146,27 +188,150 @@ class RideEvent(models.Model):
     
     @property
     def current_joined(self):
-        return self.participants.count()
+        return self.participant_count
+
+    def has_participant(self, rider):
+        """Check registration against the unique (event, rider) index"""
+        return RideEvent.participants.through.objects.filter(
+            rideevent_id=self.pk, rider_id=rider.pk
+        ).exists()
+
+    def add_participant(self, rider):
+        """
+        Claim a seat and register the rider in a single transaction.
+
+        The seat is claimed with a conditional UPDATE so capacity is enforced by
+        the database even under concurrent joins. Returns False if the event is
+        full or no longer open; raises IntegrityError if already registered.
+        """
+        with transaction.atomic():
+            claimed = RideEvent.objects.filter(
+                pk=self.pk,
+                status='upcoming',
+                participant_count__lt=F('max_participants'),
+            ).update(participant_count=F('participant_count') + 1)
+            if not claimed:
+                return False
+            RideEvent.participants.through.objects.create(rideevent_id=self.pk, rider_id=rider.pk)
+            self.waitlist_entries.filter(rider=rider).delete()
+        self.refresh_from_db(fields=['participant_count'])
+        return True
+
+    def remove_participant(self, rider):
+        """Unregister the rider and release the seat. Returns False if not registered."""
+        with transaction.atomic():
+            deleted, _ = RideEvent.participants.through.objects.filter(
+                rideevent_id=self.pk, rider_id=rider.pk
+            ).delete()
+            if not deleted:
+                return False
+            RideEvent.objects.filter(pk=self.pk).update(participant_count=F('participant_count') - 1)
+        self.refresh_from_db(fields=['participant_count'])
+        return True
+
+    def add_to_waitlist(self, rider):
+        """
+        Queue the rider behind everyone already waiting. The event row is locked
+        so concurrent requests get distinct positions.
+        """
+        with transaction.atomic():
+            RideEvent.objects.select_for_update().filter(pk=self.pk).exists()
+            last = self.waitlist_entries.aggregate(last=models.Max('position'))['last'] or 0
+            return EventWaitlistEntry.objects.create(event=self, rider=rider, position=last + 1)
+
+    def promote_waitlist(self):
+        """
+        Move waitlisted riders into free seats, in queue order, as one batched
+        transaction. Returns the number of riders promoted.
+        """
+        with transaction.atomic():
+            event = RideEvent.objects.select_for_update().get(pk=self.pk)
+            free_seats = event.max_participants - event.participant_count
+            if free_seats <= 0 or event.status != 'upcoming':
+                return 0
+            entries = list(
+                event.waitlist_entries.exclude(rider__joined_events=event).order_by('position')[:free_seats]
+            )
+            if not entries:
+                return 0
+            Participant = RideEvent.participants.through
+            Participant.objects.bulk_create([
+                Participant(rideevent_id=event.pk, rider_id=entry.rider_id) for entry in entries
+            ])
+            EventWaitlistEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+            RideEvent.objects.filter(pk=event.pk).update(participant_count=F('participant_count') + len(entries))
+        self.refresh_from_db(fields=['participant_count'])
+        return len(entries)
+
+    @staticmethod
+    def compute_schedule(date, time, end_date):
+        """Return (starts_at, ends_at) for the given date, time and optional end_date"""
+        import datetime
+        from django.utils import timezone
+        starts_at = timezone.make_aware(datetime.datetime.combine(date, time))
+        if end_date:
+            ends_at = end_date
+        else:
+            ends_at = timezone.make_aware(datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time.min))
+        return starts_at, ends_at
+
+    def save(self, *args, **kwargs):
+        self.geohash = compute_geohash(self.latitude, self.longitude)
+        if self.date and self.time:
+            self.starts_at, self.ends_at = self.compute_schedule(self.date, self.time, self.end_date)
+        
+        # participant_count is maintained by atomic UPDATEs; never write back a stale copy
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'participant_count'
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def is_upcoming(self):
-        from django.utils import timezone
-        today = timezone.now().date()
-        return self.date >= today and self.status == 'upcoming'
+        # Status is kept current by the update_event_status command
+        return self.status == 'upcoming'
     
     @property
     def is_past(self):
-        from django.utils import timezone
-        today = timezone.now().date()
-        return self.date < today or self.status == 'completed'
+        return self.status == 'completed'
 
     class Meta:
         ordering = ['date']
+        indexes = [
+            models.Index(fields=['status', 'date'], name='rideevent_status_date_idx'),
+        ]
+
+class EventWaitlistEntry(models.Model):
+    """A rider queued for a seat on a full event"""
+    event = models.ForeignKey(RideEvent, on_delete=models.CASCADE, related_name='waitlist_entries')
+    rider = models.ForeignKey(Rider, on_delete=models.CASCADE, related_name='waitlisted_events')
+    position = models.PositiveIntegerField(help_text="Queue order within the event (lower is served first)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['event', 'position']
+        verbose_name = "Waitlist Entry"
+        verbose_name_plural = "Waitlist Entries"
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'rider'], name='unique_waitlist_rider'),
+            models.UniqueConstraint(fields=['event', 'position'], name='unique_waitlist_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.rider.user.username} waiting for {self.event.title} (#{self.position})"
+
+    @property
+    def place(self):
+        """1-based place in the queue, counted over the (event, position) index"""
+        return self.event.waitlist_entries.filter(position__lt=self.position).count() + 1
 
 class EventPhoto(models.Model):
     """Model to store uploaded photos for events"""
     event = models.ForeignKey(RideEvent, on_delete=models.CASCADE, related_name='uploaded_photos')
     photo = models.ImageField(upload_to='event_photos/', help_text="Upload event photos")
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Generated image renditions (see riders.images)")
     caption = models.CharField(max_length=200, blank=True, help_text="Optional caption for the photo")
     uploaded_by = models.ForeignKey(Rider, on_delete=models.SET_NULL, null=True, blank=True, help_text="Who uploaded this photo")
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -179,20 +344,240 @@ class EventPhoto(models.Model):
     def __str__(self):
         return f"Photo for {self.event.title} - {self.uploaded_at.strftime('%Y-%m-%d')}"
 
+class PhotoUpload(models.Model):
+    """A resumable, chunked upload of one event photo (see riders.uploads)"""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    event = models.ForeignKey(RideEvent, on_delete=models.CASCADE, related_name='photo_uploads')
+    rider = models.ForeignKey(Rider, on_delete=models.CASCADE, related_name='photo_uploads')
+    filename = models.CharField(max_length=255)
+    caption = models.CharField(max_length=200, blank=True)
+    size = models.PositiveBigIntegerField(help_text="Total size of the file in bytes")
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Optional hex SHA-256 of the whole file")
+    received = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far (the resume offset)")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    photo = models.OneToOneField(EventPhoto, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['event', 'rider', 'status'], name='photoupload_event_rider_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} for {self.event.title} ({self.received}/{self.size})"
+
+    @property
+    def is_received(self):
+        return self.received >= self.size
+
 class Post(models.Model):
     author = models.ForeignKey(Rider, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     content = models.TextField()
     image = models.ImageField(upload_to='post_images/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Generated image renditions (see riders.images)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     likes = models.ManyToManyField(Rider, related_name='liked_posts', blank=True)
+    likes_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of likes")
+    feed_pull = models.BooleanField(default=False, editable=False, help_text="Merged into feeds at read time instead of fanned out (audience too large)")
 
     def __str__(self):
         return self.title
 
+    def is_liked_by(self, rider):
+        """Check the like against the unique (post, rider) index"""
+        return Post.likes.through.objects.filter(post_id=self.pk, rider_id=rider.pk).exists()
+
+    def toggle_like(self, rider):
+        """
+        Like the post, or unlike it if the rider already does. The like row and
+        the stored counter change in one transaction, at the same cost however
+        many likes the post has. Returns True if the post is now liked.
+        """
+        Like = Post.likes.through
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(post_id=self.pk, rider_id=rider.pk).delete()
+            if deleted:
+                Post.objects.filter(pk=self.pk).update(likes_count=F('likes_count') - 1)
+                liked = False
+            else:
+                try:
+                    with transaction.atomic():
+                        Like.objects.create(post_id=self.pk, rider_id=rider.pk)
+                except IntegrityError:
+                    # A concurrent request from the same rider liked it first
+                    liked = True
+                else:
+                    Post.objects.filter(pk=self.pk).update(likes_count=F('likes_count') + 1)
+                    liked = True
+        self.refresh_from_db(fields=['likes_count'])
+        return liked
+
+    def save(self, *args, **kwargs):
+        # likes_count and feed_pull are maintained by UPDATEs; never write back a stale copy
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('likes_count', 'feed_pull')
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['author', 'created_at'], condition=models.Q(feed_pull=True), name='post_feed_pull_idx'),
+        ]
+
+class FeedEntry(models.Model):
+    """A post materialized into a rider's home feed when it was written (see riders.feed)"""
+    REASON_CHOICES = [
+        ('own', 'Own post'),
+        ('organizer', 'Organizer of a joined event'),
+        ('zone', 'Same zone'),
+    ]
+
+    rider = models.ForeignKey(Rider, on_delete=models.CASCADE, related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_entries')
+    ranked_at = models.DateTimeField(help_text="Post time plus the boost for the reason, the feed's sort key")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+
+    class Meta:
+        verbose_name = "Feed Entry"
+        verbose_name_plural = "Feed Entries"
+        constraints = [
+            models.UniqueConstraint(fields=['rider', 'post'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['rider', '-ranked_at', '-post'], name='feedentry_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post.title} in {self.rider.user.username}'s feed"
+
+class Comment(models.Model):
+    """
+    A comment on a post or a ride event, threaded with a materialized path.
+
+    ``path`` is the chain of ids from the thread root down to this comment,
+    each zero-padded to PATH_SEGMENT_LENGTH digits, so ordering by path
+    lists a whole tree depth-first and a subtree is one range on the
+    (post, path) or (event, path) index.
+    """
+    PATH_SEGMENT_LENGTH = 10
+    MAX_DEPTH = 8
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='comments')
+    event = models.ForeignKey(RideEvent, on_delete=models.CASCADE, null=True, blank=True, related_name='comments')
+    author = models.ForeignKey(Rider, on_delete=models.CASCADE, related_name='comments')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    content = models.TextField(max_length=2000)
+    path = models.CharField(max_length=255, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of replies at any depth")
+    is_deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['path']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(post__isnull=False, event__isnull=True) | models.Q(post__isnull=True, event__isnull=False),
+                name='comment_single_target',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+            models.Index(fields=['event', 'path'], name='comment_event_path_idx'),
+            # Thread roots only, for listing the top threads of a busy post or event
+            models.Index(fields=['post', 'path'], name='comment_post_roots_idx', condition=models.Q(parent__isnull=True)),
+            models.Index(fields=['event', 'path'], name='comment_event_roots_idx', condition=models.Q(parent__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.author.user.username} on {self.post or self.event}"
+
+    @classmethod
+    def segment(cls, pk):
+        return str(pk).zfill(cls.PATH_SEGMENT_LENGTH)
+
+    def ancestor_ids(self):
+        """Ids from the thread root down to (and including) this comment, read off the path"""
+        size = self.PATH_SEGMENT_LENGTH
+        return [int(self.path[i:i + size]) for i in range(0, len(self.path), size)]
+
+    def subtree_bounds(self):
+        """(lower, upper) path range strictly containing this comment's replies"""
+        ids = self.ancestor_ids()
+        upper = self.path[:-self.PATH_SEGMENT_LENGTH] + self.segment(ids[-1] + 1)
+        return self.path, upper
+
+    @classmethod
+    def add(cls, author, content, post=None, event=None, parent=None):
+        """
+        Create a comment (or a reply to ``parent``) and bump the reply count of
+        every ancestor in one UPDATE. Replies deeper than MAX_DEPTH are attached
+        to the deepest allowed ancestor instead.
+        """
+        with transaction.atomic():
+            if parent is not None:
+                # Locked so a concurrent remove() can't delete it from under the reply
+                if parent.depth >= cls.MAX_DEPTH:
+                    parent = cls.objects.select_for_update().get(pk=parent.ancestor_ids()[cls.MAX_DEPTH - 1])
+                else:
+                    parent = cls.objects.select_for_update().get(pk=parent.pk)
+            comment = cls.objects.create(
+                author=author,
+                content=content,
+                post=post,
+                event=event,
+                parent=parent,
+                depth=parent.depth + 1 if parent else 0,
+            )
+            comment.path = (parent.path if parent else '') + cls.segment(comment.pk)
+            cls.objects.filter(pk=comment.pk).update(path=comment.path)
+            if parent is not None:
+                cls.objects.filter(pk__in=parent.ancestor_ids()).update(reply_count=F('reply_count') + 1)
+        return comment
+
+    def remove(self):
+        """
+        Delete the comment and decrement its ancestors' reply counts. A comment
+        with replies is blanked instead so its thread stays intact.
+        Returns True if the row was deleted.
+        """
+        with transaction.atomic():
+            current = type(self).objects.select_for_update().get(pk=self.pk)
+            if current.reply_count:
+                self.is_deleted, self.content = True, ''
+                type(self).objects.filter(pk=self.pk).update(is_deleted=True, content='', updated_at=timezone.now())
+                return False
+            ancestors = current.ancestor_ids()[:-1]
+            current.delete()
+            if ancestors:
+                type(self).objects.filter(pk__in=ancestors).update(reply_count=F('reply_count') - 1)
+        return True
+
+    def thread_filter(self):
+        """Lookup selecting the comments on the same post or event, matching the path indexes"""
+        return {'post_id': self.post_id} if self.post_id else {'event_id': self.event_id}
+
+    def save(self, *args, **kwargs):
+        # reply_count is maintained by atomic UPDATEs; never write back a stale copy
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reply_count'
+            ]
+        super().save(*args, **kwargs)
 
 class BenefitCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -218,6 +603,13 @@ class Benefit(models.Model):
         ('premium', 'Premium Members'),
         ('vip', 'VIP Members'),
     ]
+    # Rider membership levels entitled to a benefit of each level
+    ENTITLED_LEVELS = {
+        'all': ('basic', 'premium', 'vip'),
+        'basic': ('basic', 'premium', 'vip'),
+        'premium': ('premium', 'vip'),
+        'vip': ('vip',),
+    }
 
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -228,12 +620,16 @@ class Benefit(models.Model):
     # Partner/Vendor Information
     partner_name = models.CharField(max_length=200, blank=True)
     partner_logo = models.ImageField(upload_to='partner_logos/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Generated image renditions (see riders.images)")
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, help_text="e.g., 15.50 for 15.5%")
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, help_text="Fixed discount amount")
     
     # Contact and Location
     contact_info = models.TextField(blank=True, help_text="Phone, email, website")
     location = models.TextField(blank=True, help_text="Address or multiple locations")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     website_url = models.URLField(blank=True)
     
     # Terms and Conditions
@@ -256,6 +652,10 @@ class Benefit(models.Model):
     def __str__(self):
         return f"{self.title} - {self.partner_name}"
 
+    def save(self, *args, **kwargs):
+        self.geohash = compute_geohash(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['order', '-created_at']
 
@@ -270,6 +670,105 @@ class BenefitUsage(models.Model):
 
     class Meta:
         ordering = ['-used_at']
+        indexes = [
+            # Rollups read usage after their high-water mark
+            models.Index(fields=['used_at'], name='benefitusage_used_at_idx'),
+        ]
+
+class BenefitUsageDaily(models.Model):
+    """
+    Uses of a benefit per day and rider zone, rolled up from BenefitUsage by
+    ``python manage.py rollup_benefit_usage``. Partner and category are
+    copied from the benefit so partner and category reports read this table alone.
+    """
+    day = models.DateField()
+    benefit = models.ForeignKey(Benefit, on_delete=models.CASCADE, related_name='daily_usage')
+    zone = models.ForeignKey(Zone, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_benefit_usage')
+    category = models.ForeignKey(BenefitCategory, on_delete=models.CASCADE, related_name='daily_usage')
+    partner_name = models.CharField(max_length=200, blank=True)
+    uses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'benefit']
+        indexes = [
+            models.Index(fields=['benefit', 'day'], name='benefitdaily_benefit_idx'),
+            models.Index(fields=['partner_name', 'day'], name='benefitdaily_partner_idx'),
+            models.Index(fields=['category', 'day'], name='benefitdaily_category_idx'),
+            models.Index(fields=['zone', 'day'], name='benefitdaily_zone_idx'),
+            models.Index(fields=['day'], name='benefitdaily_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.benefit} on {self.day}: {self.uses}"
+
+class RollupState(models.Model):
+    """High-water mark of an incremental rollup: source rows before it are rolled up"""
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} up to {self.high_water_mark}"
+
+class BenefitUsageCounter(models.Model):
+    """
+    How many times a rider has used a benefit, so redeeming checks the usage
+    limit and counts the use in one conditional UPDATE instead of counting
+    the rider's BenefitUsage history.
+    """
+    rider = models.ForeignKey('Rider', on_delete=models.CASCADE, related_name='benefit_usage_counters')
+    benefit = models.ForeignKey(Benefit, on_delete=models.CASCADE, related_name='usage_counters')
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['rider', 'benefit'], name='unique_benefit_usage_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.rider} used {self.benefit} {self.count} times"
+
+    @classmethod
+    def increment(cls, rider_id, benefit_id, limit=None):
+        """
+        Count one more use unless the rider has already reached ``limit``.
+        The limit is checked in the UPDATE's WHERE clause, so concurrent
+        redemptions can't overshoot it. Returns whether the use was counted.
+        Call inside the transaction that records the BenefitUsage.
+        """
+        counters = cls.objects.filter(rider_id=rider_id, benefit_id=benefit_id)
+        if limit is not None:
+            counters = counters.filter(count__lt=limit)
+        if counters.update(count=F('count') + 1, updated_at=timezone.now()):
+            return True
+        if limit is not None and limit < 1:
+            return False
+        try:
+            with transaction.atomic():
+                cls.objects.create(rider_id=rider_id, benefit_id=benefit_id, count=1)
+            return True
+        except IntegrityError:
+            # The counter exists: at the limit, or created by a concurrent redemption
+            return bool(counters.update(count=F('count') + 1, updated_at=timezone.now()))
+
+    @classmethod
+    def decrement(cls, rider_id, benefit_id):
+        cls.objects.filter(rider_id=rider_id, benefit_id=benefit_id, count__gt=0).update(
+            count=F('count') - 1, updated_at=timezone.now()
+        )
+
+class RedemptionNonce(models.Model):
+    """
+    Nonce of a redemption token that has been verified, so the token can't
+    be presented again. Rows can be pruned once expired; the token is
+    refused by its own expiry from then on.
+    """
+    nonce = models.BigIntegerField(primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.nonce:x}"
 
 class Notice(models.Model):
     PRIORITY_CHOICES = [
@@ -312,3 +811,72 @@ class Notice(models.Model):
 
     class Meta:
         ordering = ['-priority', '-created_at']
+
+class SearchDocument(models.Model):
+    """
+    Denormalized full-text index entry for an event, post, benefit or notice.
+
+    Kept current by signals in riders.signals. The text index itself is backend
+    specific: a GIN expression index on PostgreSQL, an FTS5 table on SQLite
+    (see riders.search).
+    """
+    KIND_CHOICES = [
+        ('event', 'Ride Event'),
+        ('post', 'Post'),
+        ('benefit', 'Benefit'),
+        ('notice', 'Notice'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.title}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+class MediaBlob(models.Model):
+    """
+    A unique piece of media content stored by riders.storage.ContentAddressedStorage,
+    with the number of model file fields referencing it (see riders.blobs).
+    """
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name (blobs/aa/bb/<sha256>.ext)")
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last time the reference count changed")
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at'], name='mediablob_unreferenced_idx'),
+        ]
+
+class OptimizedMedia(models.Model):
+    """
+    An original image already processed by ``manage.py optimize_media``, so
+    interrupted runs resume where they stopped.
+    """
+    source = models.CharField(max_length=255, unique=True, help_text="Storage name before optimization")
+    result = models.CharField(max_length=255, db_index=True, help_text="Storage name now referenced (same as source if kept)")
+    bytes_before = models.PositiveBigIntegerField()
+    bytes_after = models.PositiveBigIntegerField()
+    had_metadata = models.BooleanField(default=False)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.source} -> {self.result}"
+
+    class Meta:
+        verbose_name = "Optimized Media"
+        verbose_name_plural = "Optimized Media"
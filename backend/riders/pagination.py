@@ -0,0 +1,158 @@
+import base64
+import datetime
+import decimal
+import json
+from functools import reduce
+from operator import and_, or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the queryset's ordering plus a primary key
+    tiebreaker.
+
+    The cursor carries the ordering values of the last (or first) row of the
+    page, and the next page is fetched with a lexicographic WHERE on those
+    values, so page N costs the same as page 1. Unlike DRF's CursorPagination
+    no OFFSET is used for rows sharing the first ordering value. Ordering
+    fields must be non-nullable.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        ordering = [self.invert(field) for field in self.ordering] if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, cursor['v']))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """The queryset's ordering (or the model default) with a pk tiebreaker"""
+        ordering = [str(field) for field in (queryset.query.order_by or queryset.model._meta.ordering)]
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        """
+        Rows strictly after ``values`` in ``ordering``:
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND pk > z) ...
+        """
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = [Q(**{ordering[j].lstrip('-'): values[j]}) for j in range(i)]
+            clauses.append(reduce(and_, equal, Q(**{f'{name}__{lookup}': values[i]})))
+        return reduce(or_, clauses)
+
+    def encode_cursor(self, obj, reverse):
+        values = [self.serialize_value(self.get_value(obj, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = cursor['v']
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return {'v': values, 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def get_value(obj, path):
+        for attr in path.split('__'):
+            obj = getattr(obj, attr)
+        return obj
+
+    @staticmethod
+    def serialize_value(value):
+        # Full-precision ISO strings; the field's to_python parses them back
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
@@ -0,0 +1,45 @@
+"""
+Phone number canonicalization.
+
+Riders sign in with their phone number, typed however they like
+(``01712-345678``, ``+880 1712 345678``, ``008801712345678``). Numbers are
+stored in E.164 (``+8801712345678``) so login is one lookup on Rider.phone.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+SEPARATORS_RE = re.compile(r'[\s\-().]')
+E164_RE = re.compile(r'^\+[1-9]\d{7,14}$')
+
+
+def to_e164(value, country_code=None):
+    """
+    The E.164 form of ``value``, or raise ValueError. Numbers without an
+    international prefix are read as national numbers of ``country_code``
+    (default PHONE_DEFAULT_COUNTRY_CODE, 880 for Bangladesh).
+    """
+    country_code = country_code or settings.PHONE_DEFAULT_COUNTRY_CODE
+    number = SEPARATORS_RE.sub('', value or '')
+    if number.startswith('00'):
+        number = '+' + number[2:]
+    elif number.startswith('0'):
+        # National trunk prefix: 01712345678
+        number = '+' + country_code + number[1:]
+    elif number.startswith(country_code) and len(number) > len(country_code) + 7:
+        # Country code without the plus: 8801712345678
+        number = '+' + number
+    elif not number.startswith('+'):
+        # Subscriber number alone: 1712345678
+        number = '+' + country_code + number
+    if not E164_RE.match(number):
+        raise ValueError(f'"{value}" is not a valid phone number')
+    return number
+
+
+def validate_phone(value):
+    try:
+        to_e164(value)
+    except ValueError as exc:
+        raise ValidationError(str(exc), code='invalid_phone') from exc
@@ -0,0 +1,106 @@
+"""
+Benefit redemption tokens.
+
+A token is what a rider's QR code carries when redeeming a benefit at a
+partner: the usage, rider, benefit and zone ids, an expiry time and a random
+nonce, signed with HMAC-SHA256 under a key belonging to the benefit. It is
+compact (82 URL-safe characters) and checked without any database access.
+
+This module only uses the standard library so partners can copy it into
+their own systems and verify tokens offline with the keys printed by
+``python manage.py redemption_keys``:
+
+    from redemption_tokens import TokenError, verify
+    try:
+        token = verify(scanned_text, keys)  # keys: {benefit_id: key bytes}
+    except TokenError as error:
+        reject(error)
+
+Offline checks can't see whether a token was already used; the
+/api/benefits/verify/ endpoint also records each nonce to refuse replays.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+from collections import namedtuple
+
+VERSION = 1
+
+# version, usage id, rider id, benefit id, zone id (0 for none), expiry (unix seconds), nonce
+PAYLOAD = struct.Struct('>BQQQQI8s')
+
+# Truncated HMAC-SHA256 tag, 128 bits
+TAG_LENGTH = 16
+
+RedemptionToken = namedtuple('RedemptionToken', ['usage_id', 'rider_id', 'benefit_id', 'zone_id', 'expires_at', 'nonce'])
+
+
+class TokenError(ValueError):
+    pass
+
+
+def benefit_key(secret, benefit_id):
+    """The key tokens for a benefit are signed with, derived from the server secret"""
+    if isinstance(secret, str):
+        secret = secret.encode()
+    return hmac.new(secret, b'riders.redemption:%d' % benefit_id, hashlib.sha256).digest()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def encode_key(key):
+    return _b64encode(key)
+
+
+def decode_key(text):
+    return _b64decode(text)
+
+
+def sign(key, usage_id, rider_id, benefit_id, zone_id, expires_at, nonce=None):
+    """A token valid until ``expires_at`` (unix seconds)"""
+    payload = PAYLOAD.pack(VERSION, usage_id, rider_id, benefit_id, zone_id or 0, int(expires_at), nonce or os.urandom(8))
+    return _b64encode(payload + hmac.new(key, payload, hashlib.sha256).digest()[:TAG_LENGTH])
+
+
+def read(token):
+    """The token's claims without checking its signature or expiry"""
+    try:
+        data = _b64decode(token.strip())
+    except (ValueError, TypeError) as exc:
+        raise TokenError('Malformed token') from exc
+    if len(data) != PAYLOAD.size + TAG_LENGTH:
+        raise TokenError('Malformed token')
+    version, usage_id, rider_id, benefit_id, zone_id, expires_at, nonce = PAYLOAD.unpack(data[:PAYLOAD.size])
+    if version != VERSION:
+        raise TokenError('Unsupported token version')
+    return RedemptionToken(usage_id, rider_id, benefit_id, zone_id or None, expires_at, nonce)
+
+
+def verify(token, keys, now=None, leeway=0):
+    """
+    The claims of a genuine, unexpired token, or raise TokenError.
+
+    ``keys`` maps benefit ids to their keys, or is a callable returning the
+    key for a benefit id (None if unknown). ``leeway`` tolerates clock skew
+    in seconds.
+    """
+    claims = read(token)
+    key = keys(claims.benefit_id) if callable(keys) else keys.get(claims.benefit_id)
+    if key is None:
+        raise TokenError('Unknown benefit')
+    data = _b64decode(token.strip())
+    expected = hmac.new(key, data[:PAYLOAD.size], hashlib.sha256).digest()[:TAG_LENGTH]
+    if not hmac.compare_digest(expected, data[PAYLOAD.size:]):
+        raise TokenError('Invalid signature')
+    if (time.time() if now is None else now) > claims.expires_at + leeway:
+        raise TokenError('Token expired')
+    return claims
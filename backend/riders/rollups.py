@@ -0,0 +1,189 @@
+"""
+Daily benefit usage rollups.
+
+``rollup_benefit_usage`` folds BenefitUsage rows into BenefitUsageDaily
+(per day, benefit and rider zone, with the benefit's partner and category)
+from a high-water mark on ``used_at``, so each run only reads the usage
+recorded since the last one. Usage counts and partner reports read the
+rollups, plus the few rows after the mark for counts that are always exact.
+"""
+import csv
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from .models import BenefitUsage, BenefitUsageDaily, RollupState
+
+ROLLUP_NAME = 'benefit_usage_daily'
+
+# Usage recorded within this long of a run may still be committing; it's left for the next run
+SETTLE_DELAY = timedelta(minutes=5)
+
+# Report groupings: name -> rollup columns
+GROUPINGS = {
+    'benefit': ('benefit_id', 'benefit__title', 'partner_name'),
+    'partner': ('partner_name',),
+    'zone': ('zone_id', 'zone__name'),
+    'category': ('category_id', 'category__name'),
+    'day': ('day',),
+}
+
+EXPORT_FIELDS = ('day', 'benefit_id', 'benefit__title', 'partner_name', 'category_id', 'category__name', 'zone_id', 'zone__name', 'uses')
+EXPORT_HEADER = ('day', 'benefit_id', 'benefit', 'partner', 'category_id', 'category', 'zone_id', 'zone', 'uses')
+
+
+class CSVRenderer(BaseRenderer):
+    """Lets ``?format=csv`` pass content negotiation; the export view streams the body itself"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+def high_water_mark():
+    return RollupState.objects.filter(name=ROLLUP_NAME).values_list('high_water_mark', flat=True).first()
+
+
+def roll_up(until=None):
+    """
+    Fold usage recorded between the high-water mark and ``until`` (default:
+    now minus SETTLE_DELAY) into the daily rollups and advance the mark.
+    Returns (usage rows folded, rollup rows touched).
+    """
+    until = until or timezone.now() - SETTLE_DELAY
+    with transaction.atomic():
+        # Locking the state row keeps overlapping runs from folding the same rows twice
+        state, _ = RollupState.objects.get_or_create(name=ROLLUP_NAME)
+        state = RollupState.objects.select_for_update().get(pk=state.pk)
+        if state.high_water_mark is not None and state.high_water_mark >= until:
+            return 0, 0
+
+        usage = BenefitUsage.objects.filter(used_at__lt=until)
+        if state.high_water_mark is not None:
+            usage = usage.filter(used_at__gte=state.high_water_mark)
+        groups = usage.order_by().values(
+            'benefit_id', 'benefit__partner_name', 'benefit__category_id', zone_id=F('rider__zone_id'), day=TruncDate('used_at'),
+        ).annotate(uses=Count('pk'))
+
+        folded, touched = 0, 0
+        for group in groups.iterator(chunk_size=2000):
+            row = BenefitUsageDaily.objects.filter(
+                day=group['day'], benefit_id=group['benefit_id'], zone_id=group['zone_id'],
+            ).values_list('pk', flat=True).first()
+            if row is not None:
+                BenefitUsageDaily.objects.filter(pk=row).update(uses=F('uses') + group['uses'])
+            else:
+                BenefitUsageDaily.objects.create(
+                    day=group['day'],
+                    benefit_id=group['benefit_id'],
+                    zone_id=group['zone_id'],
+                    category_id=group['benefit__category_id'],
+                    partner_name=group['benefit__partner_name'],
+                    uses=group['uses'],
+                )
+            folded += group['uses']
+            touched += 1
+
+        state.high_water_mark = until
+        state.save(update_fields=['high_water_mark', 'updated_at'])
+    return folded, touched
+
+
+def release(usage):
+    """Take a deleted usage back out of the rollups if it was already folded in"""
+    mark = high_water_mark()
+    if mark is None or usage.used_at >= mark:
+        return
+    rows = BenefitUsageDaily.objects.filter(
+        day=timezone.localdate(usage.used_at), benefit_id=usage.benefit_id, uses__gt=0,
+    ).order_by('pk')
+    # Prefer the rider's zone; the rider may have moved since the usage was rolled up
+    row = rows.filter(zone__rider__id=usage.rider_id).values_list('pk', flat=True).first()
+    if row is None:
+        row = rows.values_list('pk', flat=True).first()
+    if row is not None:
+        BenefitUsageDaily.objects.filter(pk=row).update(uses=F('uses') - 1)
+
+
+def reset():
+    """Drop every rollup so the next run rebuilds them from all usage"""
+    with transaction.atomic():
+        BenefitUsageDaily.objects.all().delete()
+        RollupState.objects.filter(name=ROLLUP_NAME).update(high_water_mark=None)
+
+
+def usage_counts(benefit_ids):
+    """benefit id -> total uses: rolled-up days plus the usage since the high-water mark"""
+    benefit_ids = list(benefit_ids)
+    if not benefit_ids:
+        return {}
+    counts = dict(
+        BenefitUsageDaily.objects.filter(benefit_id__in=benefit_ids)
+        .order_by().values_list('benefit_id').annotate(Sum('uses'))
+    )
+    recent = BenefitUsage.objects.filter(benefit_id__in=benefit_ids)
+    mark = high_water_mark()
+    if mark is not None:
+        recent = recent.filter(used_at__gte=mark)
+    for benefit_id, uses in recent.order_by().values_list('benefit_id').annotate(Count('pk')):
+        counts[benefit_id] = counts.get(benefit_id, 0) + uses
+    return counts
+
+
+def filter_rollups(rollups, date_from=None, date_to=None, partner=None, benefit_id=None, zone_id=None, category_id=None):
+    if date_from:
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(day__lte=date_to)
+    if partner:
+        rollups = rollups.filter(partner_name=partner)
+    if benefit_id:
+        rollups = rollups.filter(benefit_id=benefit_id)
+    if zone_id:
+        rollups = rollups.filter(zone_id=zone_id)
+    if category_id:
+        rollups = rollups.filter(category_id=category_id)
+    return rollups
+
+
+def report(group, **filters):
+    """Total uses per ``group`` (a GROUPINGS key) over the filtered rollups, most used first"""
+    columns = GROUPINGS[group]
+    rollups = filter_rollups(BenefitUsageDaily.objects.all(), **filters)
+    return list(rollups.order_by().values(*columns).annotate(uses=Sum('uses')).order_by('-uses', *columns))
+
+
+def export_rows(**filters):
+    rollups = filter_rollups(BenefitUsageDaily.objects.all(), **filters)
+    return rollups.order_by('day', 'benefit_id', 'zone_id').values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+
+
+class Echo:
+    """File-like object whose write() hands back the line for streaming"""
+    def write(self, value):
+        return value
+
+
+def stream_csv(**filters):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in export_rows(**filters):
+        yield writer.writerow(row)
+
+
+def stream_json(**filters):
+    yield '['
+    separator = ''
+    for row in export_rows(**filters):
+        item = dict(zip(EXPORT_HEADER, row))
+        item['day'] = item['day'].isoformat()
+        yield separator + json.dumps(item)
+        separator = ','
+    yield ']'
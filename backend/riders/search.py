@@ -0,0 +1,155 @@
+"""
+Full-text search over events, posts, benefits and notices.
+
+Every searchable object is mirrored into a SearchDocument row when it is
+saved. Queries run against a real text index: a GIN expression index with
+``ts_rank`` on PostgreSQL, an FTS5 table with ``bm25`` on SQLite (the
+``USE_SQLITE`` setup). Other backends fall back to ``icontains``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import RideEvent, Post, Benefit, Notice, SearchDocument
+
+# Must match the expression indexed by migration 0017_searchdocument
+PG_DOCUMENT_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')"
+)
+
+
+def _join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+# kind -> (model, document builder returning (title, body, is_active, expires_at))
+SEARCHABLE = {
+    'event': (RideEvent, lambda obj: (
+        obj.title,
+        _join(obj.description, obj.location, obj.organizer_name, obj.requirements),
+        obj.status != 'cancelled',
+        None,
+    )),
+    'post': (Post, lambda obj: (obj.title, obj.content, True, None)),
+    'benefit': (Benefit, lambda obj: (
+        obj.title,
+        _join(obj.description, obj.partner_name, obj.location, obj.terms_conditions),
+        obj.is_active,
+        None,
+    )),
+    'notice': (Notice, lambda obj: (obj.title, obj.message, obj.is_active, obj.end_date)),
+}
+
+KIND_BY_MODEL = {model: kind for kind, (model, _) in SEARCHABLE.items()}
+
+
+def index_instance(instance):
+    """Insert or refresh the search document of a saved object"""
+    kind = KIND_BY_MODEL[type(instance)]
+    title, body, is_active, expires_at = SEARCHABLE[kind][1](instance)
+    SearchDocument.objects.update_or_create(
+        kind=kind,
+        object_id=instance.pk,
+        defaults={
+            'title': title[:200],
+            'body': body,
+            'is_active': is_active,
+            'expires_at': expires_at,
+        },
+    )
+
+
+def remove_instance(instance):
+    SearchDocument.objects.filter(kind=KIND_BY_MODEL[type(instance)], object_id=instance.pk).delete()
+
+
+def rebuild_index():
+    """Re-index every searchable object. Returns the number of documents written."""
+    total = 0
+    for kind, (model, _) in SEARCHABLE.items():
+        SearchDocument.objects.filter(kind=kind).exclude(object_id__in=model.objects.values('pk')).delete()
+        for instance in model.objects.iterator(chunk_size=500):
+            index_instance(instance)
+            total += 1
+    return total
+
+
+def _fts5_query(query):
+    """Quote each term (so user input can't inject FTS syntax) and prefix-match it"""
+    terms = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def search(query, kinds, limit, offset=0, allowed=None):
+    """
+    Return up to ``limit`` ranked hits for ``query`` restricted to ``kinds``,
+    best match first, as dicts with kind, object_id, title, body and score.
+    ``allowed`` maps a kind to the only object ids of that kind that may be
+    returned (e.g. the benefits a rider is entitled to).
+    """
+    if not query.strip() or not kinds:
+        return []
+    allowed = {kind: list(ids) for kind, ids in (allowed or {}).items() if kind in kinds}
+
+    now = timezone.now()
+    db_now = connection.ops.adapt_datetimefield_value(now)
+    table = SearchDocument._meta.db_table
+    kind_placeholders = ', '.join(['%s'] * len(kinds))
+    visible = (
+        f'd.is_active AND d.kind IN ({kind_placeholders}) '
+        f'AND (d.expires_at IS NULL OR d.expires_at > %s)'
+    )
+    visible_params = [*kinds, db_now]
+    for kind, ids in allowed.items():
+        if ids:
+            visible += f" AND (d.kind <> %s OR d.object_id IN ({', '.join(['%s'] * len(ids))}))"
+            visible_params += [kind, *ids]
+        else:
+            visible += ' AND d.kind <> %s'
+            visible_params.append(kind)
+
+    if connection.vendor == 'postgresql':
+        sql = (
+            f"SELECT d.kind, d.object_id, d.title, d.body, "
+            f"ts_rank({PG_DOCUMENT_VECTOR}, q) AS score "
+            f"FROM {table} d, websearch_to_tsquery('english', %s) q "
+            f"WHERE ({PG_DOCUMENT_VECTOR}) @@ q AND {visible} "
+            f"ORDER BY score DESC, d.id LIMIT %s OFFSET %s"
+        )
+        params = [query, *visible_params, limit, offset]
+    elif connection.vendor == 'sqlite':
+        match = _fts5_query(query)
+        if not match:
+            return []
+        # bm25() is lower-is-better; negate it so higher scores rank first everywhere
+        sql = (
+            f"SELECT d.kind, d.object_id, d.title, d.body, -bm25({table}_fts, 2.0, 1.0) AS score "
+            f"FROM {table}_fts JOIN {table} d ON d.id = {table}_fts.rowid "
+            f"WHERE {table}_fts MATCH %s AND {visible} "
+            f"ORDER BY score DESC, d.id LIMIT %s OFFSET %s"
+        )
+        params = [match, *visible_params, limit, offset]
+    else:
+        documents = SearchDocument.objects.filter(
+            Q(title__icontains=query) | Q(body__icontains=query),
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            is_active=True,
+            kind__in=kinds,
+        )
+        for kind, ids in allowed.items():
+            documents = documents.filter(~Q(kind=kind) | Q(object_id__in=ids))
+        documents = documents.order_by('id')[offset:offset + limit]
+        return [
+            {'kind': d.kind, 'object_id': d.object_id, 'title': d.title, 'body': d.body, 'score': 0.0}
+            for d in documents
+        ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {'kind': kind, 'object_id': object_id, 'title': title, 'body': body, 'score': float(score)}
+            for kind, object_id, title, body, score in cursor.fetchall()
+        ]
@@ -1,6 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Rider, RideEvent, Post, Zone, MembershipApplication, BenefitCategory, Benefit, BenefitUsage, EventPhoto, Notice
+from . import images, phones, rollups
+from .models import Rider, RideEvent, Post, Comment, Zone, MembershipApplication, BenefitCategory, Benefit, BenefitUsage, EventPhoto, PhotoUpload, Notice
+
+class ImageRenditionsField(serializers.Field):
+    """Read-only srcset-style map of an image field's renditions"""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        return images.rendition_urls(obj, self.image_field, self.context.get('request'))
 
 class ZoneSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,11 +22,12 @@ class ZoneSerializer(serializers.ModelSerializer):
 
 class MembershipApplicationSerializer(serializers.ModelSerializer):
     zone_name = serializers.CharField(source='zone.name', read_only=True)
+    profile_photo_renditions = ImageRenditionsField('profile_photo')
     
     class Meta:
         model = MembershipApplication
         fields = [
-            'id', 'profile_photo', 'full_name', 'email', 'phone', 'alternative_phone',
+            'id', 'profile_photo', 'profile_photo_renditions', 'full_name', 'email', 'phone', 'alternative_phone',
             'date_of_birth', 'blood_group', 'profession', 'hobbies', 'address', 'zone',
             'zone_name', 'id_document_type', 'id_document_number', 'id_document_photo',
             'holding_id_photo', 'emergency_contact', 'emergency_phone', 'has_motorbike',
@@ -22,6 +36,12 @@ class MembershipApplicationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'status', 'created_at', 'updated_at']
 
+    def validate_phone(self, value):
+        try:
+            return phones.to_e164(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -29,18 +49,21 @@ class UserSerializer(serializers.ModelSerializer):
 
 class RiderSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    profile_image_renditions = ImageRenditionsField('profile_image')
 
     class Meta:
         model = Rider
-        fields = ['id', 'user', 'bio', 'location', 'bike_model', 'profile_image', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'bio', 'location', 'bike_model', 'profile_image', 'profile_image_renditions', 'membership_level', 'created_at', 'updated_at']
+        read_only_fields = ['membership_level']
 
 class EventPhotoSerializer(serializers.ModelSerializer):
     uploaded_by_name = serializers.CharField(source='uploaded_by.user.get_full_name', read_only=True)
     photo_url = serializers.SerializerMethodField()
+    photo_renditions = ImageRenditionsField('photo')
     
     class Meta:
         model = EventPhoto
-        fields = ['id', 'photo', 'photo_url', 'caption', 'uploaded_by', 'uploaded_by_name', 'uploaded_at']
+        fields = ['id', 'photo', 'photo_url', 'photo_renditions', 'caption', 'uploaded_by', 'uploaded_by_name', 'uploaded_at']
     
     def get_photo_url(self, obj):
         if obj.photo:
@@ -50,6 +73,15 @@ class EventPhotoSerializer(serializers.ModelSerializer):
             return obj.photo.url
         return None
 
+class PhotoUploadSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+
+    class Meta:
+        model = PhotoUpload
+        fields = ['id', 'filename', 'caption', 'size', 'sha256', 'received', 'status', 'created_at']
+        read_only_fields = ['id', 'received', 'status', 'created_at']
+
 class RideEventSerializer(serializers.ModelSerializer):
     organizer = RiderSerializer(read_only=True)
     participants = RiderSerializer(many=True, read_only=True)
@@ -64,14 +96,14 @@ class RideEventSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = RideEvent
-        fields = ['id', 'title', 'description', 'location', 'date', 'time', 'end_date', 
+        fields = ['id', 'title', 'description', 'location', 'latitude', 'longitude', 'date', 'time', 'end_date', 
                  'price', 'duration', 'requirements', 'status', 'organizer', 
                  'organizer_name', 'participants', 'participant_count', 'current_joined', 
                  'max_participants', 'photos', 'uploaded_photos', 'all_photos', 'is_featured', 'is_upcoming', 'is_past', 
                  'can_join', 'user_registered', 'created_at', 'updated_at']
 
     def get_participant_count(self, obj):
-        return obj.participants.count()
+        return obj.participant_count
     
     def get_can_join(self, obj):
         """Check if user can join this event"""
@@ -83,9 +115,12 @@ class RideEventSerializer(serializers.ModelSerializer):
     
     def get_user_registered(self, obj):
         """Check if current user is registered for this event"""
+        # Annotated by RideEventViewSet.get_base_queryset
+        if hasattr(obj, 'user_registered'):
+            return obj.user_registered
         request = self.context.get('request')
         if request and hasattr(request.user, 'rider'):
-            return obj.participants.filter(id=request.user.rider.id).exists()
+            return obj.has_participant(request.user.rider)
         return False
     
     def get_all_photos(self, obj):
@@ -101,11 +136,11 @@ class RideEventSerializer(serializers.ModelSerializer):
                 'uploaded_at': None
             })
         
-        # Add uploaded photos
+        # Add uploaded photos (prefetched with their uploaders)
+        request = self.context.get('request')
         for photo in obj.uploaded_photos.all():
             photo_url = None
             if photo.photo:
-                request = self.context.get('request')
                 if request:
                     photo_url = request.build_absolute_uri(photo.photo.url)
                 else:
@@ -116,21 +151,88 @@ class RideEventSerializer(serializers.ModelSerializer):
                 'url': photo_url,
                 'caption': photo.caption or '',
                 'uploaded_at': photo.uploaded_at,
-                'uploaded_by': photo.uploaded_by.user.get_full_name() if photo.uploaded_by else None
+                'uploaded_by': photo.uploaded_by.user.get_full_name() if photo.uploaded_by else None,
+                'renditions': images.rendition_urls(photo, 'photo', request)
             })
         
         return all_photos
 
+class RiderAvatarSerializer(serializers.ModelSerializer):
+    full_name = serializers.SerializerMethodField()
+    profile_image_renditions = ImageRenditionsField('profile_image')
+
+    class Meta:
+        model = Rider
+        fields = ['id', 'full_name', 'profile_image', 'profile_image_renditions']
+
+    def get_full_name(self, obj):
+        return obj.user.get_full_name() or obj.user.username
+
+class RideEventListSerializer(RideEventSerializer):
+    """
+    Summary representation used by event lists. Participants and photos are
+    reduced to counts plus a few avatars; the full collections are served by
+    the paginated /events/{id}/participants/ and /events/{id}/photos/ endpoints.
+    """
+    PARTICIPANT_PREVIEW_SIZE = 5
+
+    participant_preview = RiderAvatarSerializer(many=True, read_only=True)
+    photo_count = serializers.SerializerMethodField()
+
+    class Meta(RideEventSerializer.Meta):
+        fields = ['id', 'title', 'description', 'location', 'latitude', 'longitude', 'date', 'time', 'end_date',
+                 'price', 'duration', 'requirements', 'status', 'organizer',
+                 'organizer_name', 'participant_preview', 'participant_count', 'current_joined',
+                 'max_participants', 'photos', 'photo_count', 'is_featured', 'is_upcoming', 'is_past',
+                 'can_join', 'user_registered', 'created_at', 'updated_at']
+
+    def get_photo_count(self, obj):
+        """Legacy photo URLs plus uploaded photos"""
+        uploaded = getattr(obj, 'uploaded_photo_count', None)
+        if uploaded is None:
+            uploaded = obj.uploaded_photos.count()
+        return len(obj.photos) + uploaded
+
 class PostSerializer(serializers.ModelSerializer):
     author = RiderSerializer(read_only=True)
-    likes_count = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
+    image_renditions = ImageRenditionsField('image')
 
     class Meta:
         model = Post
-        fields = ['id', 'author', 'title', 'content', 'image', 'likes_count', 'created_at', 'updated_at']
+        fields = ['id', 'author', 'title', 'content', 'image', 'image_renditions', 'likes_count', 'liked_by_me', 'created_at', 'updated_at']
+        read_only_fields = ['likes_count']
+
+    def get_liked_by_me(self, obj):
+        # Annotated by PostViewSet.get_queryset
+        if hasattr(obj, 'liked_by_me'):
+            return obj.liked_by_me
+        request = self.context.get('request')
+        if request and hasattr(request.user, 'rider'):
+            return obj.is_liked_by(request.user.rider)
+        return False
+
+class CommentSerializer(serializers.ModelSerializer):
+    author = RiderAvatarSerializer(read_only=True)
+    parent = serializers.PrimaryKeyRelatedField(queryset=Comment.objects.all(), required=False, allow_null=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'post', 'event', 'parent', 'author', 'content', 'depth', 'reply_count', 'is_deleted', 'created_at', 'updated_at']
+        read_only_fields = ['post', 'event', 'depth', 'reply_count', 'is_deleted']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # A comment can't be moved once posted
+            fields['parent'].read_only = True
+        return fields
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.is_deleted:
+            data['content'] = ''
+        return data
 
 class BenefitCategorySerializer(serializers.ModelSerializer):
     benefits_count = serializers.SerializerMethodField()
@@ -140,6 +242,9 @@ class BenefitCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'icon', 'color', 'is_active', 'order', 'benefits_count', 'created_at', 'updated_at']
     
     def get_benefits_count(self, obj):
+        # Annotated by the category and benefit views
+        if hasattr(obj, 'benefits_count'):
+            return obj.benefits_count
         return obj.benefits.filter(is_active=True).count()
 
 class BenefitSerializer(serializers.ModelSerializer):
@@ -149,28 +254,36 @@ class BenefitSerializer(serializers.ModelSerializer):
     available_zones_list = ZoneSerializer(source='available_zones', many=True, read_only=True)
     usage_count = serializers.SerializerMethodField()
     is_available_in_zone = serializers.SerializerMethodField()
+    image_renditions = ImageRenditionsField('image')
+    partner_logo_renditions = ImageRenditionsField('partner_logo')
     
     class Meta:
         model = Benefit
         fields = [
             'id', 'title', 'description', 'category', 'category_name', 'category_icon', 'category_color',
-            'image', 'membership_level', 'partner_name', 'partner_logo', 'discount_percentage', 
-            'discount_amount', 'contact_info', 'location', 'website_url', 'terms_conditions',
+            'image', 'image_renditions', 'membership_level', 'partner_name', 'partner_logo',
+            'partner_logo_renditions', 'discount_percentage', 
+            'discount_amount', 'contact_info', 'location', 'latitude', 'longitude', 'website_url', 'terms_conditions',
             'valid_from', 'valid_until', 'usage_limit', 'available_zones_list', 'is_active',
             'is_featured', 'order', 'usage_count', 'is_available_in_zone', 'created_at', 'updated_at'
         ]
     
     def get_usage_count(self, obj):
-        return obj.usage_records.count()
+        # Read for the whole page by BenefitViewSet (see riders.rollups)
+        usage_counts = self.context.get('usage_counts')
+        if usage_counts is None:
+            usage_counts = rollups.usage_counts([obj.pk])
+        return usage_counts.get(obj.pk, 0)
     
     def get_is_available_in_zone(self, obj):
-        # Check if benefit is available in user's zone
+        # Check if benefit is available in user's zone, from the prefetched zones
         request = self.context.get('request')
         if request and hasattr(request.user, 'rider'):
-            user_zone = request.user.rider.zone
-            if not obj.available_zones.exists():  # Available in all zones
+            user_zone_id = request.user.rider.zone_id
+            zone_ids = [zone.id for zone in obj.available_zones.all()]
+            if not zone_ids:  # Available in all zones
                 return True
-            return obj.available_zones.filter(id=user_zone.id).exists() if user_zone else False
+            return user_zone_id in zone_ids
         return True  # Default for anonymous users
 
 class BenefitUsageSerializer(serializers.ModelSerializer):
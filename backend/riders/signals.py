@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import RideEvent, EventPhoto, Rider, Post, Benefit, BenefitCategory, BenefitUsage, BenefitUsageCounter, Zone, MembershipApplication, Notice
+from . import blobs, catalog, feed, images, rollups, search
+
+
+def _recount_participants(event_ids):
+    for event in RideEvent.objects.filter(pk__in=event_ids).annotate(joined=Count('participants')):
+        RideEvent.objects.filter(pk=event.pk).update(participant_count=event.joined)
+
+
+@receiver(m2m_changed, sender=RideEvent.participants.through)
+def sync_participant_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep RideEvent.participant_count in step with participants changed through
+    the related manager (admin, management commands). The join/leave API writes
+    the through table directly and maintains the counter itself.
+    """
+    if reverse and action == 'pre_clear':
+        instance._cleared_event_ids = list(instance.joined_events.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _recount_participants([instance.pk])
+    elif action == 'post_clear':
+        _recount_participants(getattr(instance, '_cleared_event_ids', []))
+    elif pk_set:
+        _recount_participants(pk_set)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def sync_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep Post.likes_count in step with likes changed through the related
+    manager. The like API writes the through table directly and maintains
+    the counter itself.
+    """
+    if reverse and action == 'pre_clear':
+        instance._cleared_post_ids = list(instance.liked_posts.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        post_ids = [instance.pk]
+    elif action == 'post_clear':
+        post_ids = getattr(instance, '_cleared_post_ids', [])
+    else:
+        post_ids = pk_set or []
+    for post in Post.objects.filter(pk__in=post_ids).annotate(liked=Count('likes')):
+        Post.objects.filter(pk=post.pk).update(likes_count=post.liked)
+
+
+@receiver(post_save, sender=RideEvent)
+def promote_waitlist_on_capacity_change(sender, instance, created, **kwargs):
+    """Fill seats opened up by an edit (e.g. a raised max_participants)"""
+    if not created:
+        instance.promote_waitlist()
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Write new posts into their audience's home feeds once the post is committed"""
+    if created:
+        transaction.on_commit(lambda: feed.fan_out(instance))
+
+
+@receiver(post_save, sender=RideEvent)
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Benefit)
+@receiver(post_save, sender=Notice)
+def update_search_document(sender, instance, **kwargs):
+    search.index_instance(instance)
+
+
+@receiver(post_delete, sender=RideEvent)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Benefit)
+@receiver(post_delete, sender=Notice)
+def delete_search_document(sender, instance, **kwargs):
+    search.remove_instance(instance)
+
+
+@receiver(post_save, sender=EventPhoto)
+@receiver(post_save, sender=Rider)
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Benefit)
+@receiver(post_save, sender=MembershipApplication)
+def generate_image_renditions(sender, instance, **kwargs):
+    images.schedule_renditions(instance)
+
+
+@receiver(pre_save, sender=EventPhoto)
+@receiver(pre_save, sender=Rider)
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Benefit)
+@receiver(pre_save, sender=MembershipApplication)
+def remember_media_files(sender, instance, **kwargs):
+    blobs.remember_files(instance)
+
+
+@receiver(post_save, sender=EventPhoto)
+@receiver(post_save, sender=Rider)
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Benefit)
+@receiver(post_save, sender=MembershipApplication)
+def update_media_references(sender, instance, **kwargs):
+    blobs.sync_references(instance)
+
+
+@receiver(post_delete, sender=EventPhoto)
+@receiver(post_delete, sender=Rider)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Benefit)
+@receiver(post_delete, sender=MembershipApplication)
+def release_media_references(sender, instance, **kwargs):
+    blobs.release(blobs.referenced_names(instance))
+
+
+@receiver(post_save, sender=Benefit)
+@receiver(post_save, sender=BenefitCategory)
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Benefit)
+@receiver(post_delete, sender=BenefitCategory)
+@receiver(post_delete, sender=Zone)
+@receiver(m2m_changed, sender=Benefit.available_zones.through)
+def invalidate_benefit_catalog(sender, **kwargs):
+    catalog.bump_version()
+
+
+@receiver(post_delete, sender=BenefitUsage)
+def release_benefit_usage(sender, instance, **kwargs):
+    """A deleted usage no longer counts against the rider's usage limit or in the rollups"""
+    BenefitUsageCounter.decrement(instance.rider_id, instance.benefit_id)
+    rollups.release(instance)
@@ -0,0 +1,118 @@
+"""
+Content-addressed media storage.
+
+Whatever name a file is saved under, its bytes are stored once at
+``blobs/<aa>/<bb>/<sha256><ext>``; saving identical content again returns the
+existing blob. Model fields referencing blobs are counted in MediaBlob (see
+riders.blobs), so disk use follows unique content rather than upload count.
+
+Sensitive uploads (membership ID documents) use PrivateStorage instead: plain
+files under PRIVATE_MEDIA_ROOT, outside MEDIA_ROOT, served only to staff and
+the applicant by riders.views.private_media_view.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+BLOB_PREFIX = 'blobs'
+
+# Bytes hashed at a time when the content is already on disk
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def blob_name(digest, extension=''):
+    return posixpath.join(BLOB_PREFIX, digest[:2], digest[2:4], digest + extension.lower())
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_PREFIX + '/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names every file by the SHA-256 of its content"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        extension = posixpath.splitext(name.replace('\\', '/'))[1]
+
+        if hasattr(content, 'temporary_file_path'):
+            # Already on local disk (large uploads, finished chunked uploads): hash it, then move it
+            digest = hashlib.sha256()
+            with open(content.temporary_file_path(), 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+            blob = blob_name(digest.hexdigest(), extension)
+            self.move_into(content.temporary_file_path(), blob)
+            return blob
+
+        # Hash while spooling to a temporary file next to the blobs, then rename into place
+        incoming = self.path(posixpath.join(BLOB_PREFIX, '.incoming'))
+        os.makedirs(incoming, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            blob = blob_name(digest.hexdigest(), extension)
+            path = self.path(blob)
+            if os.path.exists(path):
+                self._touch(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Atomic; a concurrent save of the same content writes identical bytes
+                os.replace(temp_path, path)
+                self._set_permissions(path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return blob
+
+    def move_into(self, local_path, blob):
+        """
+        Move a local file into ``blob``, a name from blob_name() of its digest.
+        If the blob already exists the file is left where it is.
+        """
+        path = self.path(blob)
+        if os.path.exists(path):
+            self._touch(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_move_safe(local_path, path, allow_overwrite=True)
+            self._set_permissions(path)
+
+    def _set_permissions(self, path):
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+
+    @staticmethod
+    def _touch(path):
+        # A reused blob counts as new for the orphaned media grace period
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+class PrivateStorage(FileSystemStorage):
+    """Files kept outside MEDIA_ROOT; their URLs point at private_media_view"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('location', settings.PRIVATE_MEDIA_ROOT)
+        kwargs.setdefault('base_url', settings.PRIVATE_MEDIA_URL)
+        super().__init__(**kwargs)
+
+
+def private_storage():
+    # A callable so migrations don't record the settings-dependent location
+    return PrivateStorage()
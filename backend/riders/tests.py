@@ -1,3 +1,483 @@
-from django.test import TestCase
+import datetime
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import phones, redemption_tokens, rollups
+from .models import Benefit, BenefitCategory, BenefitUsage, BenefitUsageCounter, BenefitUsageDaily, Post, RedemptionNonce, RideEvent, Rider, Zone
+
+# Fast hashing; these tests are about the lookups, not the hasher
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class PhoneCanonicalizationTests(TestCase):
+    def test_formats_map_to_e164(self):
+        for value in ['01712-345678', '+880 1712 345678', '008801712345678', '8801712345678', '1712345678', '(01712) 345.678']:
+            self.assertEqual(phones.to_e164(value), '+8801712345678', value)
+
+    def test_invalid_numbers_raise(self):
+        for value in ['', 'abc', '+0123', '123']:
+            with self.assertRaises(ValueError):
+                phones.to_e164(value)
+
+    def test_rider_save_stores_e164(self):
+        rider = Rider.objects.create(user=User.objects.create_user('a'), phone='01712-345678')
+        self.assertEqual(rider.phone, '+8801712345678')
+        rider.phone = ''
+        rider.save()
+        self.assertIsNone(rider.phone)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoginTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('01811111111', password='pw')
+        Rider.objects.create(user=self.user, phone='+8801811111111')
+
+    def login(self, phone, password):
+        return self.client.post('/api/auth/login/', {'phone': phone, 'password': password}, format='json')
+
+    def test_any_format_of_the_number_signs_in(self):
+        for phone in ['01811111111', '+880 1811-111111', '008801811111111']:
+            response = self.login(phone, 'pw')
+            self.assertEqual(response.status_code, 200, phone)
+            self.assertEqual(response.data['user']['id'], self.user.pk)
+
+    def test_wrong_password_and_unknown_number(self):
+        self.assertEqual(self.login('01811111111', 'wrong').status_code, 401)
+        self.assertEqual(self.login('01999999999', 'pw').status_code, 401)
+        self.assertEqual(self.login('not a phone', 'pw').status_code, 401)
+
+    def test_inactive_user_cannot_sign_in(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login('01811111111', 'pw').status_code, 401)
+
+    def test_staff_sign_in_with_username(self):
+        staff = User.objects.create_user('admin', password='pw', is_staff=True)
+        response = self.login('admin', 'pw')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['id'], staff.pk)
+
+    def test_duplicate_number_signs_in_with_exact_username(self):
+        # Left without a phone by the backfill because the older account holds the number
+        newer = User.objects.create_user('+8801811111111', password='pw2')
+        Rider.objects.create(user=newer)
+        response = self.login('+8801811111111', 'pw2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['id'], newer.pk)
+        # The number itself still belongs to the older account
+        response = self.login('+880 1811-111111', 'pw')
+        self.assertEqual(response.data['user']['id'], self.user.pk)
+        self.assertEqual(self.login('+880 1811-111111', 'pw2').status_code, 401)
+
+    def test_login_is_at_most_two_queries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login('01811111111', 'pw').status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.login('+8801811111111', 'pw').status_code, 200)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Reads the SQLite query plan')
+    def test_login_queries_use_indexes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.login('+880 1811-111111', 'pw')
+            self.login('admin', 'pw')
+        for query in queries.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.assertFalse([step for step in plan if step.startswith('SCAN')], (query['sql'], plan))
+
+
+class SearchEntitlementTests(TestCase):
+    def setUp(self):
+        # A fresh catalog version; TestCase never runs the on_commit invalidation
+        cache.clear()
+        self.zone, other_zone = Zone.objects.create(name='North'), Zone.objects.create(name='South')
+        category = BenefitCategory.objects.create(name='Service')
+        for title, level in [('Basic chain service', 'all'), ('Premium chain service', 'premium')]:
+            Benefit.objects.create(category=category, title=title, description='d', membership_level=level)
+        Benefit.objects.create(category=category, title='Southern chain service', description='d').available_zones.set([other_zone])
+        self.client = APIClient()
+
+    def found(self):
+        response = self.client.get('/api/search/', {'q': 'chain', 'type': 'benefit'})
+        return sorted(hit['title'] for hit in response.data['results'])
+
+    def test_basic_rider_only_finds_entitled_benefits(self):
+        user = User.objects.create_user('basic')
+        Rider.objects.create(user=user, zone=self.zone)
+        self.client.force_authenticate(user)
+        self.assertEqual(self.found(), ['Basic chain service'])
+
+    def test_premium_rider_finds_premium_benefits(self):
+        user = User.objects.create_user('premium')
+        Rider.objects.create(user=user, zone=self.zone, membership_level='premium')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.found(), ['Basic chain service', 'Premium chain service'])
+
+    def test_signed_out_visitors_search_as_basic(self):
+        self.assertNotIn('Premium chain service', self.found())
+
+
+class EventRegistrationTests(TestCase):
+    def setUp(self):
+        self.organizer = Rider.objects.create(user=User.objects.create_user('organizer'))
+        self.event = self.create_event(max_participants=2)
+        self.riders = [Rider.objects.create(user=User.objects.create_user(f'rider{i}')) for i in range(3)]
+        self.client = APIClient()
+
+    def create_event(self, **kwargs):
+        return RideEvent.objects.create(
+            title='Ride', description='d', location='Dhaka', organizer=self.organizer,
+            date=datetime.date.today() + datetime.timedelta(days=7), time=datetime.time(9), **kwargs
+        )
+
+    def post_as(self, rider, action):
+        self.client.force_authenticate(rider.user)
+        return self.client.post(f'/api/events/{self.event.pk}/{action}/')
+
+    def test_join_and_leave_keep_the_counter(self):
+        response = self.post_as(self.riders[0], 'join')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['current_joined'], 1)
+        self.assertEqual(self.post_as(self.riders[0], 'join').status_code, 400)
+        response = self.post_as(self.riders[0], 'leave')
+        self.assertEqual(response.data['current_joined'], 0)
+        self.assertEqual(self.post_as(self.riders[0], 'leave').status_code, 400)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participant_count, 0)
+
+    def test_full_event_is_not_oversold(self):
+        self.post_as(self.riders[0], 'join')
+        # Loaded before the last seat went, as a concurrent request would have it
+        stale = RideEvent.objects.get(pk=self.event.pk)
+        self.post_as(self.riders[1], 'join')
+        self.assertFalse(stale.add_participant(self.riders[2]))
+        response = self.post_as(self.riders[2], 'join')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['waitlist_available'])
+        self.assertEqual(self.event.participants.count(), 2)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participant_count, 2)
+
+    def test_duplicate_join_does_not_take_a_seat(self):
+        self.event.add_participant(self.riders[0])
+        with self.assertRaises(IntegrityError):
+            self.event.add_participant(self.riders[0])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participant_count, 1)
+
+    def test_saving_a_stale_event_keeps_the_counter(self):
+        stale = RideEvent.objects.get(pk=self.event.pk)
+        self.event.add_participant(self.riders[0])
+        stale.title = 'Renamed'
+        stale.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participant_count, 1)
+
+    def test_waitlist_only_when_full_and_promoted_on_leave(self):
+        self.assertEqual(self.post_as(self.riders[2], 'waitlist').status_code, 400)
+        self.post_as(self.riders[0], 'join')
+        self.post_as(self.riders[1], 'join')
+        response = self.post_as(self.riders[2], 'waitlist')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['position'], 1)
+        self.post_as(self.riders[0], 'leave')
+        self.assertTrue(self.event.has_participant(self.riders[2]))
+        self.assertFalse(self.event.waitlist_entries.exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participant_count, 2)
+
+    def test_raising_capacity_promotes_the_waitlist(self):
+        self.event.add_participant(self.riders[0])
+        self.event.add_participant(self.riders[1])
+        self.event.add_to_waitlist(self.riders[2])
+        self.event.max_participants = 3
+        self.event.save()
+        self.assertTrue(self.event.has_participant(self.riders[2]))
+        self.assertEqual(self.event.participant_count, 3)
+
+    def test_related_manager_changes_are_counted(self):
+        self.event.participants.add(self.riders[0], self.riders[1])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participant_count, 2)
+        self.riders[0].joined_events.clear()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participant_count, 1)
+
+    def test_event_list_query_count_is_constant(self):
+        def list_queries():
+            self.client.force_authenticate(self.riders[0].user)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/events/')
+            self.assertEqual(response.status_code, 200)
+            return len(queries), response.data['results']
+
+        self.event.add_participant(self.riders[0])
+        one_event, results = list_queries()
+        self.assertEqual(results[0]['participant_count'], 1)
+        self.assertTrue(results[0]['user_registered'])
+        for _ in range(3):
+            event = self.create_event()
+            for rider in self.riders:
+                event.add_participant(rider)
+        self.assertEqual(list_queries()[0], one_event)
+
+
+class PostLikeTests(TestCase):
+    def setUp(self):
+        self.riders = [Rider.objects.create(user=User.objects.create_user(f'rider{i}')) for i in range(2)]
+        self.post = Post.objects.create(author=self.riders[0], title='Ride report', content='c')
+        self.client = APIClient()
+
+    def like_as(self, rider):
+        self.client.force_authenticate(rider.user)
+        return self.client.post(f'/api/posts/{self.post.pk}/like/')
+
+    def test_like_toggles_and_counts(self):
+        self.assertEqual(self.like_as(self.riders[0]).data, {'liked': True, 'likes_count': 1})
+        self.assertEqual(self.like_as(self.riders[1]).data, {'liked': True, 'likes_count': 2})
+        self.assertEqual(self.like_as(self.riders[0]).data, {'liked': False, 'likes_count': 1})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.likes.count(), 1)
+
+    def test_toggle_cost_does_not_grow_with_likes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.like_as(self.riders[0])
+        first = len(queries)
+        for i in range(5):
+            self.post.likes.add(Rider.objects.create(user=User.objects.create_user(f'fan{i}')))
+        with self.assertNumQueries(first):
+            self.assertEqual(self.like_as(self.riders[1]).data['likes_count'], 7)
+
+    def test_list_shows_liked_by_me(self):
+        self.post.toggle_like(self.riders[1])
+        for rider, liked in [(self.riders[0], False), (self.riders[1], True)]:
+            self.client.force_authenticate(rider.user)
+            result = self.client.get('/api/posts/').data['results'][0]
+            self.assertEqual((result['likes_count'], result['liked_by_me']), (1, liked))
+        self.client.force_authenticate(None)
+        self.assertFalse(self.client.get('/api/posts/').data['results'][0]['liked_by_me'])
+
+    def test_related_manager_changes_are_counted(self):
+        self.post.likes.add(*self.riders)
+        self.riders[0].liked_posts.remove(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_saving_a_stale_post_keeps_the_counter(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        self.post.toggle_like(self.riders[0])
+        stale.title = 'Edited'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+
+class BenefitUsageLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.benefit = Benefit.objects.create(
+            category=BenefitCategory.objects.create(name='Service'), title='Chain service', description='d', usage_limit=2,
+        )
+        self.rider = Rider.objects.create(user=User.objects.create_user('rider'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.rider.user)
+
+    def use(self):
+        return self.client.post(f'/api/benefits/{self.benefit.pk}/use_benefit/', {'notes': 'n'}, format='json')
+
+    def counter(self):
+        return BenefitUsageCounter.objects.get(rider=self.rider, benefit=self.benefit).count
+
+    def test_usage_limit_is_enforced(self):
+        self.assertEqual(self.use().status_code, 200)
+        self.assertEqual(self.use().status_code, 200)
+        response = self.use()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('2 times', response.data['error'])
+        self.assertEqual(self.counter(), 2)
+        self.assertEqual(BenefitUsage.objects.filter(rider=self.rider).count(), 2)
+
+    def test_counter_never_passes_the_limit(self):
+        results = [BenefitUsageCounter.increment(self.rider.pk, self.benefit.pk, limit=2) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(self.counter(), 2)
+        self.assertFalse(BenefitUsageCounter.increment(self.rider.pk, self.benefit.pk + 1, limit=0))
+
+    def test_unlimited_benefit_keeps_counting(self):
+        self.benefit.usage_limit = None
+        self.benefit.save()
+        for _ in range(3):
+            self.assertEqual(self.use().status_code, 200)
+        self.assertEqual(self.counter(), 3)
+
+    def test_deleted_usage_frees_a_use(self):
+        self.use()
+        self.use()
+        BenefitUsage.objects.filter(rider=self.rider).first().delete()
+        self.assertEqual(self.counter(), 1)
+        self.assertEqual(self.use().status_code, 200)
+
+    def test_redemption_cost_does_not_grow_with_history(self):
+        Benefit.objects.filter(pk=self.benefit.pk).update(usage_limit=None)
+        self.use()
+        with CaptureQueriesContext(connection) as queries:
+            self.use()
+        BenefitUsage.objects.bulk_create([BenefitUsage(rider=self.rider, benefit=self.benefit) for _ in range(20)])
+        with self.assertNumQueries(len(queries)):
+            self.assertEqual(self.use().status_code, 200)
+
+
+@override_settings(REDEMPTION_TOKEN_SECRET='test-secret')
+class RedemptionTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.zone = Zone.objects.create(name='North')
+        self.benefit = Benefit.objects.create(
+            category=BenefitCategory.objects.create(name='Service'), title='Chain service', description='d',
+        )
+        self.rider = Rider.objects.create(user=User.objects.create_user('rider'), zone=self.zone)
+        self.client = APIClient()
+
+    def key(self, benefit_id=None):
+        return redemption_tokens.benefit_key('test-secret', benefit_id or self.benefit.pk)
+
+    def redeem(self):
+        self.client.force_authenticate(self.rider.user)
+        response = self.client.post(f'/api/benefits/{self.benefit.pk}/use_benefit/')
+        self.client.force_authenticate(None)
+        return response
+
+    def verify(self, token):
+        return self.client.post('/api/benefits/verify/', {'token': token}, format='json')
+
+    def test_issued_token_verifies_once(self):
+        response = self.redeem()
+        token = response.data['redemption_token']
+        verified = self.verify(token)
+        self.assertEqual(verified.status_code, 200)
+        self.assertEqual(
+            (verified.data['usage'], verified.data['rider'], verified.data['benefit'], verified.data['zone']),
+            (response.data['usage']['id'], self.rider.pk, self.benefit.pk, self.zone.pk),
+        )
+        replay = self.verify(token)
+        self.assertEqual(replay.status_code, 409)
+        self.assertFalse(replay.data['valid'])
+        self.assertEqual(RedemptionNonce.objects.count(), 1)
+
+    def test_each_token_has_its_own_nonce(self):
+        first, second = self.redeem().data['redemption_token'], self.redeem().data['redemption_token']
+        self.assertNotEqual(redemption_tokens.read(first).nonce, redemption_tokens.read(second).nonce)
+        self.assertEqual(self.verify(first).status_code, 200)
+        self.assertEqual(self.verify(second).status_code, 200)
+
+    def test_tampered_tokens_are_rejected(self):
+        token = redemption_tokens.sign(self.key(), 1, self.rider.pk, self.benefit.pk, None, 2 ** 31)
+        data = bytearray(redemption_tokens._b64decode(token))
+        data[10] ^= 1
+        tampered = redemption_tokens._b64encode(bytes(data))
+        # Same claims signed with another benefit's key
+        forged = redemption_tokens.sign(self.key(self.benefit.pk + 1), 1, self.rider.pk, self.benefit.pk, None, 2 ** 31)
+        for bad in [tampered, forged, token[:-2], 'not a token', '']:
+            response = self.verify(bad)
+            self.assertEqual(response.status_code, 400, bad)
+            self.assertFalse(response.data['valid'])
+        self.assertFalse(RedemptionNonce.objects.exists())
+
+    def test_expired_token_is_rejected(self):
+        token = redemption_tokens.sign(self.key(), 1, self.rider.pk, self.benefit.pk, None, 1)
+        response = self.verify(token)
+        self.assertEqual(response.data['error'], 'Token expired')
+        with self.assertRaises(redemption_tokens.TokenError):
+            redemption_tokens.verify(token, {self.benefit.pk: self.key()})
+
+    def test_offline_verification_needs_no_database(self):
+        token = self.redeem().data['redemption_token']
+        with self.assertNumQueries(0):
+            claims = redemption_tokens.verify(token, {self.benefit.pk: self.key()})
+        self.assertEqual((claims.rider_id, claims.zone_id), (self.rider.pk, self.zone.pk))
+        with self.assertRaisesMessage(redemption_tokens.TokenError, 'Unknown benefit'):
+            redemption_tokens.verify(token, {})
+
+
+class BenefitUsageRollupTests(TestCase):
+    def setUp(self):
+        self.zone = Zone.objects.create(name='North')
+        self.benefit = Benefit.objects.create(
+            category=BenefitCategory.objects.create(name='Service'), title='Chain service', description='d', partner_name='Bike Shop',
+        )
+        self.rider = Rider.objects.create(user=User.objects.create_user('rider'), zone=self.zone)
+        # Midday, so the usage below stays on one day
+        self.now = timezone.make_aware(datetime.datetime(2026, 6, 15, 12))
+
+    def record(self, hours_ago):
+        usage = BenefitUsage.objects.create(rider=self.rider, benefit=self.benefit)
+        BenefitUsage.objects.filter(pk=usage.pk).update(used_at=self.now - datetime.timedelta(hours=hours_ago))
+        usage.refresh_from_db()
+        return usage
+
+    def rolled_up(self):
+        return BenefitUsageDaily.objects.aggregate(total=Sum('uses'))['total'] or 0
+
+    def test_runs_fold_only_usage_since_the_mark(self):
+        self.record(3)
+        self.record(2)
+        recent = self.record(0)
+        self.assertEqual(rollups.roll_up(until=self.now - datetime.timedelta(hours=1)), (2, 1))
+        self.assertEqual(rollups.high_water_mark(), self.now - datetime.timedelta(hours=1))
+        # Nothing new before the mark
+        self.assertEqual(rollups.roll_up(until=self.now - datetime.timedelta(hours=1)), (0, 0))
+        self.assertEqual(rollups.roll_up(until=recent.used_at + datetime.timedelta(seconds=1)), (1, 1))
+        self.assertEqual(self.rolled_up(), 3)
+        row = BenefitUsageDaily.objects.get(day=timezone.localdate(recent.used_at))
+        self.assertEqual((row.zone_id, row.category_id, row.partner_name), (self.zone.pk, self.benefit.category_id, 'Bike Shop'))
+
+    def test_usage_count_combines_rollups_and_recent_usage(self):
+        self.record(3)
+        rollups.roll_up(until=self.now - datetime.timedelta(hours=1))
+        self.record(0)
+        self.assertEqual(rollups.usage_counts([self.benefit.pk]), {self.benefit.pk: 2})
+
+    def test_deleting_rolled_up_usage_decrements_the_rollup(self):
+        old = self.record(3)
+        self.record(3)
+        recent = self.record(0)
+        rollups.roll_up(until=self.now - datetime.timedelta(hours=1))
+        old.delete()
+        self.assertEqual(self.rolled_up(), 1)
+        # Not folded in yet, so the rollups are left alone
+        recent.delete()
+        self.assertEqual(self.rolled_up(), 1)
+        self.assertEqual(rollups.usage_counts([self.benefit.pk]), {self.benefit.pk: 1})
+
+    def test_rebuild_matches_incremental_runs(self):
+        for hours_ago in (50, 26, 3, 2):
+            self.record(hours_ago)
+        rollups.roll_up(until=self.now - datetime.timedelta(hours=24))
+        rollups.roll_up(until=self.now)
+        incremental = rollups.report('day')
+        rollups.reset()
+        rollups.roll_up(until=self.now)
+        self.assertEqual(rollups.report('day'), incremental)
+
+    def test_report_is_staff_only(self):
+        self.record(3)
+        rollups.roll_up(until=self.now)
+        client = APIClient()
+        client.force_authenticate(self.rider.user)
+        self.assertEqual(client.get('/api/benefit-usage/report/').status_code, 403)
+        client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        response = client.get('/api/benefit-usage/report/', {'group': 'partner'})
+        self.assertEqual(response.data['results'], [{'partner_name': 'Bike Shop', 'uses': 1}])
+        self.assertEqual(client.get('/api/benefit-usage/report/', {'group': 'rider'}).status_code, 400)
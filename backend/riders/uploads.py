@@ -0,0 +1,327 @@
+"""
+Resumable, chunked event photo uploads.
+
+A client first registers a batch of files (name, size, optional SHA-256),
+then PUTs each file in chunks with a ``Content-Range`` header and a
+``Content-Digest`` (or ``Digest``) SHA-256 of the chunk. Each verified chunk
+is appended to a part file under ``PHOTO_UPLOAD_TEMP_DIR``; the session's
+``received`` offset tells an interrupted client where to resume. Finished
+files are then moved into storage and their EventPhoto rows created in bulk.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.text import get_valid_filename
+
+from . import blobs, images
+from .models import EventPhoto, MediaBlob, PhotoUpload, Rider
+from .storage import blob_name
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+# Bytes read from the request (and the part file) at a time
+BLOCK_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+
+def part_path(upload):
+    return os.path.join(settings.PHOTO_UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def can_upload(event, user):
+    """Organizers, participants and staff may add photos to an event"""
+    if user.is_staff:
+        return True
+    rider = getattr(user, 'rider', None)
+    return rider is not None and (event.organizer_id == rider.pk or event.has_participant(rider))
+
+
+def clean_filename(filename):
+    name = get_valid_filename(os.path.basename(filename or ''))
+    if not name or not name.lower().endswith(ALLOWED_EXTENSIONS):
+        raise UploadError(f'{filename!r} is not a supported image file ({", ".join(ALLOWED_EXTENSIONS)})')
+    return name
+
+
+def quota_usage(event, rider):
+    """(photos, bytes) a rider has uploaded or reserved for an event"""
+    photos = EventPhoto.objects.filter(event=event, uploaded_by=rider).count()
+    uploads = PhotoUpload.objects.filter(event=event, rider=rider)
+    pending = uploads.filter(status='uploading').count()
+    # Completed uploads whose photo was deleted no longer count
+    used_bytes = uploads.exclude(status='complete', photo__isnull=True).aggregate(total=Sum('size'))['total'] or 0
+    return photos + pending, used_bytes
+
+
+def create_uploads(event, rider, files):
+    """
+    Register a batch of files (dicts with filename, size, sha256, caption)
+    as upload sessions, enforcing the per-rider quotas for the event.
+    """
+    for entry in files:
+        entry['filename'] = clean_filename(entry['filename'])
+        if entry['size'] > settings.PHOTO_UPLOAD_MAX_FILE_SIZE:
+            raise UploadError(
+                f'{entry["filename"]} is larger than {settings.PHOTO_UPLOAD_MAX_FILE_SIZE} bytes',
+                status=413,
+            )
+
+    with transaction.atomic():
+        # Serialize batches of the same rider so two requests can't both pass the quota check
+        Rider.objects.select_for_update().filter(pk=rider.pk).first()
+        used_photos, used_bytes = quota_usage(event, rider)
+        if used_photos + len(files) > settings.PHOTO_UPLOAD_MAX_PHOTOS_PER_EVENT:
+            raise UploadError(
+                f'You can upload at most {settings.PHOTO_UPLOAD_MAX_PHOTOS_PER_EVENT} photos to this event',
+                status=413,
+                remaining_photos=max(settings.PHOTO_UPLOAD_MAX_PHOTOS_PER_EVENT - used_photos, 0),
+            )
+        if used_bytes + sum(entry['size'] for entry in files) > settings.PHOTO_UPLOAD_MAX_BYTES_PER_EVENT:
+            raise UploadError(
+                f'You can upload at most {settings.PHOTO_UPLOAD_MAX_BYTES_PER_EVENT} bytes to this event',
+                status=413,
+                remaining_bytes=max(settings.PHOTO_UPLOAD_MAX_BYTES_PER_EVENT - used_bytes, 0),
+            )
+        return PhotoUpload.objects.bulk_create([
+            PhotoUpload(event=event, rider=rider, **entry) for entry in files
+        ])
+
+
+def parse_content_range(header, size):
+    """Return (start, length) of a ``bytes start-end/total`` range within an upload"""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError('A Content-Range header of the form "bytes start-end/total" is required')
+    start, end, total = (int(group) for group in match.groups())
+    if total != size or end < start or end >= total:
+        raise UploadError('Content-Range does not fit the upload')
+    length = end - start + 1
+    if length > settings.PHOTO_UPLOAD_CHUNK_SIZE:
+        raise UploadError(f'Chunks cannot exceed {settings.PHOTO_UPLOAD_CHUNK_SIZE} bytes', status=413)
+    return start, length
+
+
+def parse_digest(headers):
+    """
+    SHA-256 of the chunk from ``Content-Digest: sha-256=:<base64>:`` (RFC 9530)
+    or the older ``Digest: SHA-256=<base64>``.
+    """
+    for header in ('Content-Digest', 'Digest'):
+        for item in (headers.get(header) or '').split(','):
+            algorithm, _, value = item.strip().partition('=')
+            if algorithm.lower() != 'sha-256':
+                continue
+            try:
+                digest = base64.b64decode(value.strip(':'), validate=True)
+            except (binascii.Error, ValueError):
+                break
+            if len(digest) == hashlib.sha256().digest_size:
+                return digest
+    raise UploadError('A SHA-256 Content-Digest header is required for every chunk')
+
+
+def check_offset(upload, start):
+    if upload.status != 'uploading':
+        raise UploadError('This upload is already complete', status=409)
+    if start != upload.received:
+        raise UploadError('Chunk does not start at the resume offset', status=409, offset=upload.received)
+
+
+def write_chunk(upload, stream, start, length, expected_digest):
+    """
+    Stream ``length`` bytes from ``stream`` into the upload's part file at
+    ``start``, which must be the current resume offset. Returns the upload.
+
+    The body is read into a temporary chunk file with no transaction open, so
+    a slow client doesn't hold a connection or a row lock; the lock is only
+    taken to re-check the offset and append the verified chunk.
+    """
+    check_offset(upload, start)
+
+    os.makedirs(settings.PHOTO_UPLOAD_TEMP_DIR, exist_ok=True)
+    with tempfile.TemporaryFile(dir=settings.PHOTO_UPLOAD_TEMP_DIR) as chunk:
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                raise UploadError('The request body is shorter than its Content-Range')
+            digest.update(block)
+            chunk.write(block)
+            remaining -= len(block)
+        if digest.digest() != expected_digest:
+            raise UploadError('Chunk checksum mismatch', offset=start)
+
+        with transaction.atomic():
+            upload = PhotoUpload.objects.select_for_update().filter(pk=upload.pk).first()
+            if upload is None:
+                raise UploadError('Upload not found', status=404)
+            # Another request may have written this chunk while the body was being read
+            check_offset(upload, start)
+
+            fd = os.open(part_path(upload), os.O_RDWR | os.O_CREAT, 0o600)
+            with os.fdopen(fd, 'r+b') as part:
+                # Drop anything past the last acknowledged byte (e.g. from an interrupted chunk)
+                part.truncate(start)
+                part.seek(start)
+                chunk.seek(0)
+                try:
+                    shutil.copyfileobj(chunk, part, BLOCK_SIZE)
+                except BaseException:
+                    part.truncate(start)
+                    raise
+
+            upload.received = start + length
+            upload.save(update_fields=['received', 'updated_at'])
+    return upload
+
+
+def verify_file(path, upload):
+    """
+    Check a fully received part file against its size, checksum and image
+    type. Returns its hex SHA-256.
+    """
+    from PIL import Image
+
+    if os.path.getsize(path) != upload.size:
+        raise UploadError('The received file does not match its declared size')
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE * 16), b''):
+            digest.update(block)
+    if upload.sha256 and digest.hexdigest() != upload.sha256.lower():
+        raise UploadError('File checksum mismatch')
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise UploadError('The file is not a valid image')
+    if image_format not in ALLOWED_FORMATS:
+        raise UploadError(f'{image_format} images are not supported')
+    return digest.hexdigest()
+
+
+def complete_uploads(event, rider, upload_ids):
+    """
+    Turn fully received uploads into EventPhoto rows, created in one batch.
+    Returns (photos, errors) where errors maps upload id to a message.
+
+    The photos point at the blob named by each file's hash; the part files
+    are only moved there once the rows are committed, so a rollback or a
+    crash before the commit leaves the uploads complete-able again.
+    """
+    photos, completed = [], []
+    with transaction.atomic():
+        # Locking the rows makes a concurrent complete of the same uploads wait, then find them complete
+        uploads = list(
+            PhotoUpload.objects.select_for_update()
+            .filter(event=event, rider=rider, status='uploading', pk__in=upload_ids)
+        )
+        found = {str(upload.pk) for upload in uploads}
+        errors = {str(upload_id): 'Unknown or already completed upload' for upload_id in upload_ids if str(upload_id) not in found}
+
+        for upload in uploads:
+            if not upload.is_received:
+                errors[str(upload.pk)] = f'Upload is incomplete ({upload.received}/{upload.size} bytes)'
+                continue
+            try:
+                digest = verify_file(part_path(upload), upload)
+            except (UploadError, OSError) as exc:
+                errors[str(upload.pk)] = getattr(exc, 'message', 'The uploaded file is missing')
+                continue
+            photo = EventPhoto(event=event, uploaded_by=rider, caption=upload.caption)
+            photo.photo.name = blob_name(digest, posixpath.splitext(upload.filename)[1])
+            photos.append(photo)
+            completed.append(upload)
+
+        EventPhoto.objects.bulk_create(photos)
+        for upload, photo in zip(completed, photos):
+            upload.photo = photo
+            upload.status = 'complete'
+        PhotoUpload.objects.bulk_update(completed, ['photo', 'status'])
+        # bulk_create skips post_save, so take media references and queue renditions here
+        blobs.acquire([photo.photo.name for photo in photos])
+        # Registered before the renditions so their source is in place when they run
+        transaction.on_commit(lambda: [store_part(upload, photo.photo.name) for upload, photo in zip(completed, photos)])
+        for photo in photos:
+            images.schedule_renditions(photo)
+
+    return photos, errors
+
+
+def store_part(upload, name):
+    """Move a completed upload's part file into its blob (or drop it if the blob exists)"""
+    try:
+        default_storage.move_into(part_path(upload), name)
+    except FileNotFoundError:
+        # Already moved
+        return
+    discard_part(upload)
+    # The blob row was created before its file existed
+    MediaBlob.objects.filter(name=name, size=0).update(size=default_storage.size(name))
+
+
+def store_leftover_parts(cutoff):
+    """
+    Finish moving the part files (last written before the ``cutoff``
+    timestamp) of uploads completed by a process that stopped before the
+    move. Returns the number of part files handled.
+    """
+    try:
+        filenames = os.listdir(settings.PHOTO_UPLOAD_TEMP_DIR)
+    except FileNotFoundError:
+        return 0
+    handled = 0
+    for filename in filenames:
+        upload_id, extension = os.path.splitext(filename)
+        try:
+            uuid.UUID(upload_id)
+            if extension != '.part' or os.path.getmtime(os.path.join(settings.PHOTO_UPLOAD_TEMP_DIR, filename)) > cutoff:
+                continue
+        except (ValueError, OSError):
+            continue
+        upload = PhotoUpload.objects.filter(pk=upload_id, status='complete').select_related('photo').first()
+        if upload is None:
+            continue
+        if upload.photo is not None:
+            store_part(upload, upload.photo.photo.name)
+            # Renditions queued at completion found no source to read
+            images.schedule_renditions(upload.photo)
+        else:
+            discard_part(upload)
+        handled += 1
+    return handled
+
+
+def discard_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def cancel_upload(upload):
+    discard_part(upload)
+    upload.delete()
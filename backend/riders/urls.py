@@ -22,6 +22,7 @@ router.register(r'membership-applications', views.MembershipApplicationViewSet)
 router.register(r'riders', views.RiderViewSet)
 router.register(r'events', views.RideEventViewSet)
 router.register(r'posts', views.PostViewSet)
+router.register(r'comments', views.CommentViewSet)
 router.register(r'benefit-categories', views.BenefitCategoryViewSet)
 router.register(r'benefits', views.BenefitViewSet)
 router.register(r'benefit-usage', views.BenefitUsageViewSet)
@@ -29,5 +30,6 @@ router.register(r'notices', views.NoticeViewSet)
 
 urlpatterns = [
     path('', api_root, name='api-root'),
+    path('api/search/', views.search_view, name='search'),
     path('api/', include(router.urls)),
 ]
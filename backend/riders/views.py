@@ -1,17 +1,40 @@
-from rest_framework import generics, viewsets, status
-from rest_framework.decorators import action
+import hashlib
+import os
+import posixpath
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from urllib.parse import urlencode
+from rest_framework import generics, mixins, viewsets, status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
-from django.db import models
-from .models import Rider, RideEvent, Post, Zone, MembershipApplication, BenefitCategory, Benefit, BenefitUsage, Notice
-from .serializers import RiderSerializer, RideEventSerializer, PostSerializer, ZoneSerializer, MembershipApplicationSerializer, BenefitCategorySerializer, BenefitSerializer, BenefitUsageSerializer, NoticeSerializer
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, Exists, Max, OuterRef, Prefetch, Sum, Value
+from .models import Rider, RideEvent, EventPhoto, PhotoUpload, Post, Comment, Zone, MembershipApplication, BenefitCategory, Benefit, BenefitUsage, BenefitUsageCounter, RedemptionNonce, Notice
+from .calendar import ICalendarRenderer, generate_feed
+from . import catalog, feed, geo, media, redemption_tokens, rollups, search, uploads
+from .storage import private_storage
+from .serializers import RiderSerializer, RideEventSerializer, RideEventListSerializer, EventPhotoSerializer, PhotoUploadSerializer, PostSerializer, CommentSerializer, ZoneSerializer, MembershipApplicationSerializer, BenefitCategorySerializer, BenefitSerializer, BenefitUsageSerializer, NoticeSerializer
 
 class ZoneViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Zone.objects.filter(is_active=True)
     serializer_class = ZoneSerializer
     permission_classes = [AllowAny]
+    pagination_class = None  # Small lookup table, served whole
 
 class MembershipApplicationViewSet(viewsets.ModelViewSet):
     queryset = MembershipApplication.objects.all()
@@ -73,9 +96,9 @@ class MembershipApplicationViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Check if user with this phone already exists
+            # Check if user with this phone already exists (validated_data holds the E.164 form)
             phone = serializer.validated_data.get('phone')
-            if User.objects.filter(username=phone).exists():
+            if Rider.objects.filter(phone=phone).exists() or User.objects.filter(username=phone).exists():
                 return Response(
                     {'error': 'A user with this phone number already exists'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -83,23 +106,8 @@ class MembershipApplicationViewSet(viewsets.ModelViewSet):
             
             # Create user account
             try:
-                user = User.objects.create_user(
-                    username=phone,
-                    email=serializer.validated_data.get('email', ''),
-                    password=password,
-                    first_name=serializer.validated_data.get('full_name', '').split()[0] if serializer.validated_data.get('full_name') else '',
-                    last_name=' '.join(serializer.validated_data.get('full_name', '').split()[1:]) if len(serializer.validated_data.get('full_name', '').split()) > 1 else ''
-                )
-                
-                # Create Rider profile
-                rider = Rider.objects.create(
-                    user=user,
-                    membership_status='pending',
-                    zone_id=serializer.validated_data.get('zone').id if serializer.validated_data.get('zone') else None
-                )
-                
-                # Save the application and link to user
-                application = serializer.save(user=user)
+                with transaction.atomic():
+                    user, application = self.create_account(serializer, phone, password)
                 
                 return Response({
                     'message': 'Account created and application submitted successfully! You can now login with your phone number and password.',
@@ -115,13 +123,37 @@ class MembershipApplicationViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def create_account(self, serializer, phone, password):
+        """Create the user, rider profile and application together"""
+        full_name = serializer.validated_data.get('full_name', '').split()
+        user = User.objects.create_user(
+            username=phone,
+            email=serializer.validated_data.get('email', ''),
+            password=password,
+            first_name=full_name[0] if full_name else '',
+            last_name=' '.join(full_name[1:])
+        )
+        
+        # Create Rider profile
+        Rider.objects.create(
+            user=user,
+            phone=phone,
+            membership_status='pending',
+            zone_id=serializer.validated_data.get('zone').id if serializer.validated_data.get('zone') else None
+        )
+        
+        # Save the application and link to user
+        application = serializer.save(user=user)
+        return user, application
+
 class RiderViewSet(viewsets.ModelViewSet):
     queryset = Rider.objects.all()
     serializer_class = RiderSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        return Rider.objects.select_related('user')    
+        return Rider.objects.select_related('user').order_by('-created_at')
+    
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def featured(self, request):
         """Get featured riders (team controllers) for Help & Support"""
@@ -162,31 +194,137 @@ class RiderViewSet(viewsets.ModelViewSet):
         
         return Response(riders_data)
 
+def apply_near_filter(queryset, request):
+    """Apply the ?near=lat,lng&radius=km filter using the geohash grid index"""
+    near = request.query_params.get('near')
+    if not near:
+        return queryset
+    try:
+        latitude, longitude, radius_km = geo.parse_near(near, request.query_params.get('radius'))
+    except ValueError as e:
+        raise ValidationError({'error': f'Invalid near/radius parameters: {e}'})
+    return geo.filter_near(queryset, latitude, longitude, radius_km)
+
+ICAL_TOKEN_SALT = 'riders.ical-feed'
+
+def parse_calendar_bound(value):
+    """Parse a calendar query bound given as a date or an ISO 8601 datetime"""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def comment_thread_response(view, request, post=None, event=None):
+    """
+    Comments on a post or event in thread order (GET) or a new comment or
+    reply (POST). Each page is one range scan over the path index;
+    ``?max_depth=0`` lists just the thread roots with their reply counts.
+    """
+    if request.method == 'POST':
+        if not hasattr(request.user, 'rider'):
+            return Response({'error': 'Rider profile required'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CommentSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        parent = serializer.validated_data.get('parent')
+        if parent is not None:
+            if parent.post_id != (post.pk if post else None) or parent.event_id != (event.pk if event else None):
+                return Response({'error': 'Replies must be on the same thread'}, status=status.HTTP_400_BAD_REQUEST)
+            if parent.is_deleted:
+                return Response({'error': 'This comment has been deleted'}, status=status.HTTP_400_BAD_REQUEST)
+        comment = Comment.add(request.user.rider, serializer.validated_data['content'], post=post, event=event, parent=parent)
+        return Response(CommentSerializer(comment, context={'request': request}).data, status=status.HTTP_201_CREATED)
+    
+    comments = Comment.objects.filter(**({'post': post} if post else {'event': event}))
+    max_depth = request.query_params.get('max_depth')
+    if max_depth:
+        try:
+            max_depth = int(max_depth)
+        except ValueError:
+            return Response({'error': 'max_depth must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        # Roots alone use the partial roots index
+        comments = comments.filter(parent__isnull=True) if max_depth <= 0 else comments.filter(depth__lte=max_depth)
+    
+    page = view.paginate_queryset(comments.select_related('author__user').order_by('path'))
+    serializer = CommentSerializer(page, many=True, context={'request': request})
+    return view.get_paginated_response(serializer.data)
+
 class RideEventViewSet(viewsets.ModelViewSet):
     queryset = RideEvent.objects.all()
     serializer_class = RideEventSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    # Actions that render the lean RideEventListSerializer
+    summary_actions = ('list', 'upcoming', 'past', 'calendar')
+
+    # Longest window /events/calendar/ will serve in one request
+    max_calendar_range = timedelta(days=366)
+
+    def get_serializer_class(self):
+        if self.action in self.summary_actions:
+            return RideEventListSerializer
+        return RideEventSerializer
+
+    def get_base_queryset(self):
+        """
+        Events with everything the serializer reads loaded up front, so a page
+        of events costs a fixed number of queries.
+        """
+        queryset = RideEvent.objects.select_related('organizer__user')
+        
+        if self.action in self.summary_actions:
+            # Only counts and the first few avatars, however large the event
+            preview = Rider.objects.select_related('user').order_by('id')[:RideEventListSerializer.PARTICIPANT_PREVIEW_SIZE]
+            queryset = queryset.annotate(uploaded_photo_count=Count('uploaded_photos')).prefetch_related(
+                Prefetch('participants', queryset=preview, to_attr='participant_preview'),
+            )
+        else:
+            queryset = queryset.prefetch_related(
+                'participants__user',
+                Prefetch('uploaded_photos', queryset=EventPhoto.objects.select_related('uploaded_by__user')),
+            )
+        
+        rider = getattr(self.request.user, 'rider', None)
+        if rider is not None:
+            registered = RideEvent.participants.through.objects.filter(
+                rideevent_id=OuterRef('pk'), rider_id=rider.pk
+            )
+            queryset = queryset.annotate(user_registered=Exists(registered))
+        else:
+            queryset = queryset.annotate(user_registered=Value(False, output_field=models.BooleanField()))
+        
+        return queryset
+
     def get_queryset(self):
-        queryset = RideEvent.objects.select_related('organizer__user').prefetch_related('participants__user')
+        # Registration and sub-resource actions only need the event row itself
+        if self.action in ('join', 'leave', 'waitlist', 'participants', 'photos',
+                           'photo_uploads', 'photo_upload', 'complete_photo_uploads', 'comments'):
+            return RideEvent.objects.all()
+        
+        queryset = self.get_base_queryset()
+        
+        queryset = apply_near_filter(queryset, self.request)
         
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Filter by upcoming/past
+        # Filter by upcoming/past (statuses are advanced by update_event_status)
         event_type = self.request.query_params.get('type', None)
         if event_type == 'upcoming':
-            from django.utils import timezone
-            today = timezone.now().date()
-            queryset = queryset.filter(date__gte=today, status='upcoming')
+            queryset = queryset.filter(status='upcoming')
         elif event_type == 'past':
-            from django.utils import timezone
-            today = timezone.now().date()
-            queryset = queryset.filter(
-                models.Q(date__lt=today) | models.Q(status='completed')
-            )
+            queryset = queryset.filter(status='completed')
         
         return queryset
 
@@ -198,28 +336,217 @@ class RideEventViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Get upcoming events"""
-        from django.utils import timezone
-        today = timezone.now().date()
-        events = RideEvent.objects.filter(
-            date__gte=today, 
-            status='upcoming'
-        ).select_related('organizer__user').prefetch_related('participants__user')
+        events = apply_near_filter(self.get_base_queryset().filter(status='upcoming'), request)
         
-        serializer = self.get_serializer(events, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(events)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def past(self, request):
         """Get past/completed events"""
-        from django.utils import timezone
-        today = timezone.now().date()
-        events = RideEvent.objects.filter(
-            models.Q(date__lt=today) | models.Q(status='completed')
-        ).select_related('organizer__user').prefetch_related('participants__user')
+        events = apply_near_filter(self.get_base_queryset().filter(status='completed'), request)
+        
+        page = self.paginate_queryset(events)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def paginate_sub_resource(self, queryset, serializer_class):
+        page = self.paginate_queryset(queryset)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def participants(self, request, pk=None):
+        """Get the paginated participant list of an event"""
+        event = self.get_object()
+        riders = event.participants.select_related('user').order_by('id')
+        return self.paginate_sub_resource(riders, RiderSerializer)
+
+    @action(detail=True, methods=['get'])
+    def photos(self, request, pk=None):
+        """Get the paginated uploaded photos of an event"""
+        event = self.get_object()
+        photos = event.uploaded_photos.select_related('uploaded_by__user').order_by('uploaded_at', 'id')
+        return self.paginate_sub_resource(photos, EventPhotoSerializer)
+
+    @action(detail=True, methods=['get', 'post'])
+    def comments(self, request, pk=None):
+        """Get the comments in thread order (?max_depth=0 for thread roots only) or add a comment or reply (POST)"""
+        return comment_thread_response(self, request, event=self.get_object())
+
+    def upload_error_response(self, error):
+        return Response({'error': error.message, **error.extra}, status=error.status)
+
+    @action(detail=True, methods=['get', 'post'], url_path='photos/upload', permission_classes=[IsAuthenticated])
+    def photo_uploads(self, request, pk=None):
+        """List your unfinished photo uploads (GET) or start uploading a batch of photos (POST)"""
+        event = self.get_object()
+        
+        if not hasattr(request.user, 'rider'):
+            return Response({'error': 'Rider profile required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rider = request.user.rider
         
+        if request.method == 'GET':
+            pending = PhotoUpload.objects.filter(event=event, rider=rider, status='uploading')
+            return Response({
+                'chunk_size': settings.PHOTO_UPLOAD_CHUNK_SIZE,
+                'uploads': PhotoUploadSerializer(pending, many=True).data
+            })
+        
+        if not uploads.can_upload(event, request.user):
+            return Response({'error': 'Only the organizer and participants can upload photos'}, status=status.HTTP_403_FORBIDDEN)
+        
+        files = request.data.get('files') if isinstance(request.data, dict) else None
+        if not isinstance(files, list) or not files:
+            return Response({'error': 'files must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PhotoUploadSerializer(data=files, many=True)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            created = uploads.create_uploads(event, rider, serializer.validated_data)
+        except uploads.UploadError as error:
+            return self.upload_error_response(error)
+        
+        return Response({
+            'chunk_size': settings.PHOTO_UPLOAD_CHUNK_SIZE,
+            'uploads': PhotoUploadSerializer(created, many=True).data
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path=r'photos/upload/(?P<upload_id>[0-9a-f-]{36})',
+            permission_classes=[IsAuthenticated])
+    def photo_upload(self, request, pk=None, upload_id=None):
+        """
+        Get the resume offset of an upload (GET), send its next chunk (PUT, with
+        Content-Range and Content-Digest headers) or cancel it (DELETE)
+        """
+        event = self.get_object()
+        upload = PhotoUpload.objects.filter(
+            pk=upload_id, event=event, rider__user=request.user
+        ).first()
+        if upload is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if request.method == 'DELETE':
+            if upload.status != 'uploading':
+                return Response({'error': 'This upload is already complete'}, status=status.HTTP_409_CONFLICT)
+            uploads.cancel_upload(upload)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        if request.method == 'PUT':
+            try:
+                start, length = uploads.parse_content_range(request.headers.get('Content-Range'), upload.size)
+                if int(request.META.get('CONTENT_LENGTH') or 0) != length:
+                    raise uploads.UploadError('Content-Length does not match Content-Range')
+                expected_digest = uploads.parse_digest(request.headers)
+                # Read the raw body straight from the request; it is never parsed or buffered whole
+                upload = uploads.write_chunk(upload, request.stream, start, length, expected_digest)
+            except uploads.UploadError as error:
+                return self.upload_error_response(error)
+        
+        return Response(PhotoUploadSerializer(upload).data)
+
+    @action(detail=True, methods=['post'], url_path='photos/upload/complete', permission_classes=[IsAuthenticated])
+    def complete_photo_uploads(self, request, pk=None):
+        """Create the event photos of fully received uploads ({"uploads": [ids]})"""
+        event = self.get_object()
+        
+        if not hasattr(request.user, 'rider'):
+            return Response({'error': 'Rider profile required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload_ids = request.data.get('uploads') if isinstance(request.data, dict) else None
+        if not isinstance(upload_ids, list) or not upload_ids:
+            return Response({'error': 'uploads must be a non-empty list of upload ids'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload_ids = [str(uuid.UUID(str(upload_id))) for upload_id in upload_ids]
+        except ValueError:
+            return Response({'error': 'uploads must be a non-empty list of upload ids'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        photos, errors = uploads.complete_uploads(event, request.user.rider, upload_ids)
+        
+        return Response({
+            'photos': EventPhotoSerializer(photos, many=True, context=self.get_serializer_context()).data,
+            'errors': errors
+        }, status=status.HTTP_201_CREATED if photos else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """Get events overlapping the ?from=&to= window (dates or ISO datetimes)"""
+        start = parse_calendar_bound(request.query_params.get('from'))
+        end = parse_calendar_bound(request.query_params.get('to'))
+        if start is None or end is None:
+            return Response(
+                {'error': 'Both from and to are required as YYYY-MM-DD or ISO 8601 datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if end <= start:
+            return Response({'error': 'to must be after from'}, status=status.HTTP_400_BAD_REQUEST)
+        if end - start > self.max_calendar_range:
+            return Response(
+                {'error': f'The calendar range cannot exceed {self.max_calendar_range.days} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Overlap test on the indexed start/end timestamps
+        events = self.get_base_queryset().filter(starts_at__lt=end, ends_at__gt=start).order_by('starts_at', 'id')
         serializer = self.get_serializer(events, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def calendar_feed(self, request):
+        """Get the private iCalendar feed URL of the current rider"""
+        if not hasattr(request.user, 'rider'):
+            return Response({'error': 'Rider profile required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        token = signing.dumps(request.user.rider.pk, salt=ICAL_TOKEN_SALT)
+        url = request.build_absolute_uri(reverse('rideevent-ical') + '?' + urlencode({'token': token}))
+        return Response({'url': url})
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny], renderer_classes=[ICalendarRenderer])
+    def ical(self, request):
+        """
+        Stream an iCalendar feed of a rider's events (?token= from calendar_feed)
+        or of events organized in a zone (?zone=). Supports conditional GET.
+        """
+        events = RideEvent.objects.exclude(starts_at__isnull=True)
+        if request.query_params.get('token'):
+            try:
+                rider_id = signing.loads(request.query_params['token'], salt=ICAL_TOKEN_SALT)
+            except signing.BadSignature:
+                return HttpResponse('Invalid feed token', status=status.HTTP_403_FORBIDDEN, content_type='text/plain')
+            events = events.filter(participants__id=rider_id)
+            name = 'My Riders Club rides'
+        elif request.query_params.get('zone'):
+            try:
+                zone = Zone.objects.filter(pk=int(request.query_params['zone']), is_active=True).first()
+            except ValueError:
+                zone = None
+            if zone is None:
+                return HttpResponse('Unknown zone', status=status.HTTP_404_NOT_FOUND, content_type='text/plain')
+            events = events.filter(organizer__zone=zone)
+            name = f'Riders Club rides - {zone.name}'
+        else:
+            return HttpResponse('A token or zone parameter is required', status=status.HTTP_400_BAD_REQUEST, content_type='text/plain')
+        
+        # One aggregate query decides whether the client's copy is still current
+        state = events.aggregate(count=Count('id'), id_sum=Sum('id'), last_modified=Max('updated_at'))
+        etag = '"{}"'.format(hashlib.md5(repr(sorted(state.items())).encode()).hexdigest())
+        last_modified = int(state['last_modified'].timestamp()) if state['last_modified'] else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        response = StreamingHttpResponse(
+            generate_feed(events.order_by('starts_at', 'id'), name, request.get_host()),
+            content_type='text/calendar; charset=utf-8'
+        )
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, max-age=300'
+        return response
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def join(self, request, pk=None):
         event = self.get_object()
@@ -234,15 +561,21 @@ class RideEventViewSet(viewsets.ModelViewSet):
         if not event.is_upcoming:
             return Response({'error': 'Cannot join past or non-upcoming events'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check capacity
-        if event.participants.count() >= event.max_participants:
-            return Response({'error': 'Event is full'}, status=status.HTTP_400_BAD_REQUEST)
+        # Check if already joined (indexed lookup on the through table)
+        if event.has_participant(rider):
+            return Response({'error': 'Already joined this event'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if already joined
-        if rider in event.participants.all():
+        # Claim a seat; capacity is enforced atomically by the database
+        try:
+            joined = event.add_participant(rider)
+        except IntegrityError:
             return Response({'error': 'Already joined this event'}, status=status.HTTP_400_BAD_REQUEST)
+        if not joined:
+            return Response(
+                {'error': 'Event is full', 'waitlist_available': event.is_upcoming},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        event.participants.add(rider)
         return Response({
             'message': 'Successfully joined the event',
             'current_joined': event.current_joined
@@ -258,50 +591,187 @@ class RideEventViewSet(viewsets.ModelViewSet):
         
         rider = request.user.rider
         
-        # Check if joined
-        if rider not in event.participants.all():
+        # Remove registration and release the seat in one transaction
+        if not event.remove_participant(rider):
             return Response({'error': 'Not joined this event'}, status=status.HTTP_400_BAD_REQUEST)
         
-        event.participants.remove(rider)
+        # Hand the freed seat to the head of the waitlist
+        event.promote_waitlist()
+        
         return Response({
             'message': 'Successfully left the event',
             'current_joined': event.current_joined
         })
 
+    @action(detail=True, methods=['get', 'post', 'delete'], permission_classes=[IsAuthenticated])
+    def waitlist(self, request, pk=None):
+        """Get your waitlist position (GET), join the waitlist (POST) or leave it (DELETE)"""
+        event = self.get_object()
+        
+        # Check if user has a rider profile
+        if not hasattr(request.user, 'rider'):
+            return Response({'error': 'Rider profile required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rider = request.user.rider
+        entry = event.waitlist_entries.filter(rider=rider).first()
+        
+        if request.method == 'POST':
+            if entry:
+                return Response({'error': 'Already on the waitlist'}, status=status.HTTP_400_BAD_REQUEST)
+            if not event.is_upcoming:
+                return Response({'error': 'Cannot join the waitlist of past or non-upcoming events'}, status=status.HTTP_400_BAD_REQUEST)
+            if event.has_participant(rider):
+                return Response({'error': 'Already joined this event'}, status=status.HTTP_400_BAD_REQUEST)
+            if event.current_joined < event.max_participants:
+                return Response({'error': 'Event has free seats, join it directly'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                entry = event.add_to_waitlist(rider)
+            except IntegrityError:
+                return Response({'error': 'Already on the waitlist'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'message': 'Added to the waitlist',
+                'position': entry.place
+            }, status=status.HTTP_201_CREATED)
+        
+        if request.method == 'DELETE':
+            if not entry:
+                return Response({'error': 'Not on the waitlist'}, status=status.HTTP_400_BAD_REQUEST)
+            entry.delete()
+            return Response({'message': 'Removed from the waitlist'})
+        
+        return Response({
+            'on_waitlist': entry is not None,
+            'position': entry.place if entry else None,
+            'waitlist_count': event.waitlist_entries.count()
+        })
+
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        return Post.objects.select_related('author__user').prefetch_related('likes__user')
+        if self.action in ('like', 'comments'):
+            return Post.objects.all()
+        
+        queryset = Post.objects.select_related('author__user')
+        rider = getattr(self.request.user, 'rider', None)
+        if rider is not None:
+            liked = Post.likes.through.objects.filter(post_id=OuterRef('pk'), rider_id=rider.pk)
+            return queryset.annotate(liked_by_me=Exists(liked))
+        return queryset.annotate(liked_by_me=Value(False, output_field=models.BooleanField()))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Your home feed: posts from your zone and from organizers of events you joined, boosted by relevance"""
+        if not hasattr(request.user, 'rider'):
+            return Response({'error': 'Rider profile required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        after = None
+        if request.query_params.get('cursor'):
+            try:
+                after = feed.decode_cursor(request.query_params['cursor'])
+            except ValueError:
+                raise NotFound('Invalid cursor')
+        
+        items, has_more = feed.page(request.user.rider, after, self.paginator.get_page_size(request))
+        posts = self.get_queryset().in_bulk([post_id for _, post_id, _ in items])
+        
+        results = []
+        for _, post_id, reason in items:
+            if post_id in posts:
+                data = self.get_serializer(posts[post_id]).data
+                data['feed_reason'] = reason
+                results.append(data)
+        
+        next_link = None
+        if has_more:
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', feed.encode_cursor(items[-1]))
+        return Response({'next': next_link, 'previous': None, 'results': results})
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
         post = self.get_object()
-        rider = request.user.rider
         
-        if rider in post.likes.all():
-            post.likes.remove(rider)
-            liked = False
-        else:
-            post.likes.add(rider)
-            liked = True
+        if not hasattr(request.user, 'rider'):
+            return Response({'error': 'Rider profile required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        liked = post.toggle_like(request.user.rider)
         
         return Response({
             'liked': liked,
-            'likes_count': post.likes.count()
+            'likes_count': post.likes_count
         })
 
+    @action(detail=True, methods=['get', 'post'])
+    def comments(self, request, pk=None):
+        """Get the comments in thread order (?max_depth=0 for thread roots only) or add a comment or reply (POST)"""
+        return comment_thread_response(self, request, post=self.get_object())
+
+class CommentViewSet(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Single comments. Comments are listed and created through
+    /posts/{id}/comments/ and /events/{id}/comments/.
+    """
+    queryset = Comment.objects.select_related('author__user')
+    serializer_class = CommentSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    http_method_names = ['get', 'patch', 'delete', 'head', 'options']
+
+    def partial_update(self, request, *args, **kwargs):
+        comment = self.get_object()
+        if comment.author.user != request.user:
+            return Response({'error': 'You can only edit your own comments'}, status=status.HTTP_403_FORBIDDEN)
+        if comment.is_deleted:
+            return Response({'error': 'This comment has been deleted'}, status=status.HTTP_400_BAD_REQUEST)
+        return super().partial_update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        comment = self.get_object()
+        if comment.author.user != request.user and not request.user.is_staff:
+            return Response({'error': 'You can only delete your own comments'}, status=status.HTTP_403_FORBIDDEN)
+        comment.remove()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['get'])
+    def replies(self, request, pk=None):
+        """Every reply under this comment in thread order, in one range scan over the path index"""
+        comment = self.get_object()
+        lower, upper = comment.subtree_bounds()
+        replies = Comment.objects.filter(path__gt=lower, path__lt=upper, **comment.thread_filter())
+        
+        max_depth = request.query_params.get('max_depth')
+        if max_depth:
+            try:
+                replies = replies.filter(depth__lte=comment.depth + int(max_depth))
+            except ValueError:
+                return Response({'error': 'max_depth must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        page = self.paginate_queryset(replies.select_related('author__user').order_by('path'))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+def annotate_benefits_count(categories):
+    """Active benefits per category, read by BenefitCategorySerializer"""
+    return categories.annotate(benefits_count=Count('benefits', filter=models.Q(benefits__is_active=True)))
+
 class BenefitCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = BenefitCategory.objects.filter(is_active=True)
     serializer_class = BenefitCategorySerializer
     permission_classes = [AllowAny]
+    pagination_class = None  # Small lookup table, served whole
+
+    def get_queryset(self):
+        return annotate_benefits_count(BenefitCategory.objects.filter(is_active=True))
 
 class BenefitViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Benefit.objects.filter(is_active=True)
     serializer_class = BenefitSerializer
     permission_classes = [AllowAny]
+    pagination_class = None  # Small partner catalog, served whole
+
+    # Benefits per category on the /benefits/by_category/ landing page
+    benefits_per_category = 4
 
     def get_queryset(self):
         queryset = Benefit.objects.filter(is_active=True).select_related('category').prefetch_related('available_zones')
@@ -311,57 +781,88 @@ class BenefitViewSet(viewsets.ReadOnlyModelViewSet):
         if category:
             queryset = queryset.filter(category__id=category)
         
-        # Filter by membership level if user is authenticated
-        if self.request.user.is_authenticated and hasattr(self.request.user, 'rider'):
-            membership_level = getattr(self.request.user.rider, 'membership_level', 'basic')
-            # For now, show all benefits. In future, you can implement membership levels
-            pass
-        
-        # Filter by zone if user is authenticated
-        if self.request.user.is_authenticated and hasattr(self.request.user, 'rider'):
-            user_zone = self.request.user.rider.zone
-            if user_zone:
-                # Show benefits available in user's zone or available in all zones
-                queryset = queryset.filter(
-                    models.Q(available_zones__isnull=True) | 
-                    models.Q(available_zones=user_zone)
-                ).distinct()
+        # Membership level, zone and validity dates: one lookup in the catalog's entitlement matrix
+        rider = getattr(self.request.user, 'rider', None)
+        queryset = queryset.filter(pk__in=catalog.get_catalog().benefit_ids(
+            timezone.now().date(),
+            level=rider.membership_level if rider is not None else None,
+            zone_id=rider.zone_id if rider is not None else None,
+        ))
+        
+        queryset = apply_near_filter(queryset, self.request)
         
         # Filter by featured if specified
         featured = self.request.query_params.get('featured', None)
         if featured == 'true':
             queryset = queryset.filter(is_featured=True)
         
-        # Filter by valid date range
-        today = timezone.now().date()
-        queryset = queryset.filter(
-            models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=today),
-            models.Q(valid_until__isnull=True) | models.Q(valid_until__gte=today)
-        )
-        
         return queryset.order_by('order', '-created_at')
 
+    def filter_catalog(self, benefit_catalog, featured=False):
+        """The list filters applied in memory to the cached catalog (see riders.catalog)"""
+        params = self.request.query_params
+        
+        category_id = None
+        if params.get('category'):
+            try:
+                category_id = int(params['category'])
+            except ValueError:
+                raise ValidationError({'error': 'category must be an integer'})
+        
+        near = None
+        if params.get('near'):
+            try:
+                near = geo.parse_near(params['near'], params.get('radius'))
+            except ValueError as e:
+                raise ValidationError({'error': f'Invalid near/radius parameters: {e}'})
+        
+        rider = getattr(self.request.user, 'rider', None)
+        return benefit_catalog.benefits(
+            timezone.now().date(),
+            level=rider.membership_level if rider is not None else None,
+            zone_id=rider.zone_id if rider is not None else None,
+            category_id=category_id,
+            featured=featured or params.get('featured') == 'true',
+            near=near,
+        )
+
+    def serialize_catalog(self, benefits):
+        """Serialize catalog benefits with their usage counts read from the rollups"""
+        context = self.get_serializer_context()
+        context['usage_counts'] = rollups.usage_counts(benefit.pk for benefit in benefits)
+        return BenefitSerializer(benefits, many=True, context=context).data
+
+    def list(self, request, *args, **kwargs):
+        benefits = self.filter_catalog(catalog.get_catalog())
+        return Response(self.serialize_catalog(benefits))
+
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Get featured benefits"""
-        featured_benefits = self.get_queryset().filter(is_featured=True)[:6]
-        serializer = self.get_serializer(featured_benefits, many=True)
-        return Response(serializer.data)
+        featured_benefits = self.filter_catalog(catalog.get_catalog(), featured=True)[:6]
+        return Response(self.serialize_catalog(featured_benefits))
 
     @action(detail=False, methods=['get'])
     def by_category(self, request):
-        """Get benefits grouped by category"""
-        categories = BenefitCategory.objects.filter(is_active=True, benefits__is_active=True).distinct()
-        result = []
+        """Get the first few benefits of every category, from the cached catalog"""
+        benefit_catalog = catalog.get_catalog()
         
-        for category in categories:
-            category_benefits = self.get_queryset().filter(category=category)[:4]
-            result.append({
-                'category': BenefitCategorySerializer(category).data,
-                'benefits': BenefitSerializer(category_benefits, many=True, context={'request': request}).data
-            })
+        benefits_by_category = {}
+        for benefit in self.filter_catalog(benefit_catalog):
+            category_benefits = benefits_by_category.setdefault(benefit.category_id, [])
+            if len(category_benefits) < self.benefits_per_category:
+                category_benefits.append(benefit)
         
-        return Response(result)
+        categories = [category for category in benefit_catalog.categories if category.benefits_count > 0]
+        benefits = self.serialize_catalog([benefit for category_benefits in benefits_by_category.values() for benefit in category_benefits])
+        benefits_by_id = {benefit['id']: benefit for benefit in benefits}
+        return Response([
+            {
+                'category': BenefitCategorySerializer(category).data,
+                'benefits': [benefits_by_id[benefit.pk] for benefit in benefits_by_category.get(category.pk, [])]
+            }
+            for category in categories
+        ])
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def use_benefit(self, request, pk=None):
@@ -376,15 +877,6 @@ class BenefitViewSet(viewsets.ReadOnlyModelViewSet):
         
         rider = request.user.rider
         
-        # Check usage limit
-        if benefit.usage_limit:
-            usage_count = BenefitUsage.objects.filter(rider=rider, benefit=benefit).count()
-            if usage_count >= benefit.usage_limit:
-                return Response(
-                    {'error': f'You have already used this benefit {benefit.usage_limit} times'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
         # Check if benefit is still valid
         today = timezone.now().date()
         if benefit.valid_until and benefit.valid_until < today:
@@ -399,16 +891,63 @@ class BenefitViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Record usage
-        usage = BenefitUsage.objects.create(
-            rider=rider,
-            benefit=benefit,
-            notes=request.data.get('notes', '')
+        # Count the use against the limit and record it together
+        with transaction.atomic():
+            if not BenefitUsageCounter.increment(rider.pk, benefit.pk, benefit.usage_limit or None):
+                return Response(
+                    {'error': f'You have already used this benefit {benefit.usage_limit} times'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            usage = BenefitUsage.objects.create(
+                rider=rider,
+                benefit=benefit,
+                notes=request.data.get('notes', '')
+            )
+        
+        # Signed QR payload the partner can check offline or with /benefits/verify/
+        expires_at = (timezone.now() + timedelta(seconds=settings.REDEMPTION_TOKEN_TTL)).replace(microsecond=0)
+        token = redemption_tokens.sign(
+            redemption_tokens.benefit_key(settings.REDEMPTION_TOKEN_SECRET, benefit.pk),
+            usage.pk, rider.pk, benefit.pk, rider.zone_id, expires_at.timestamp(),
         )
         
         return Response({
             'message': 'Benefit usage recorded successfully',
-            'usage': BenefitUsageSerializer(usage).data
+            'usage': BenefitUsageSerializer(usage).data,
+            'redemption_token': token,
+            'redemption_expires_at': expires_at,
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny], authentication_classes=[])
+    def verify(self, request):
+        """
+        Check a redemption token for a partner and mark it used. Only the token
+        and a nonce insert are involved; no benefit, rider or usage is loaded.
+        """
+        token = request.data.get('token')
+        if not isinstance(token, str) or not token:
+            return Response({'valid': False, 'error': 'token is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        secret = settings.REDEMPTION_TOKEN_SECRET
+        try:
+            claims = redemption_tokens.verify(token, lambda benefit_id: redemption_tokens.benefit_key(secret, benefit_id))
+        except redemption_tokens.TokenError as error:
+            return Response({'valid': False, 'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        expires_at = datetime.fromtimestamp(claims.expires_at, tz=dt_timezone.utc)
+        try:
+            with transaction.atomic():
+                RedemptionNonce.objects.create(nonce=int.from_bytes(claims.nonce, 'big', signed=True), expires_at=expires_at)
+        except IntegrityError:
+            return Response({'valid': False, 'error': 'Token already used'}, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'valid': True,
+            'usage': claims.usage_id,
+            'rider': claims.rider_id,
+            'benefit': claims.benefit_id,
+            'zone': claims.zone_id,
+            'expires_at': expires_at,
         })
 
 class BenefitUsageViewSet(viewsets.ReadOnlyModelViewSet):
@@ -421,6 +960,58 @@ class BenefitUsageViewSet(viewsets.ReadOnlyModelViewSet):
             return BenefitUsage.objects.filter(rider=self.request.user.rider).select_related('benefit', 'rider__user')
         return BenefitUsage.objects.none()
 
+    def rollup_filters(self, request):
+        """Report filters from ?from=&to=&partner=&benefit=&zone=&category="""
+        filters = {'partner': request.query_params.get('partner')}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value:
+                day = parse_date(value)
+                if day is None:
+                    raise ValidationError({'error': f'{param} must be a date (YYYY-MM-DD)'})
+                filters[f'date_{param}'] = day
+        for param in ('benefit', 'zone', 'category'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    filters[f'{param}_id'] = int(value)
+                except ValueError:
+                    raise ValidationError({'error': f'{param} must be an integer'})
+        return filters
+
+    @action(detail=False, methods=['get'])
+    def report(self, request):
+        """Staff: total uses per ?group=benefit|partner|zone|category|day from the daily rollups"""
+        if not request.user.is_staff:
+            return Response({'error': 'Only staff can view usage reports'}, status=status.HTTP_403_FORBIDDEN)
+        
+        group = request.query_params.get('group', 'benefit')
+        if group not in rollups.GROUPINGS:
+            return Response(
+                {'error': f'group must be one of {", ".join(rollups.GROUPINGS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'group': group,
+            'rolled_up_until': rollups.high_water_mark(),
+            'results': rollups.report(group, **self.rollup_filters(request)),
+        })
+
+    @action(detail=False, methods=['get'], renderer_classes=[JSONRenderer, rollups.CSVRenderer])
+    def export(self, request):
+        """Staff: stream the daily rollups as JSON, or as CSV with ?format=csv"""
+        if not request.user.is_staff:
+            return Response({'error': 'Only staff can export usage'}, status=status.HTTP_403_FORBIDDEN)
+        
+        filters = self.rollup_filters(request)
+        if request.accepted_renderer.format == 'csv':
+            response = StreamingHttpResponse(rollups.stream_csv(**filters), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="benefit-usage.csv"'
+        else:
+            response = StreamingHttpResponse(rollups.stream_json(**filters), content_type='application/json')
+        return response
+
 class NoticeViewSet(viewsets.ModelViewSet):
     queryset = Notice.objects.all()
     serializer_class = NoticeSerializer
@@ -482,3 +1073,170 @@ class NoticeViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(notices, many=True)
         return Response(serializer.data)
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGES = 50
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_view(request):
+    """
+    Ranked full-text search over events, posts, benefits and notices.
+    Use ?q= for the query, ?type=event,post to narrow kinds and ?page= to page.
+    Notices are only searched for signed-in users; benefits are limited to
+    those the rider is entitled to.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    kinds = ['event', 'post', 'benefit']
+    if request.user.is_authenticated:
+        kinds.append('notice')
+    requested = request.query_params.get('type')
+    if requested:
+        kinds = [kind for kind in requested.split(',') if kind in kinds]
+    
+    try:
+        page = max(1, int(request.query_params.get('page', 1)))
+    except ValueError:
+        page = 1
+    if page > SEARCH_MAX_PAGES:
+        return Response({'error': 'Refine your search to see more results'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Benefits the rider isn't entitled to (tier, zone, validity dates) are hidden as in BenefitViewSet
+    allowed = {}
+    if 'benefit' in kinds:
+        rider = getattr(request.user, 'rider', None)
+        allowed['benefit'] = catalog.get_catalog().benefit_ids(
+            timezone.now().date(),
+            level=rider.membership_level if rider is not None else None,
+            zone_id=rider.zone_id if rider is not None else None,
+        )
+    
+    # Fetch one extra hit to know whether there is a next page
+    hits = search.search(query, kinds, limit=SEARCH_PAGE_SIZE + 1, offset=(page - 1) * SEARCH_PAGE_SIZE, allowed=allowed)
+    has_next = len(hits) > SEARCH_PAGE_SIZE
+    
+    def page_link(number):
+        return request.build_absolute_uri(
+            request.path + '?' + urlencode({**request.query_params.dict(), 'page': number})
+        )
+    
+    return Response({
+        'next': page_link(page + 1) if has_next else None,
+        'previous': page_link(page - 1) if page > 1 else None,
+        'results': [
+            {
+                'type': hit['kind'],
+                'id': hit['object_id'],
+                'title': hit['title'],
+                'snippet': hit['body'][:200],
+                'score': hit['score'],
+            }
+            for hit in hits[:SEARCH_PAGE_SIZE]
+        ],
+    })
+
+@require_safe
+def media_view(request, path):
+    """
+    Serve a file from MEDIA_ROOT with strong ETags, conditional GET and
+    single byte ranges, or hand it to the front proxy (MEDIA_SENDFILE).
+    """
+    full_path = media.resolve(path)
+    if full_path is None:
+        raise Http404('Media file not found')
+    
+    stat = os.stat(full_path)
+    etag = media.make_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': media.IMMUTABLE_CACHE_CONTROL if media.is_immutable(path) else media.MUTABLE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+        'X-Content-Type-Options': 'nosniff',
+    }
+    
+    # 304 Not Modified / 412 Precondition Failed, decided from the stat alone
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        for header, value in headers.items():
+            response[header] = value
+        return response
+    
+    sendfile = media.sendfile_headers(path, full_path)
+    if sendfile is not None:
+        # The proxy streams the bytes and answers Range requests itself
+        response = HttpResponse(content_type=media.content_type(full_path))
+        for header, value in {**headers, **sendfile}.items():
+            response[header] = value
+        return response
+    
+    size = stat.st_size
+    byte_range = media.parse_range(request.headers.get('Range'), size)
+    if byte_range is not None and request.headers.get('If-Range'):
+        if not media.if_range_matches(request.headers['If-Range'], etag, last_modified):
+            byte_range = None
+    if byte_range is False:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    if byte_range is None:
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=media.content_type(full_path))
+            response['Content-Length'] = size
+        else:
+            # Lets the WSGI server use its file wrapper (sendfile) for whole files
+            response = FileResponse(open(full_path, 'rb'), content_type=media.content_type(full_path))
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        if request.method == 'HEAD':
+            response = HttpResponse(status=status.HTTP_206_PARTIAL_CONTENT, content_type=media.content_type(full_path))
+        else:
+            response = StreamingHttpResponse(
+                media.read_range(full_path, start, length),
+                status=status.HTTP_206_PARTIAL_CONTENT,
+                content_type=media.content_type(full_path)
+            )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = length
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+@require_safe
+def private_media_view(request, path):
+    """
+    Serve a membership ID document to staff (admin session or JWT) or to the
+    applicant it belongs to. Never cached by shared caches.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            authenticated = None
+        if authenticated is not None:
+            user = authenticated[0]
+    if not user.is_authenticated:
+        raise Http404('Media file not found')
+    
+    name = posixpath.normpath(path).lstrip('/')
+    applications = MembershipApplication.objects.filter(models.Q(id_document_photo=name) | models.Q(holding_id_photo=name))
+    if not user.is_staff:
+        applications = applications.filter(user=user)
+    if not applications.exists():
+        raise Http404('Media file not found')
+    
+    try:
+        file = private_storage().open(name, 'rb')
+    except (FileNotFoundError, ValueError):
+        raise Http404('Media file not found')
+    response = FileResponse(file, content_type=media.content_type(name))
+    response['Cache-Control'] = media.PRIVATE_CACHE_CONTROL
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
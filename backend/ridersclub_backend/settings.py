@@ -146,6 +146,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'riders.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
 # JWT configuration
@@ -191,6 +193,61 @@ CORS_ALLOW_CREDENTIALS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Membership ID documents (riders.storage.PrivateStorage): kept outside MEDIA_ROOT and
+# served by riders.views.private_media_view to staff and the applicant only
+PRIVATE_MEDIA_ROOT = config('PRIVATE_MEDIA_ROOT', default=str(BASE_DIR / 'private_media'))
+PRIVATE_MEDIA_URL = '/private-media/'
+
+# How media_view hands files to the front proxy: '' (serve from Django),
+# 'x-accel-redirect' (nginx, with an internal location at MEDIA_ACCEL_REDIRECT_PREFIX)
+# or 'x-sendfile' (Apache mod_xsendfile, lighttpd)
+MEDIA_SENDFILE = config('MEDIA_SENDFILE', default='')
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+
+# Uploads are stored once per unique content (riders.storage / riders.blobs)
+STORAGES = {
+    'default': {
+        'BACKEND': 'riders.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Worker processes generating image renditions (0 = generate inline after commit)
+IMAGE_PIPELINE_WORKERS = config('IMAGE_PIPELINE_WORKERS', default=2, cast=int)
+
+# Chunked event photo uploads (riders.uploads); part files are kept outside MEDIA_ROOT
+PHOTO_UPLOAD_TEMP_DIR = config('PHOTO_UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'upload_parts'))
+PHOTO_UPLOAD_CHUNK_SIZE = config('PHOTO_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+PHOTO_UPLOAD_MAX_FILE_SIZE = config('PHOTO_UPLOAD_MAX_FILE_SIZE', default=40 * 1024 * 1024, cast=int)
+PHOTO_UPLOAD_MAX_PHOTOS_PER_EVENT = config('PHOTO_UPLOAD_MAX_PHOTOS_PER_EVENT', default=500, cast=int)
+PHOTO_UPLOAD_MAX_BYTES_PER_EVENT = config('PHOTO_UPLOAD_MAX_BYTES_PER_EVENT', default=4 * 1024 ** 3, cast=int)
+
+# Posts whose audience is larger than this are merged into feeds at read time
+# instead of being written into every follower's timeline
+FEED_FANOUT_LIMIT = config('FEED_FANOUT_LIMIT', default=5000, cast=int)
+
+# Shared cache; the benefit catalog version lives here (riders.catalog). Use a shared
+# backend such as django.core.cache.backends.redis.RedisCache with several processes.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Longest a process serves its in-memory benefit catalog without rebuilding it
+BENEFIT_CATALOG_MAX_AGE = config('BENEFIT_CATALOG_MAX_AGE', default=300, cast=int)
+
+# Benefit redemption tokens (riders.redemption_tokens): per-benefit signing keys are
+# derived from this secret, so changing it invalidates the keys given to partners
+REDEMPTION_TOKEN_SECRET = config('REDEMPTION_TOKEN_SECRET', default=SECRET_KEY)
+REDEMPTION_TOKEN_TTL = config('REDEMPTION_TOKEN_TTL', default=300, cast=int)
+
+# Country calling code assumed for phone numbers typed without one (riders.phones)
+PHONE_DEFAULT_COUNTRY_CODE = config('PHONE_DEFAULT_COUNTRY_CODE', default='880')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Django REST Framework configuration
@@ -201,6 +258,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'riders.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
 # JWT configuration
@@ -15,9 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+import re
+
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from riders.views import media_view, private_media_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,5 +28,9 @@ urlpatterns = [
     path('api/auth/', include('riders.auth_urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Public uploads only (media.PUBLIC_PREFIXES); with MEDIA_SENDFILE the front proxy sends the bytes.
+# ID documents live outside MEDIA_ROOT and are served to staff and the applicant.
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media_view, name='media'),
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.PRIVATE_MEDIA_URL.lstrip('/')), private_media_view, name='private-media'),
+]
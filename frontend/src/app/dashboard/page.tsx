@@ -3,7 +3,7 @@
 import React, { useState, useEffect } from 'react';
 import Link from 'next/link';
 import { useRouter } from 'next/navigation';
-import { apiService, UserProfile, ChangePasswordData, Benefit, RideEvent, Zone, Notice, FeaturedRider } from '../../services/api';
+import { apiService, renditionSrcSet, UserProfile, ChangePasswordData, Benefit, RideEvent, Zone, Notice, FeaturedRider } from '../../services/api';
 
 export default function DashboardPage() {
   const [user, setUser] = useState<UserProfile | null>(null);
@@ -13,14 +13,18 @@ export default function DashboardPage() {
   const [upcomingEvents, setUpcomingEvents] = useState<RideEvent[]>([]);
   const [ongoingEvents, setOngoingEvents] = useState<RideEvent[]>([]);
   const [pastEvents, setPastEvents] = useState<RideEvent[]>([]);
-  const [eventsLoading, setEventsLoading] = useState(true);  const [isLoading, setIsLoading] = useState(true);
+  const [eventsLoading, setEventsLoading] = useState(true);
+  const [eventsNext, setEventsNext] = useState<string | null>(null);
+  const [loadingMoreEvents, setLoadingMoreEvents] = useState(false);  const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string>('');
   const [activeEventTab, setActiveEventTab] = useState<'upcoming' | 'previous'>('upcoming');
   const [showPasswordModal, setShowPasswordModal] = useState(false);
   const [selectedEvent, setSelectedEvent] = useState<RideEvent | null>(null);
   const [showEventModal, setShowEventModal] = useState(false);
   const [showPhotoModal, setShowPhotoModal] = useState(false);
-  const [selectedEventPhotos, setSelectedEventPhotos] = useState<RideEvent | null>(null);const [passwordData, setPasswordData] = useState<ChangePasswordData & { confirm_password: string }>({
+  const [selectedEventPhotos, setSelectedEventPhotos] = useState<RideEvent | null>(null);
+  const [photosNext, setPhotosNext] = useState<string | null>(null);
+  const [loadingMorePhotos, setLoadingMorePhotos] = useState(false);const [passwordData, setPasswordData] = useState<ChangePasswordData & { confirm_password: string }>({
     old_password: '',
     new_password: '',
     confirm_password: '',
@@ -50,21 +54,14 @@ export default function DashboardPage() {
       if (!apiService.isAuthenticated()) {
         router.push('/login');
         return;
-      }      try {        const [userProfile, allBenefits, allEvents] = await Promise.all([
+      }      try {        const [userProfile, allBenefits, eventsPage] = await Promise.all([
           apiService.getCurrentUser(),
           apiService.fetchBenefits(), // Fetch all benefits instead of just featured
-          apiService.fetchEvents(), // Fetch all events
+          apiService.fetchEvents(), // First page of events; the rest load on demand
         ]);        setUser(userProfile);
         setBenefits(allBenefits); // Show all benefits
-        setEvents(allEvents);
-          // Separate ongoing, upcoming and past events
-        const ongoing = allEvents.filter(event => event.status === 'ongoing');
-        const upcoming = allEvents.filter(event => event.is_upcoming && event.status !== 'ongoing');
-        const past = allEvents.filter(event => event.is_past);
-        
-        setOngoingEvents(ongoing);
-        setUpcomingEvents(upcoming);
-        setPastEvents(past);
+        addEvents(eventsPage.results);
+        setEventsNext(eventsPage.next);
         
       } catch (error) {
         console.error('Error fetching data:', error);
@@ -190,6 +187,46 @@ export default function DashboardPage() {
       setError('Failed to update event registration. Please try again.');
     }
   };
+  // Append a page of events, sorting it into the ongoing, upcoming and past lists
+  const addEvents = (page: RideEvent[]) => {
+    setEvents(prevEvents => [...prevEvents, ...page]);
+    setOngoingEvents(prevEvents => [...prevEvents, ...page.filter(event => event.status === 'ongoing')]);
+    setUpcomingEvents(prevEvents => [...prevEvents, ...page.filter(event => event.is_upcoming && event.status !== 'ongoing')]);
+    setPastEvents(prevEvents => [...prevEvents, ...page.filter(event => event.is_past)]);
+  };
+
+  const loadMoreEvents = async () => {
+    if (!eventsNext || loadingMoreEvents) {
+      return;
+    }
+    setLoadingMoreEvents(true);
+    try {
+      const eventsPage = await apiService.fetchEvents(eventsNext);
+      addEvents(eventsPage.results);
+      setEventsNext(eventsPage.next);
+    } catch (error) {
+      console.error('Error loading more events:', error);
+    } finally {
+      setLoadingMoreEvents(false);
+    }
+  };
+
+  const loadMorePhotos = async () => {
+    if (!selectedEventPhotos || !photosNext || loadingMorePhotos) {
+      return;
+    }
+    setLoadingMorePhotos(true);
+    try {
+      const photosPage = await apiService.fetchEventPhotos(selectedEventPhotos.id, photosNext);
+      setSelectedEventPhotos(prev => prev && { ...prev, all_photos: [...(prev.all_photos || []), ...photosPage.results] });
+      setPhotosNext(photosPage.next);
+    } catch (error) {
+      console.error('Error loading more photos:', error);
+    } finally {
+      setLoadingMorePhotos(false);
+    }
+  };
+
   const openEventModal = (eventId: number) => {
     const event = events.find(e => e.id === eventId);
     if (event) {
@@ -197,11 +234,18 @@ export default function DashboardPage() {
       setShowEventModal(true);
     }
   };
-  const openPhotoModal = (eventId: number) => {
+  const openPhotoModal = async (eventId: number) => {
     const event = events.find(e => e.id === eventId);
-    if (event && event.all_photos && event.all_photos.length > 0) {
-      setSelectedEventPhotos(event);
-      setShowPhotoModal(true);
+    if (event && event.photo_count > 0) {
+      try {
+        const legacyPhotos = event.photos.map(url => ({ type: 'url' as const, url, caption: '', uploaded_at: null }));
+        const photosPage = await apiService.fetchEventPhotos(eventId);
+        setSelectedEventPhotos({ ...event, all_photos: [...legacyPhotos, ...photosPage.results] });
+        setPhotosNext(photosPage.next);
+        setShowPhotoModal(true);
+      } catch (error) {
+        console.error('Error fetching event photos:', error);
+      }
     }
   };
 
@@ -917,7 +961,7 @@ export default function DashboardPage() {
                                 <span className="bg-green-500/30 text-green-300 px-2 py-1 rounded-full">
                                   ✅ {event.current_joined} Attended
                                 </span>
-                                {event.all_photos && event.all_photos.length > 0 && (
+                                {event.photo_count > 0 && (
                                   <span 
                                     className="bg-blue-500/30 text-blue-300 px-2 py-1 rounded-full cursor-pointer hover:bg-blue-500/50 transition-colors" 
                                     onClick={() => openPhotoModal(event.id)}
@@ -944,6 +988,18 @@ export default function DashboardPage() {
                   )}
                 </div>
               )}
+
+              {eventsNext && (
+                <div className="text-center mt-6">
+                  <button
+                    onClick={loadMoreEvents}
+                    disabled={loadingMoreEvents}
+                    className="bg-white/10 hover:bg-white/20 disabled:opacity-50 text-white text-sm font-medium px-6 py-2 rounded-xl border border-white/20 transition-colors"
+                  >
+                    {loadingMoreEvents ? 'Loading...' : 'Load more events'}
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         </div>        {/* Special Offers Section */}
@@ -1269,6 +1325,9 @@ export default function DashboardPage() {
                 <div key={index} className="relative group overflow-hidden rounded-lg aspect-video">
                   <img
                     src={photo.url}
+                    srcSet={renditionSrcSet(photo.renditions)}
+                    sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
+                    loading="lazy"
                     alt={photo.caption || `${selectedEventPhotos.title} photo ${index + 1}`}
                     className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110"
                   />
@@ -1292,6 +1351,18 @@ export default function DashboardPage() {
                 <p>No photos available for this event</p>
               </div>
             )}
+
+            {photosNext && (
+              <div className="text-center mt-6">
+                <button
+                  onClick={loadMorePhotos}
+                  disabled={loadingMorePhotos}
+                  className="bg-white/10 hover:bg-white/20 disabled:opacity-50 text-white text-sm font-medium px-6 py-2 rounded-xl border border-white/20 transition-colors"
+                >
+                  {loadingMorePhotos ? 'Loading...' : 'Load more photos'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       )}
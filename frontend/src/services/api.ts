@@ -129,12 +129,29 @@ export interface BenefitsByCategory {
   benefits: Benefit[];
 }
 
+export interface ImageRendition {
+  width: number;
+  height: number;
+  webp: string;
+  jpeg: string;
+}
+
+// Keyed by size name (thumbnail, medium, large); null while still being generated
+export type ImageRenditions = Record<string, ImageRendition> | null;
+
 export interface EventPhoto {
   type: 'url' | 'upload';
   url: string;
   caption: string;
   uploaded_at: string | null;
   uploaded_by?: string | null;
+  renditions?: ImageRenditions;
+}
+
+export interface EventParticipantPreview {
+  id: number;
+  full_name: string;
+  profile_image: string | null;
 }
 
 export interface RideEvent {
@@ -151,7 +168,9 @@ export interface RideEvent {
   organizer_name: string;
   status: string;
   photos: string[];
-  all_photos: EventPhoto[];
+  photo_count: number;
+  all_photos?: EventPhoto[];
+  participant_preview: EventParticipantPreview[];
   current_joined: number;
   is_upcoming: boolean;
   is_past: boolean;
@@ -190,6 +209,38 @@ export interface FeaturedRider {
   } | null;
 }
 
+export interface PaginatedResponse<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+// Fetch one page of a cursor-paginated list; pass the previous page's `next` link to continue
+async function fetchPage<T>(url: string, errorMessage: string): Promise<PaginatedResponse<T>> {
+  const token = localStorage.getItem('access_token');
+  const response = await fetch(url, {
+    headers: {
+      'Authorization': `Bearer ${token}`,
+    },
+  });
+
+  if (!response.ok) {
+    throw new Error(errorMessage);
+  }
+
+  return response.json();
+}
+
+// srcset for an image's renditions, so the browser downloads the smallest one that fits
+export function renditionSrcSet(renditions: ImageRenditions | undefined, format: 'webp' | 'jpeg' = 'webp'): string | undefined {
+  if (!renditions) {
+    return undefined;
+  }
+  return Object.values(renditions)
+    .map(rendition => `${rendition[format]} ${rendition.width}w`)
+    .join(', ');
+}
+
 export const apiService = {
   // Fetch zones
   async fetchZones(): Promise<Zone[]> {
@@ -463,65 +514,39 @@ export const apiService = {
     return response.json();
   },
 
-  async fetchMyBenefitUsage(): Promise<BenefitUsage[]> {
-    const token = localStorage.getItem('access_token');
-    const response = await fetch(`${API_BASE_URL}/benefit-usage/`, {
-      headers: {
-        'Authorization': `Bearer ${token}`,
-      },
-    });
-
-    if (!response.ok) {
-      throw new Error('Failed to fetch benefit usage');
-    }
-
-    return response.json();
+  async fetchMyBenefitUsage(cursor?: string | null): Promise<PaginatedResponse<BenefitUsage>> {
+    return fetchPage<BenefitUsage>(cursor || `${API_BASE_URL}/benefit-usage/`, 'Failed to fetch benefit usage');
   },
 
   // Event-related methods
-  async fetchEvents(): Promise<RideEvent[]> {
-    const token = localStorage.getItem('access_token');
-    const response = await fetch(`${API_BASE_URL}/events/`, {
-      headers: {
-        'Authorization': `Bearer ${token}`,
-      },
-    });
-
-    if (!response.ok) {
-      throw new Error('Failed to fetch events');
-    }
-
-    return response.json();
+  async fetchEvents(cursor?: string | null): Promise<PaginatedResponse<RideEvent>> {
+    return fetchPage<RideEvent>(cursor || `${API_BASE_URL}/events/`, 'Failed to fetch events');
   },
 
-  async fetchUpcomingEvents(): Promise<RideEvent[]> {
-    const token = localStorage.getItem('access_token');
-    const response = await fetch(`${API_BASE_URL}/events/upcoming/`, {
-      headers: {
-        'Authorization': `Bearer ${token}`,
-      },
-    });
-
-    if (!response.ok) {
-      throw new Error('Failed to fetch upcoming events');
-    }
-
-    return response.json();
+  async fetchUpcomingEvents(cursor?: string | null): Promise<PaginatedResponse<RideEvent>> {
+    return fetchPage<RideEvent>(cursor || `${API_BASE_URL}/events/upcoming/`, 'Failed to fetch upcoming events');
   },
 
-  async fetchPastEvents(): Promise<RideEvent[]> {
-    const token = localStorage.getItem('access_token');
-    const response = await fetch(`${API_BASE_URL}/events/past/`, {
-      headers: {
-        'Authorization': `Bearer ${token}`,
-      },
-    });
-
-    if (!response.ok) {
-      throw new Error('Failed to fetch past events');
-    }
+  async fetchPastEvents(cursor?: string | null): Promise<PaginatedResponse<RideEvent>> {
+    return fetchPage<RideEvent>(cursor || `${API_BASE_URL}/events/past/`, 'Failed to fetch past events');
+  },
 
-    return response.json();
+  async fetchEventPhotos(eventId: number, cursor?: string | null): Promise<PaginatedResponse<EventPhoto>> {
+    const page = await fetchPage<{ photo_url: string; photo_renditions: ImageRenditions; caption: string; uploaded_at: string; uploaded_by_name: string }>(
+      cursor || `${API_BASE_URL}/events/${eventId}/photos/`,
+      'Failed to fetch event photos'
+    );
+
+    const results = page.results.map(photo => ({
+      type: 'upload' as const,
+      url: photo.photo_url,
+      caption: photo.caption || '',
+      uploaded_at: photo.uploaded_at,
+      uploaded_by: photo.uploaded_by_name || null,
+      renditions: photo.photo_renditions,
+    }));
+
+    return { ...page, results };
   },
 
   async joinEvent(eventId: number): Promise<{ message: string }> {
@@ -569,17 +594,8 @@ export const apiService = {
     return response.json();
   },
 
-  async fetchAllNotices(): Promise<Notice[]> {
-    const token = localStorage.getItem('access_token');
-    const response = await fetch(`${API_BASE_URL}/notices/`, {
-      headers: {
-        'Authorization': `Bearer ${token}`,
-      },
-    });    if (!response.ok) {
-      throw new Error('Failed to fetch notices');
-    }
-
-    return response.json();
+  async fetchAllNotices(cursor?: string | null): Promise<PaginatedResponse<Notice>> {
+    return fetchPage<Notice>(cursor || `${API_BASE_URL}/notices/`, 'Failed to fetch notices');
   },
 
   // Featured Riders methods
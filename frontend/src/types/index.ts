@@ -13,6 +13,7 @@ export interface Rider {
   location: string;
   bike_model: string;
   profile_image?: string;
+  membership_level: 'basic' | 'premium' | 'vip';
   created_at: string;
   updated_at: string;
 }
@@ -38,6 +39,25 @@ export interface Post {
   content: string;
   image?: string;
   likes_count: number;
+  liked_by_me: boolean;
+  created_at: string;
+  updated_at: string;
+}
+
+export interface Comment {
+  id: number;
+  post: number | null;
+  event: number | null;
+  parent: number | null;
+  author: {
+    id: number;
+    full_name: string;
+    profile_image?: string | null;
+  };
+  content: string;
+  depth: number;
+  reply_count: number;
+  is_deleted: boolean;
   created_at: string;
   updated_at: string;
 }